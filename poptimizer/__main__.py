@@ -2,16 +2,31 @@
 import typer
 
 from poptimizer.data.views import div_status
-from poptimizer.evolve import Evolution
+from poptimizer.evolve import Evolution, jobs, workers
 from poptimizer.portfolio import Optimizer, load_from_yaml
 
 
-def evolve() -> None:
+def evolve(
+    workers: int = typer.Option(
+        1,
+        help="Number of organisms evaluated concurrently: pool processes or, with --distributed, "
+        + "queued jobs, which should be at least the total number of running workers",
+    ),
+    distributed: bool = typer.Option(
+        False,
+        help="Evaluate organisms by workers via MongoDB job queue, see --workers",
+    ),
+) -> None:
     """Run evolution."""
-    ev = Evolution()
+    ev = Evolution(n_workers=workers, distributed=distributed)
     ev.evolve()
 
 
+def worker() -> None:
+    """Run worker for distributed evolution."""
+    jobs.work(workers.OPERATIONS)
+
+
 def dividends(ticker: str) -> None:
     """Get dividends status."""
     div_status.dividends_validation(ticker)
@@ -31,6 +46,7 @@ if __name__ == "__main__":
     app = typer.Typer(help="Run poptimizer subcommands.", add_completion=False)
 
     app.command()(evolve)
+    app.command()(worker)
     app.command()(dividends)
     app.command()(optimize)
 
@@ -1,6 +1,7 @@
 """Основные настраиваемые параметры"""
 import logging
 import pathlib
+from typing import Optional
 
 import pandas as pd
 import torch
@@ -27,6 +28,9 @@ REPORTS_PATH = pathlib.Path(__file__).parents[1] / "reports"
 # Путь к директории с портфелями
 PORT_PATH = pathlib.Path(__file__).parents[1] / "portfolio"
 
+# Путь к директории с хранящимися на диске панелями котировок
+PANEL_PATH = pathlib.Path(__file__).parents[1] / "panel"
+
 # Количество торговых дней в году
 YEAR_IN_TRADING_DAYS = 12 * 21
 
@@ -36,6 +40,26 @@ MAX_TRADE = 1 / 150
 # Максимальная популяция
 MAX_POPULATION = 60
 
+# Доля эпох политики обучения для дообучения сохраненной модели при повторных оценках организма в
+# течение дня, если None — модель обучается с нуля
+WARM_START: Optional[float] = None
+
+# Доля эпох политики обучения для предварительной оценки новых организмов, если None — не проводится
+SCREEN_EPOCHS: Optional[float] = None
+
+# Новый организм удаляется после предварительной оценки, если прогноз его LLH ниже данного квантиля
+# LLH популяции
+SCREEN_QUANTILE = 0.1
+
+# Компилировать модели при обучении с помощью torch.compile. Может быть переопределено ключом compile
+# фенотипа. Первая компиляция архитектуры занимает несколько секунд, а затем граф используется
+# повторно для моделей с такой же архитектурой
+COMPILE = False
+
+# Способ оценки корреляционной матрицы прогнозов: ledoit_wolf — линейное сжатие к постоянной
+# корреляции, qis — нелинейное сжатие собственных чисел выборочной матрицы
+COV_ESTIMATOR = "ledoit_wolf"
+
 # Длинна прогноза в торговых днях
 FORECAST_DAYS = 33
 
@@ -0,0 +1,242 @@
+"""Хранящаяся на диске панель котировок (даты × тикеры) с доступом через отображение в память.
+
+Каждое поле хранится в отдельном файле в виде массива float32, строки которого соответствуют датам,
+а столбцы — тикерам. Индексы дат и тикеров общие для всех полей. Новые торговые дни дописываются в
+конец файлов, поэтому уже открытые другими процессами отображения остаются корректными, а данные
+разделяются между процессами через страничный кэш операционной системы.
+
+Панель помечается версией исходных данных, и при ее изменении, например, после обновления или
+пересмотра котировок в базе данных, панель не используется до сохранения новых данных.
+"""
+import contextlib
+import fcntl
+import json
+import os
+import pathlib
+import shutil
+import uuid
+from typing import Final, Iterator, Optional, TypedDict
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+# Файлы с описанием панели и блокировкой для записи
+_META: Final = "meta.json"
+_LOCK: Final = "lock"
+
+# Файлы с датами и признаком наличия котировки в конкретный день
+_DATES: Final = "dates"
+_ROWS: Final = "rows"
+
+_DATES_TYPE: Final = np.int64
+_ROWS_TYPE: Final = np.uint8
+_VALUES_TYPE: Final = np.float32
+
+
+class _Meta(TypedDict):
+    """Описание панели."""
+
+    gen: str
+    tickers: list[str]
+    fields: list[str]
+    len: int
+    till: str
+    version: str
+
+
+def _to_dates(raw_dates: npt.NDArray[np.int64]) -> pd.DatetimeIndex:
+    return pd.DatetimeIndex(raw_dates.astype("datetime64[ns]"))
+
+
+class Panel:
+    """Панель котировок для всех когда-либо запрошенных тикеров.
+
+    Содержит сырые значения котировок без заполнения пропусков — отсутствие котировки отмечается в
+    отдельном массиве, что позволяет для любого набора тикеров воспроизвести результат объединения
+    их таблиц котировок.
+    """
+
+    def __init__(self, path: pathlib.Path) -> None:
+        """Панель хранится в указанной директории, которая создается при необходимости."""
+        self._path = path
+
+    @property
+    def tickers(self) -> tuple[str, ...]:
+        """Тикеры, котировки которых хранятся в панели."""
+        if (meta := self._meta()) is None:
+            return ()
+        return tuple(meta["tickers"])
+
+    def load(
+        self,
+        tickers: tuple[str, ...],
+        last_date: pd.Timestamp,
+        field: str,
+        version: str = "",
+    ) -> Optional[pd.DataFrame]:
+        """Значения поля для тикеров до указанной даты включительно.
+
+        Возвращает None, если панель не содержит всех тикеров, данных до указанной даты или
+        сохранена для другой версии исходных данных. Строки, в которых нет котировок ни одного из
+        тикеров, отбрасываются.
+
+        Чтение выполняется под разделяемой блокировкой, поэтому перестройка панели не может удалить
+        файлы между чтением описания панели и копированием данных из них.
+        """
+        if not (self._path / _LOCK).exists():
+            return None
+
+        with self._lock(fcntl.LOCK_SH):
+            return self._load(tickers, last_date, field, version)
+
+    def _load(
+        self,
+        tickers: tuple[str, ...],
+        last_date: pd.Timestamp,
+        field: str,
+        version: str,
+    ) -> Optional[pd.DataFrame]:
+        meta = self._meta()
+        if meta is None or meta.get("version", "") != version or field not in meta["fields"]:
+            return None
+        if pd.Timestamp(meta["till"]) < last_date:
+            return None
+
+        all_tickers = meta["tickers"]
+        if not set(tickers) <= set(all_tickers):
+            return None
+
+        gen_path = self._path / meta["gen"]
+        shape = (meta["len"], len(all_tickers))
+        dates = _to_dates(np.memmap(gen_path / _DATES, dtype=_DATES_TYPE, mode="r", shape=shape[:1]))
+        rows = np.memmap(gen_path / _ROWS, dtype=_ROWS_TYPE, mode="r", shape=shape)
+        values = np.memmap(gen_path / field, dtype=_VALUES_TYPE, mode="r", shape=shape)
+
+        till = dates.searchsorted(last_date, side="right")
+        cols = [all_tickers.index(ticker) for ticker in tickers]
+        traded = rows[:till, cols].any(axis=1)
+
+        return pd.DataFrame(
+            values[:till, cols][traded].astype(float),
+            index=dates[:till][traded],
+            columns=list(tickers),
+        )
+
+    def save(
+        self,
+        quotes: dict[str, pd.DataFrame],
+        till: pd.Timestamp,
+        version: str = "",
+    ) -> None:
+        """Сохраняет таблицы котировок тикеров, которые актуальны как минимум по указанную дату.
+
+        Если набор тикеров и полей не изменился, а уже сохраненные данные совпадают с новыми, то
+        дописываются только новые даты. В противном случае, например, при пересмотре истории котировок,
+        панель перестраивается.
+        """
+        self._path.mkdir(parents=True, exist_ok=True)
+        with self._lock(fcntl.LOCK_EX):
+            old_meta = self._meta()
+            fields: list[str] = sorted(set().union(*(df.columns for df in quotes.values())))
+            df_all = pd.concat(quotes, axis=1)
+            meta = _Meta(
+                gen=uuid.uuid4().hex,
+                tickers=list(quotes),
+                fields=fields,
+                len=len(df_all),
+                till=str(max(till, df_all.index[-1])),
+                version=version,
+            )
+
+            if old_meta is not None and self._same_columns(old_meta, meta):
+                if self._append(old_meta, meta, df_all):
+                    return
+
+            self._rebuild(meta, df_all)
+
+    def _same_columns(self, old_meta: _Meta, meta: _Meta) -> bool:
+        """Совпадают ли наборы тикеров и полей."""
+        return (old_meta["tickers"], old_meta["fields"]) == (meta["tickers"], meta["fields"])
+
+    def _append(self, old_meta: _Meta, meta: _Meta, df_all: pd.DataFrame) -> bool:
+        """Дописывает новые даты, если уже сохраненные даты и значения не изменились."""
+        gen_path = self._path / old_meta["gen"]
+        length = old_meta["len"]
+        if len(df_all) < length:
+            return False
+
+        arrays = self._arrays(meta["tickers"], meta["fields"], df_all)
+        for file_name, array in arrays.items():
+            saved = np.fromfile(gen_path / file_name, dtype=array.dtype, count=array[:length].size)
+            if not np.array_equal(saved, array[:length].ravel(), equal_nan=True):
+                return False
+
+        for file_name, new_array in arrays.items():
+            with open(gen_path / file_name, "ab") as field_file:
+                new_array[length:].tofile(field_file)
+
+        meta["gen"] = old_meta["gen"]
+        self._write_meta(meta)
+
+        return True
+
+    def _rebuild(self, meta: _Meta, df_all: pd.DataFrame) -> None:
+        """Сохраняет панель в новую директорию и переключается на нее."""
+        gen = meta["gen"]
+        gen_path = self._path / gen
+        gen_path.mkdir()
+        for file_name, array in self._arrays(meta["tickers"], meta["fields"], df_all).items():
+            array.tofile(gen_path / file_name)
+
+        self._write_meta(meta)
+
+        # Читатели копируют данные под разделяемой блокировкой, поэтому старые файлы не используются
+        for old_path in self._path.iterdir():
+            if old_path.is_dir() and old_path.name != gen:
+                shutil.rmtree(old_path, ignore_errors=True)
+
+    def _arrays(
+        self,
+        tickers: list[str],
+        fields: list[str],
+        df_all: pd.DataFrame,
+    ) -> dict[str, npt.NDArray[np.int64 | np.uint8 | np.float32]]:
+        """Массивы для записи в файлы с сохранением порядка тикеров в панели."""
+        arrays = {
+            _DATES: df_all.index.values.astype("datetime64[ns]").astype(_DATES_TYPE),
+            _ROWS: np.stack(
+                [df_all[ticker].notna().any(axis=1).to_numpy() for ticker in tickers],
+                axis=1,
+            ).astype(_ROWS_TYPE),
+        }
+        for field in fields:
+            values = [df_all[ticker].reindex(columns=[field])[field].to_numpy() for ticker in tickers]
+            arrays[field] = np.ascontiguousarray(np.stack(values, axis=1), dtype=_VALUES_TYPE)
+
+        return arrays
+
+    def _meta(self) -> Optional[_Meta]:
+        try:
+            with open(self._path / _META) as meta_file:
+                meta: _Meta = json.load(meta_file)
+        except FileNotFoundError:
+            return None
+        return meta
+
+    def _write_meta(self, meta: _Meta) -> None:
+        """Атомарно обновляет описание панели — читатели видят либо старую, либо новую версию."""
+        tmp_path = self._path / f"{_META}.{os.getpid()}"
+        with open(tmp_path, "w") as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(tmp_path, self._path / _META)
+
+    @contextlib.contextmanager
+    def _lock(self, operation: int) -> Iterator[None]:
+        """Исключительная блокировка для записи или разделяемая для чтения из нескольких процессов."""
+        with open(self._path / _LOCK, "a") as lock_file:
+            fcntl.flock(lock_file, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
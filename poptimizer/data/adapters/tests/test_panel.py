@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from poptimizer.data.adapters import panel
+
+
+def make_quotes(dates, close, turnover):
+    return pd.DataFrame({"CLOSE": close, "TURNOVER": turnover}, index=pd.DatetimeIndex(dates))
+
+
+QUOTES = {
+    "AKRN": make_quotes(["2021-01-11", "2021-01-12", "2021-01-14"], [1.0, 0.0, 3.0], [10.0, 20.0, 30.0]),
+    "GAZP": make_quotes(["2021-01-12", "2021-01-13"], [5.0, np.nan], [50.0, 60.0]),
+    "LKOH": make_quotes(["2021-01-11", "2021-01-15"], [7.0, 8.0], [70.0, 80.0]),
+}
+
+
+def concat_field(tickers, last_date, field):
+    df = pd.concat([QUOTES[ticker][field] for ticker in tickers], axis=1)
+    df = df.loc[:last_date]
+    df.columns = list(tickers)
+    return df
+
+
+@pytest.fixture(name="quotes_panel")
+def make_panel(tmp_path):
+    quotes_panel = panel.Panel(tmp_path)
+    quotes_panel.save(QUOTES, pd.Timestamp("2021-01-15"))
+    return quotes_panel
+
+
+def test_empty_panel(tmp_path):
+    empty = panel.Panel(tmp_path / "empty")
+    assert empty.tickers == ()
+    assert empty.load(("AKRN",), pd.Timestamp("2021-01-15"), "CLOSE") is None
+
+
+@pytest.mark.parametrize("tickers", [("AKRN", "GAZP"), ("GAZP",), ("LKOH", "AKRN", "GAZP")])
+@pytest.mark.parametrize("field", ["CLOSE", "TURNOVER"])
+@pytest.mark.parametrize("last_date", ["2021-01-13", "2021-01-15"])
+def test_load_as_concat(quotes_panel, tickers, field, last_date):
+    last_date = pd.Timestamp(last_date)
+    df = quotes_panel.load(tickers, last_date, field)
+
+    pd.testing.assert_frame_equal(
+        df,
+        concat_field(tickers, last_date, field),
+        check_freq=False,
+        check_index_type=False,
+    )
+
+
+def test_load_missing(quotes_panel):
+    assert quotes_panel.tickers == ("AKRN", "GAZP", "LKOH")
+    assert quotes_panel.load(("AKRN", "MSTT"), pd.Timestamp("2021-01-15"), "CLOSE") is None
+    assert quotes_panel.load(("AKRN",), pd.Timestamp("2021-01-18"), "CLOSE") is None
+    assert quotes_panel.load(("AKRN",), pd.Timestamp("2021-01-15"), "OPEN") is None
+
+
+def test_append(quotes_panel, tmp_path):
+    new_quotes = dict(QUOTES)
+    new_quotes["AKRN"] = pd.concat(
+        [QUOTES["AKRN"], make_quotes(["2021-01-18"], [4.0], [40.0])],
+    )
+    gens = {path.name for path in tmp_path.iterdir() if path.is_dir()}
+
+    quotes_panel.save(new_quotes, pd.Timestamp("2021-01-18"))
+
+    assert {path.name for path in tmp_path.iterdir() if path.is_dir()} == gens
+    df = quotes_panel.load(("AKRN", "LKOH"), pd.Timestamp("2021-01-18"), "CLOSE")
+    assert df.index[-1] == pd.Timestamp("2021-01-18")
+    assert df.loc["2021-01-18", "AKRN"] == pytest.approx(4.0)
+    assert np.isnan(df.loc["2021-01-18", "LKOH"])
+
+
+def test_rebuild_new_ticker(quotes_panel, tmp_path):
+    new_quotes = dict(QUOTES)
+    new_quotes["MSTT"] = make_quotes(["2021-01-13"], [9.0], [90.0])
+
+    quotes_panel.save(new_quotes, pd.Timestamp("2021-01-15"))
+
+    assert len([path for path in tmp_path.iterdir() if path.is_dir()]) == 1
+    assert quotes_panel.tickers == ("AKRN", "GAZP", "LKOH", "MSTT")
+    df = quotes_panel.load(("MSTT", "GAZP"), pd.Timestamp("2021-01-15"), "CLOSE")
+    assert df.loc["2021-01-13", "MSTT"] == pytest.approx(9.0)
+
+
+def test_rebuild_revised_history(quotes_panel, tmp_path):
+    new_quotes = dict(QUOTES)
+    new_quotes["GAZP"] = make_quotes(
+        ["2021-01-12", "2021-01-13", "2021-01-18"],
+        [5.5, np.nan, 6.0],
+        [50.0, 60.0, 70.0],
+    )
+    gens = {path.name for path in tmp_path.iterdir() if path.is_dir()}
+
+    quotes_panel.save(new_quotes, pd.Timestamp("2021-01-18"))
+
+    assert {path.name for path in tmp_path.iterdir() if path.is_dir()}.isdisjoint(gens)
+    df = quotes_panel.load(("GAZP",), pd.Timestamp("2021-01-18"), "CLOSE")
+    assert df.loc["2021-01-12", "GAZP"] == pytest.approx(5.5)
+    assert df.loc["2021-01-18", "GAZP"] == pytest.approx(6.0)
+
+
+def test_new_version(tmp_path):
+    quotes_panel = panel.Panel(tmp_path)
+    quotes_panel.save(QUOTES, pd.Timestamp("2021-01-15"), "old")
+    last_date = pd.Timestamp("2021-01-15")
+
+    assert quotes_panel.load(("AKRN",), last_date, "CLOSE", "old") is not None
+    assert quotes_panel.load(("AKRN",), last_date, "CLOSE", "new") is None
+
+    quotes_panel.save(QUOTES, last_date, "new")
+
+    assert quotes_panel.load(("AKRN",), last_date, "CLOSE", "old") is None
+    df = quotes_panel.load(("AKRN",), last_date, "CLOSE", "new")
+    pd.testing.assert_frame_equal(
+        df,
+        concat_field(("AKRN",), last_date, "CLOSE"),
+        check_freq=False,
+        check_index_type=False,
+    )
@@ -38,6 +38,17 @@ class Viewer:
         tasks = [self._query(group, name) for name in names]
         return self._loop.run_until_complete(asyncio.gather(*tasks))
 
+    def last_update(self, group: str) -> str:
+        """Время последнего обновления таблиц группы.
+
+        Используется в качестве версии данных группы — при обновлении или пересмотре любой таблицы
+        версия меняется.
+        """
+        timestamp = self._loop.run_until_complete(
+            self._mapper.last_value(base.PACKAGE, group, "timestamp"),
+        )
+        return str(timestamp)
+
     async def _query(
         self,
         group: str,
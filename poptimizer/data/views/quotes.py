@@ -5,10 +5,31 @@ import numpy as np
 import pandas as pd
 from pandas.tseries import offsets
 
+from poptimizer import config
+from poptimizer.data.adapters import panel
+from poptimizer.data import ports
+from poptimizer.data.app import bootstrap
 from poptimizer.data.views.crop import div, not_div
 from poptimizer.shared import col
 
 
+def _quotes_field(tickers: tuple[str, ...], last_date: pd.Timestamp, field: str) -> pd.DataFrame:
+    """Значения поля котировок для тикеров до указанной даты включительно без заполнения пропусков.
+
+    Данные загружаются из панели на диске, а при отсутствии в ней нужных тикеров или дат, а также
+    при обновлении котировок в базе данных, панель дополняется или перестраивается.
+    """
+    quotes_panel = panel.Panel(config.PANEL_PATH / str(bootstrap.START_DATE))
+    version = bootstrap.VIEWER.last_update(ports.QUOTES)
+    if (df := quotes_panel.load(tickers, last_date, field, version)) is not None:
+        return df
+
+    all_tickers = tuple(dict.fromkeys(quotes_panel.tickers + tickers))
+    quotes_panel.save(dict(zip(all_tickers, not_div.quotes(all_tickers))), last_date, version)
+
+    return quotes_panel.load(tickers, last_date, field, version)
+
+
 @functools.lru_cache(maxsize=4)
 def prices(
     tickers: tuple[str, ...],
@@ -28,13 +49,7 @@ def prices(
     :return:
         Цены закрытия.
     """
-    quotes_list = not_div.quotes(tickers)
-    df = pd.concat(
-        [df[price_type] for df in quotes_list],
-        axis=1,
-    )
-    df = df.loc[:last_date]
-    df.columns = tickers
+    df = _quotes_field(tickers, last_date, price_type)
     return df.replace(to_replace=[np.nan, 0], method="ffill")
 
 
@@ -51,13 +66,7 @@ def turnovers(tickers: tuple[str, ...], last_date: pd.Timestamp) -> pd.DataFrame
     :return:
         Обороты.
     """
-    quotes_list = not_div.quotes(tickers)
-    df = pd.concat(
-        [df[col.TURNOVER] for df in quotes_list],
-        axis=1,
-    )
-    df = df.loc[:last_date]
-    df.columns = tickers
+    df = _quotes_field(tickers, last_date, col.TURNOVER)
     return df.fillna(0, axis=0)
 
 
@@ -1,4 +1,4 @@
 """Прогнозирование доходности  с помощью нейронных сетей."""
 from poptimizer.dl.data_loader import PhenotypeData
 from poptimizer.dl.forecast import Forecast
-from poptimizer.dl.model import Model, ModelError
+from poptimizer.dl.model import CURVE_POINTS, Model, ModelError, PrunedError, check_cost
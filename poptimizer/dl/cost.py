@@ -0,0 +1,166 @@
+"""Оценка затрат на модель по фенотипу без загрузки данных.
+
+Сеть создается на мета-устройстве, поэтому веса не размещаются в памяти, а прямой проход вычисляет
+только размеры тензоров. Это позволяет быстро получить количество параметров, операций и объем
+памяти для активаций, чтобы отбраковать непригодные модели до загрузки данных.
+"""
+import dataclasses
+import functools
+import json
+
+import numpy as np
+import numpy.typing as npt
+import torch
+from torch.utils import flop_counter
+
+from poptimizer.dl import data_loader, models
+from poptimizer.dl.features.feature import FeatureType
+from poptimizer.dl.features.data_params import FORECAST_DAYS
+from poptimizer.shared import col
+
+# Количество значений признака дня года
+_DAYS_IN_YEAR = 366
+
+# Размер float32 в байтах
+_FLOAT_SIZE = 4
+
+# Количество сохраняемых оценок затрат
+_CACHE_SIZE = 1024
+
+# Описание признаков в формате загрузчика данных
+FeaturesDescription = dict[str, tuple[FeatureType, int]]
+
+
+def features_description(phenotype: data_loader.PhenotypeData, n_tickers: int) -> FeaturesDescription:
+    """Описание включенных признаков, совпадающее с описанием загрузчика данных."""
+    history_days: int = phenotype["data"]["history_days"]  # type: ignore
+    special = {
+        "Label": (FeatureType.LABEL, FORECAST_DAYS),
+        "Ticker": (FeatureType.EMBEDDING, n_tickers),
+        "TickerType": (FeatureType.EMBEDDING, col.TYPES_N),
+        "DayOfYear": (FeatureType.EMBEDDING_SEQUENCE, _DAYS_IN_YEAR),
+        "DayOfPeriod": (FeatureType.EMBEDDING_SEQUENCE, history_days),
+    }
+
+    return {
+        name: special.get(name, (FeatureType.SEQUENCE, history_days))
+        for name, feat_params in phenotype["data"]["features"].items()
+        if feat_params["on"]
+    }
+
+
+@dataclasses.dataclass(frozen=True)
+class Cost:
+    """Затраты на модель.
+
+    :param params:
+        Количество параметров.
+    :param flops:
+        Количество операций с плавающей точкой при прямом проходе для одного примера.
+    :param memory:
+        Объем памяти в байтах для выходов всех слоев на одном батче.
+    """
+
+    params: int
+    flops: int
+    memory: int
+
+
+def estimate(phenotype: data_loader.PhenotypeData, n_tickers: int) -> Cost:
+    """Оценивает затраты на модель по фенотипу.
+
+    Оценки для одинаковых архитектур и наборов признаков кешируются.
+    """
+    key = {
+        "type": phenotype["type"],
+        "model": phenotype["model"],
+        "batch_size": phenotype["data"]["batch_size"],
+        "features": {
+            name: (feature_type.value, size)
+            for name, (feature_type, size) in features_description(phenotype, n_tickers).items()
+        },
+        "history_days": phenotype["data"]["history_days"],
+    }
+    return _estimate(json.dumps(key, sort_keys=True))
+
+
+def train_flops(phenotype: data_loader.PhenotypeData, cost: Cost) -> float:
+    """Операции прямого прохода для одного примера, умноженные на количество эпох обучения."""
+    epochs: float = phenotype["scheduler"]["epochs"]  # type: ignore
+    return cost.flops * epochs
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def _estimate(key: str) -> Cost:
+    params = json.loads(key)
+    description = {
+        name: (FeatureType(feature_type), size)
+        for name, (feature_type, size) in params["features"].items()
+    }
+    history_days = params["history_days"]
+
+    with torch.device("meta"):
+        model_type = getattr(models, params["type"])
+        net = model_type(history_days, description, **params["model"])
+        batch = _meta_batch(description, history_days)
+
+    outputs = []
+    hooks = [
+        module.register_forward_hook(lambda _, __, output: outputs.append(output))
+        for module in net.modules()
+        if not list(module.children())
+    ]
+    net.eval()
+    with flop_counter.FlopCounterMode(display=False) as counter:
+        net(batch)
+    for hook in hooks:
+        hook.remove()
+
+    return Cost(
+        params=sum(tensor.numel() for tensor in net.parameters()),
+        flops=counter.get_total_flops(),
+        memory=sum(_numel(output) for output in outputs) * _FLOAT_SIZE * params["batch_size"],
+    )
+
+
+def _meta_batch(description: FeaturesDescription, history_days: int) -> dict[str, torch.Tensor]:
+    batch = {}
+    for name, (feature_type, _) in description.items():
+        if feature_type is FeatureType.SEQUENCE:
+            batch[name] = torch.zeros(1, history_days)
+        elif feature_type is FeatureType.EMBEDDING_SEQUENCE:
+            batch[name] = torch.zeros(1, history_days, dtype=torch.long)
+        elif feature_type is FeatureType.EMBEDDING:
+            batch[name] = torch.zeros(1, dtype=torch.long)
+
+    return batch
+
+
+def _numel(output: object) -> int:
+    if isinstance(output, torch.Tensor):
+        return output.numel()
+    if isinstance(output, (tuple, list)):
+        return sum(_numel(tensor) for tensor in output)
+    return 0
+
+
+class TimeModel:
+    """Прогноз времени обучения в секундах по количеству операций.
+
+    Калибруется на фактическом времени оценки организмов с помощью регрессии логарифма времени на
+    логарифм количества операций на пример, умноженного на количество эпох.
+    """
+
+    def __init__(self) -> None:
+        """Создает не калиброванную модель с неопределенными коэффициентами."""
+        self._coef: npt.NDArray[np.float64] = np.full(2, np.nan)
+
+    def fit(self, flops: npt.NDArray[np.float64], seconds: npt.NDArray[np.float64]) -> "TimeModel":
+        """Калибрует модель по фактическому времени обучения."""
+        self._coef = np.polyfit(np.log(flops), np.log(seconds), 1)
+        return self
+
+    def predict(self, flops: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        """Прогноз времени обучения в секундах."""
+        seconds: npt.NDArray[np.float64] = np.exp(np.polyval(self._coef, np.log(flops)))
+        return seconds
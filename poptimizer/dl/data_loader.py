@@ -2,10 +2,13 @@
 from typing import Any, Dict, List, Tuple, Type, Union
 
 import pandas as pd
+import torch
 from torch import Tensor
 from torch.utils import data
 
+from poptimizer.config import DEVICE
 from poptimizer.dl import features
+from poptimizer.dl.features.feature_store import STORE
 
 # Описание фенотипа и его подразделов
 PhenotypeData = Dict[str, Union[Any, "PhenotypeData"]]
@@ -17,16 +20,21 @@ class OneTickerDataset(data.Dataset):
     def __init__(self, ticker: str, params: features.DataParams):
         self.len = params.len(ticker)
         self.features = [
-            getattr(features, feat_name)(ticker, params) for feat_name in params.get_all_feat()
+            STORE.get(getattr(features, feat_name), ticker, params)
+            for feat_name in params.get_all_feat()
         ]
 
     def __getitem__(self, item) -> Dict[str, Union[Tensor, List[Tensor]]]:
-        example = {}
+        example: Dict[str, Union[Tensor, List[Tensor]]] = {}
         for feature in self.features:
             key = feature.__class__.__name__
             example[key] = feature[item]
         return example
 
+    def batch(self, items: Tensor) -> Dict[str, Tensor]:
+        """Сразу несколько примеров — каждый признак формирует значения для всех номеров за раз."""
+        return {feature.__class__.__name__: feature.batch(items) for feature in self.features}
+
     def __len__(self) -> int:
         return self.len
 
@@ -40,6 +48,41 @@ class OneTickerDataset(data.Dataset):
         return features_description
 
 
+class TickersDataset(data.Dataset[Dict[str, Tensor]]):
+    """Объединяет примеры для нескольких тикеров и выдает их сразу целыми батчами.
+
+    В качестве индекса принимает набор номеров примеров, сквозных для всех тикеров, поэтому должен
+    использоваться с сэмплером, выдающим батчи номеров.
+    """
+
+    def __init__(self, data_sets: List[OneTickerDataset]):
+        """Запоминает границы сквозной нумерации примеров для каждого тикера."""
+        self._data_sets = data_sets
+        sizes = torch.tensor([len(data_set) for data_set in data_sets], dtype=torch.long)
+        self._ends = torch.cumsum(sizes, dim=0)
+        self._starts = self._ends - sizes
+
+    def __getitem__(self, items: List[int]) -> Dict[str, Tensor]:
+        """Примеры для набора номеров в том же порядке, в котором заданы номера."""
+        indices = torch.as_tensor(items, dtype=torch.long)
+        data_set_nums = torch.bucketize(indices, self._ends, right=True)
+
+        positions = []
+        batches = []
+        for num in torch.unique(data_set_nums).tolist():
+            mask = data_set_nums == num
+            positions.append(mask.nonzero().flatten())
+            local_items = indices[mask] - self._starts[num]
+            batches.append(self._data_sets[num].batch(local_items.to(DEVICE)))
+
+        order = torch.argsort(torch.cat(positions)).to(DEVICE)
+
+        return {key: torch.cat([batch[key] for batch in batches])[order] for key in batches[0]}
+
+    def __len__(self) -> int:
+        return int(self._ends[-1])
+
+
 class DescribedDataLoader(data.DataLoader):
     """Загрузчик данных, который дополнительно хранит описание параметров данных."""
 
@@ -63,17 +106,23 @@ class DescribedDataLoader(data.DataLoader):
         :param params_type:
             Тип формируемых признаков.
         """
-        params = params_type(tickers, end, params)
-        data_sets = [OneTickerDataset(ticker, params) for ticker in tickers]
+        data_params = params_type(tickers, end, params)
+        data_sets = [OneTickerDataset(ticker, data_params) for ticker in tickers]
+        data_set = TickersDataset(data_sets)
+        sampler_type = data.RandomSampler if data_params.shuffle else data.SequentialSampler
         super().__init__(
-            dataset=data.ConcatDataset(data_sets),
-            batch_size=params.batch_size,
-            shuffle=params.shuffle,
-            drop_last=False,
+            dataset=data_set,
+            # Сэмплер выдает батчи номеров, а признаки формируют батч целиком без поштучной сборки
+            batch_size=None,
+            sampler=data.BatchSampler(
+                sampler_type(data_set),
+                batch_size=data_params.batch_size,
+                drop_last=False,
+            ),
             num_workers=0,  # Загрузка в отдельном потоке - увеличение потоков не докидывает
         )
         self._features_description = data_sets[0].features_description
-        self._history_days = params.history_days
+        self._history_days = data_params.history_days
 
     @property
     def features_description(self) -> Dict[str, Tuple[features.FeatureType, int]]:
@@ -0,0 +1,119 @@
+"""Совместный прогноз для моделей с одинаковой архитектурой и признаками."""
+import collections
+import copy
+import json
+
+import pandas as pd
+import torch
+import tqdm
+from torch import func
+
+from poptimizer.config import DEVICE
+from poptimizer.dl import data_loader
+from poptimizer.dl.features import data_params
+from poptimizer.dl.forecast import Forecast
+from poptimizer.dl.model import Model, make_forecast
+
+# Максимальное количество моделей, прогноз которых рассчитывается одним проходом
+MAX_GROUP = 64
+
+
+def _group_key(phenotype: data_loader.PhenotypeData) -> str:
+    """Модели с одинаковым ключом имеют одинаковые наборы весов и одинаковые входные данные.
+
+    Ключ включает только параметры, определяющие размеры весов и входов: архитектуру, длину истории
+    и включенные признаки в порядке их следования. Размер батча и выключенные признаки не учитываются.
+    """
+    data = phenotype["data"]
+    features = [name for name, feat_params in data["features"].items() if feat_params["on"]]
+    return json.dumps(
+        [phenotype["type"], phenotype["model"], data["history_days"], features],
+        sort_keys=True,
+    )
+
+
+def forecast(
+    tickers: tuple[str, ...],
+    end: pd.Timestamp,
+    trained_models: list[tuple[data_loader.PhenotypeData, bytes]],
+) -> list[Forecast]:
+    """Прогнозы для набора натренированных моделей в порядке их следования.
+
+    Модели группируются по архитектуре и параметрам признаков. Для каждой группы данные загружаются
+    один раз, а веса моделей объединяются в общие тензоры, что позволяет рассчитать прогнозы всех
+    моделей группы одним векторизованным проходом.
+    """
+    groups = collections.defaultdict(list)
+    for n_model, (phenotype, _) in enumerate(trained_models):
+        groups[_group_key(phenotype)].append(n_model)
+
+    forecasts: dict[int, Forecast] = {}
+    with tqdm.tqdm(total=len(trained_models), desc="Forecasts") as bar:
+        for group in groups.values():
+            for start in range(0, len(group), MAX_GROUP):
+                chunk = group[start : start + MAX_GROUP]
+                chunk_models = [trained_models[n_model] for n_model in chunk]
+                for n_model, model_forecast in zip(chunk, _forecast_group(tickers, end, chunk_models)):
+                    forecasts[n_model] = model_forecast
+                bar.update(len(chunk))
+
+    return [forecasts[n_model] for n_model in range(len(trained_models))]
+
+
+def _forecast_group(
+    tickers: tuple[str, ...],
+    end: pd.Timestamp,
+    trained_models: list[tuple[data_loader.PhenotypeData, bytes]],
+) -> list[Forecast]:
+    """Прогнозы для моделей с одинаковым ключом группы."""
+    phenotype, _ = trained_models[0]
+    loader = data_loader.DescribedDataLoader(
+        tickers,
+        end,
+        phenotype["data"],
+        data_params.ForecastParams,
+    )
+
+    nets = []
+    for model_phenotype, pickled_model in trained_models:
+        model = Model(tickers, end, model_phenotype, pickled_model)
+        net = model.prepare_model(loader, verbose=False)
+        net.to(DEVICE)
+        net.eval()
+        nets.append(net)
+
+    params, buffers = func.stack_module_state(nets)
+    base = copy.deepcopy(nets[0]).to("meta")
+
+    def call_net(  # noqa: WPS430
+        net_params: dict[str, torch.Tensor],
+        net_buffers: dict[str, torch.Tensor],
+        batch: dict[str, torch.Tensor],
+    ) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        outputs: tuple[torch.Tensor, torch.Tensor, torch.Tensor] = func.functional_call(
+            base,
+            (net_params, net_buffers),
+            (batch,),
+        )
+        return outputs
+
+    ensemble = func.vmap(call_net, in_dims=(0, 0, None))
+
+    means = []
+    stds = []
+    with torch.no_grad():
+        for batch in loader:
+            dist = base.mixture(*ensemble(params, buffers, batch))  # type: ignore
+
+            means.append(dist.mean - torch.tensor(1.0))
+            stds.append(dist.variance ** 0.5)
+
+    nets_means = torch.cat(means, dim=1).cpu().numpy().reshape(len(nets), -1)
+    nets_stds = torch.cat(stds, dim=1).cpu().numpy().reshape(len(nets), -1)
+
+    history_days: int = phenotype["data"]["history_days"]  # type: ignore
+
+    return [
+        make_forecast(tickers, end, history_days, net_means, net_stds)
+        for net_means, net_stds in zip(nets_means, nets_stds)
+    ]
@@ -20,8 +20,9 @@ class DayOfPeriod(Feature):
 
         self.history_days = params.history_days
 
-    def __getitem__(self, item: int) -> torch.Tensor:
-        return torch.arange(self.history_days, device=DEVICE)
+    def batch(self, items: torch.Tensor) -> torch.Tensor:
+        history_days = self.history_days
+        return torch.arange(history_days, device=DEVICE).expand(len(items), history_days)
 
     @property
     def type_and_size(self) -> Tuple[FeatureType, int]:
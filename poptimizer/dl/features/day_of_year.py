@@ -5,7 +5,7 @@ import torch
 
 from poptimizer.config import DEVICE
 from poptimizer.dl.features.data_params import DataParams
-from poptimizer.dl.features.feature import Feature, FeatureType
+from poptimizer.dl.features.feature import Feature, FeatureType, windows
 
 
 class DayOfYear(Feature):
@@ -23,8 +23,8 @@ class DayOfYear(Feature):
 
         self.history_days = params.history_days
 
-    def __getitem__(self, item: int) -> torch.Tensor:
-        return self.day_of_year[item : item + self.history_days]
+    def batch(self, items: torch.Tensor) -> torch.Tensor:
+        return windows(self.day_of_year, items, self.history_days)
 
     @property
     def type_and_size(self) -> Tuple[FeatureType, int]:
@@ -5,7 +5,7 @@ import torch
 
 from poptimizer.config import DEVICE
 from poptimizer.dl.features.data_params import DataParams
-from poptimizer.dl.features.feature import Feature, FeatureType
+from poptimizer.dl.features.feature import Feature, FeatureType, windows
 
 
 class Dividends(Feature):
@@ -17,10 +17,9 @@ class Dividends(Feature):
         self.price = torch.tensor(params.price(ticker).values, dtype=torch.float, device=DEVICE)
         self.history_days = params.history_days
 
-    def __getitem__(self, item: int) -> torch.Tensor:
-        return (
-            self.div[item : item + self.history_days].cumsum(dim=0) / self.price[item]
-        )
+    def batch(self, items: torch.Tensor) -> torch.Tensor:
+        div = windows(self.div, items, self.history_days)
+        return div.cumsum(dim=1) / self.price[items].unsqueeze(1)
 
     @property
     def type_and_size(self) -> Tuple[FeatureType, int]:
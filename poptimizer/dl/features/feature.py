@@ -3,8 +3,10 @@ import abc
 import enum
 from typing import Tuple
 
+import torch
 from torch import Tensor
 
+from poptimizer.config import DEVICE
 from poptimizer.dl.features.data_params import DataParams
 
 
@@ -21,19 +23,36 @@ class FeatureType(enum.Enum):
     EMBEDDING_SEQUENCE = enum.auto()
 
 
+def windows(series: Tensor, items: Tensor, history_days: int) -> Tensor:
+    """Окна длинной history_days, начинающиеся с заданных номеров.
+
+    Окна формируются без копирования в виде представления ряда с перекрытием, а копируются только
+    выбранные строки.
+    """
+    return series.unfold(0, history_days, 1)[items]
+
+
 class Feature(abc.ABC):
     """Абстрактный класс признака.
 
-    Умеет выдавать значение признака для тикера по индексу и информацию о типе признака.
+    Умеет выдавать значение признака для тикера по индексу или сразу для батча индексов и информацию о
+    типе признака.
     """
 
     # noinspection PyUnusedLocal
     def __init__(self, ticker: str, params: DataParams):
         """Каждый признак должен сам сохранять необходимую для быстрого вычисления информацию."""
 
-    @abc.abstractmethod
     def __getitem__(self, item: int) -> Tensor:
         """Нумерация идет с начала ряда данных в кэше параметров данных."""
+        return self.batch(torch.tensor([item], dtype=torch.long, device=DEVICE))[0]
+
+    @abc.abstractmethod
+    def batch(self, items: Tensor) -> Tensor:
+        """Значения признака сразу для нескольких номеров примеров.
+
+        Первая размерность результата соответствует порядку номеров в items.
+        """
 
     @property
     @abc.abstractmethod
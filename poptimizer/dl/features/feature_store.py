@@ -0,0 +1,107 @@
+"""Общее для всех моделей хранилище признаков."""
+import collections
+import json
+from typing import Hashable, Optional, Tuple, Type
+
+import pandas as pd
+from torch import Tensor
+
+from poptimizer.dl.features.data_params import DataParams
+from poptimizer.dl.features.feature import Feature
+
+# Ограничение на суммарный размер тензоров признаков в хранилище в байтах
+MAX_SIZE = 2 * (2 ** 10) ** 3
+
+
+def _feature_size(feature: Feature) -> int:
+    """Суммарный размер тензоров, которые хранит признак."""
+    tensors = (attr for attr in vars(feature).values() if isinstance(attr, Tensor))  # noqa: WPS421
+    return sum(tensor.element_size() * tensor.nelement() for tensor in tensors)
+
+
+def _make_key(feature_type: Type[Feature], ticker: str, params: DataParams) -> Hashable:
+    """Ключ определяется всеми параметрами, от которых зависят значения признака."""
+    feat_params = json.dumps(params.get_feat_params(feature_type.__name__), sort_keys=True)
+    return (
+        feature_type.__name__,
+        params.__class__.__name__,
+        params.tickers,
+        params.end,
+        params.history_days,
+        ticker,
+        feat_params,
+    )
+
+
+class FeatureStore:
+    """Хранилище признаков общее для всех организмов в рамках процесса.
+
+    Организмы популяции обучаются на одних и тех же тикерах и датах, поэтому признаки с одинаковыми
+    параметрами строятся один раз. Признаки хранятся до превышения ограничения на размер, после чего
+    вытесняются давно не использовавшиеся. При появлении новых исторических данных хранилище
+    очищается.
+    """
+
+    def __init__(self, max_size: int = MAX_SIZE):
+        """Создает пустое хранилище с ограничением на размер в байтах."""
+        self._max_size = max_size
+        self._features: collections.OrderedDict[
+            Hashable,
+            Tuple[Feature, int],
+        ] = collections.OrderedDict()
+        self._size = 0
+        self._date: Optional[pd.Timestamp] = None
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self) -> int:
+        """Количество признаков в хранилище."""
+        return len(self._features)
+
+    @property
+    def size(self) -> int:
+        """Суммарный размер тензоров признаков в хранилище в байтах."""
+        return self._size
+
+    @property
+    def stats(self) -> Tuple[int, int]:
+        """Количество попаданий и промахов."""
+        return self._hits, self._misses
+
+    def get(self, feature_type: Type[Feature], ticker: str, params: DataParams) -> Feature:
+        """Загружает признак из хранилища или создает и сохраняет его."""
+        key = _make_key(feature_type, ticker, params)
+        if (cached := self._features.get(key)) is not None:
+            self._hits += 1
+            self._features.move_to_end(key)
+            feature, _ = cached
+            return feature
+
+        self._misses += 1
+        feature = feature_type(ticker, params)
+        size = _feature_size(feature)
+        self._features[key] = (feature, size)
+        self._size += size
+        self._evict()
+
+        return feature
+
+    def invalidate(self, date: pd.Timestamp) -> None:
+        """Очищает хранилище, если изменилась последняя дата исторических данных."""
+        if date != self._date:
+            self.clear()
+            self._date = date
+
+    def clear(self) -> None:
+        """Удаляет все признаки."""
+        self._features.clear()
+        self._size = 0
+
+    def _evict(self) -> None:
+        """Вытесняет давно не использовавшиеся признаки при превышении размера."""
+        while self._size > self._max_size and len(self._features) > 1:
+            _, (_, size) = self._features.popitem(last=False)
+            self._size -= size
+
+
+STORE = FeatureStore()
@@ -4,7 +4,7 @@ import torch
 from poptimizer.config import DEVICE
 from poptimizer.data.views import quotes
 from poptimizer.dl.features.data_params import DataParams
-from poptimizer.dl.features.feature import Feature, FeatureType
+from poptimizer.dl.features.feature import Feature, FeatureType, windows
 from poptimizer.shared import col
 
 
@@ -28,8 +28,8 @@ class High(Feature):
         self.price = torch.tensor(params.price(ticker).values, dtype=torch.float, device=DEVICE)
         self.history_days = params.history_days
 
-    def __getitem__(self, item: int) -> torch.Tensor:
-        return self.high[item : item + self.history_days] / self.price[item] - 1
+    def batch(self, items: torch.Tensor) -> torch.Tensor:
+        return windows(self.high, items, self.history_days) / self.price[items].unsqueeze(1) - 1
 
     @property
     def type_and_size(self) -> tuple[FeatureType, int]:
@@ -6,7 +6,7 @@ import torch
 from poptimizer.config import DEVICE
 from poptimizer.data.views import indexes
 from poptimizer.dl.features.data_params import DataParams
-from poptimizer.dl.features.feature import Feature, FeatureType
+from poptimizer.dl.features.feature import Feature, FeatureType, windows
 
 
 class IMOEX(Feature):
@@ -29,8 +29,9 @@ class IMOEX(Feature):
         self.imoex = torch.tensor(imoex.values, dtype=torch.float, device=DEVICE)
         self.history_days = params.history_days
 
-    def __getitem__(self, item: int) -> torch.Tensor:
-        return self.imoex[item : item + self.history_days] / self.imoex[item] - 1
+    def batch(self, items: torch.Tensor) -> torch.Tensor:
+        imoex = self.imoex
+        return windows(imoex, items, self.history_days) / imoex[items].unsqueeze(1) - 1
 
     @property
     def type_and_size(self) -> Tuple[FeatureType, int]:
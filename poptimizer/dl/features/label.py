@@ -18,11 +18,11 @@ class Label(Feature):
         self.price = torch.tensor(params.price(ticker).values, dtype=torch.float, device=DEVICE)
         self.history_days = params.history_days
 
-    def __getitem__(self, item: int) -> torch.Tensor:
+    def batch(self, items: torch.Tensor) -> torch.Tensor:
         price = self.price
         div = self.cum_div
 
-        start = item + self.history_days - 1
+        start = items + self.history_days - 1
         last_history_price = price[start]
         last_history_div = div[start]
 
@@ -33,7 +33,7 @@ class Label(Feature):
         div = last_forecast_div - last_history_div
         price_growth = last_forecast_price - last_history_price
         label = (price_growth + div) / last_history_price
-        return label.reshape(-1)
+        return label.reshape(-1, 1)
 
     @property
     def type_and_size(self) -> Tuple[FeatureType, int]:
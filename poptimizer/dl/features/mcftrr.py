@@ -6,7 +6,7 @@ import torch
 from poptimizer.config import DEVICE
 from poptimizer.data.views import indexes
 from poptimizer.dl.features.data_params import DataParams
-from poptimizer.dl.features.feature import Feature, FeatureType
+from poptimizer.dl.features.feature import Feature, FeatureType, windows
 
 
 class MCFTRR(Feature):
@@ -28,8 +28,9 @@ class MCFTRR(Feature):
         self.mcftrr = torch.tensor(mcftrr.values, dtype=torch.float, device=DEVICE)
         self.history_days = params.history_days
 
-    def __getitem__(self, item: int) -> torch.Tensor:
-        return self.mcftrr[item : item + self.history_days] / self.mcftrr[item] - 1
+    def batch(self, items: torch.Tensor) -> torch.Tensor:
+        mcftrr = self.mcftrr
+        return windows(mcftrr, items, self.history_days) / mcftrr[items].unsqueeze(1) - 1
 
     @property
     def type_and_size(self) -> Tuple[FeatureType, int]:
@@ -5,7 +5,7 @@ import torch
 
 from poptimizer.config import DEVICE
 from poptimizer.dl.features.data_params import DataParams
-from poptimizer.dl.features.feature import Feature, FeatureType
+from poptimizer.dl.features.feature import Feature, FeatureType, windows
 
 
 class Prices(Feature):
@@ -16,10 +16,9 @@ class Prices(Feature):
         self.price = torch.tensor(params.price(ticker).values, dtype=torch.float, device=DEVICE)
         self.history_days = params.history_days
 
-    def __getitem__(self, item: int) -> torch.Tensor:
-        history_days = self.history_days
+    def batch(self, items: torch.Tensor) -> torch.Tensor:
         price = self.price
-        return price[item : item + history_days] / price[item] - 1
+        return windows(price, items, self.history_days) / price[items].unsqueeze(1) - 1
 
     @property
     def type_and_size(self) -> Tuple[FeatureType, int]:
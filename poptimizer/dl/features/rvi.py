@@ -6,7 +6,7 @@ import torch
 from poptimizer.config import DEVICE
 from poptimizer.data.views import indexes
 from poptimizer.dl.features.data_params import DataParams
-from poptimizer.dl.features.feature import Feature, FeatureType
+from poptimizer.dl.features.feature import Feature, FeatureType, windows
 
 
 class RVI(Feature):
@@ -28,8 +28,8 @@ class RVI(Feature):
         self.rvi = torch.tensor(rvi.values, dtype=torch.float, device=DEVICE)
         self.history_days = params.history_days
 
-    def __getitem__(self, item: int) -> torch.Tensor:
-        return self.rvi[item : item + self.history_days]
+    def batch(self, items: torch.Tensor) -> torch.Tensor:
+        return windows(self.rvi, items, self.history_days)
 
     @property
     def type_and_size(self) -> Tuple[FeatureType, int]:
@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+import torch
+
+from poptimizer.dl.features import feature_store
+from poptimizer.dl.features.feature import Feature, FeatureType
+
+
+class FakeParams:
+    def __init__(self, history_days=4, end=pd.Timestamp("2021-04-09")):
+        self.tickers = ("AKRN", "GAZP")
+        self.end = end
+        self.history_days = history_days
+
+    def get_feat_params(self, feat_name):
+        return {"on": True}
+
+
+class FakeFeature(Feature):
+    COUNTER = 0
+
+    def __init__(self, ticker, params):
+        super().__init__(ticker, params)
+        self.__class__.COUNTER += 1
+        self.values = torch.zeros(10, dtype=torch.float)
+        self.history_days = params.history_days
+
+    def batch(self, items):
+        return self.values.unfold(0, self.history_days, 1)[items]
+
+    @property
+    def type_and_size(self):
+        return FeatureType.SEQUENCE, self.history_days
+
+
+@pytest.fixture(name="store")
+def make_store():
+    FakeFeature.COUNTER = 0
+    yield feature_store.FeatureStore(max_size=100)
+
+
+def test_get_cached(store):
+    params = FakeParams()
+    feature = store.get(FakeFeature, "AKRN", params)
+
+    assert store.get(FakeFeature, "AKRN", FakeParams()) is feature
+    assert FakeFeature.COUNTER == 1
+    assert store.stats == (1, 1)
+    assert len(store) == 1
+    assert store.size == 40
+
+
+def test_get_different_params(store):
+    feature = store.get(FakeFeature, "AKRN", FakeParams())
+
+    assert store.get(FakeFeature, "GAZP", FakeParams()) is not feature
+    assert store.get(FakeFeature, "AKRN", FakeParams(history_days=5)) is not feature
+    assert store.get(FakeFeature, "AKRN", FakeParams(end=pd.Timestamp("2021-04-10"))) is not feature
+    assert FakeFeature.COUNTER == 4
+
+
+def test_evict_least_recently_used(store):
+    first = store.get(FakeFeature, "AKRN", FakeParams())
+    second = store.get(FakeFeature, "GAZP", FakeParams())
+
+    assert store.get(FakeFeature, "AKRN", FakeParams()) is first
+
+    store.get(FakeFeature, "AKRN", FakeParams(history_days=5))
+
+    assert len(store) == 2
+    assert store.size == 80
+    assert store.get(FakeFeature, "AKRN", FakeParams()) is first
+    assert store.get(FakeFeature, "GAZP", FakeParams()) is not second
+
+
+def test_invalidate(store):
+    date = pd.Timestamp("2021-04-09")
+    store.invalidate(date)
+    store.get(FakeFeature, "AKRN", FakeParams())
+
+    store.invalidate(date)
+    assert len(store) == 1
+
+    store.invalidate(pd.Timestamp("2021-04-12"))
+    assert len(store) == 0
+    assert store.size == 0
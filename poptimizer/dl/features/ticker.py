@@ -17,8 +17,8 @@ class Ticker(Feature):
         self._num_tickers = len(tickers)
         self._idx = torch.tensor(tickers.index(ticker), dtype=torch.long, device=DEVICE)
 
-    def __getitem__(self, item: int) -> torch.Tensor:
-        return self._idx
+    def batch(self, items: torch.Tensor) -> torch.Tensor:
+        return self._idx.expand(len(items))
 
     @property
     def type_and_size(self) -> Tuple[FeatureType, int]:
@@ -23,8 +23,8 @@ class TickerType(Feature):
         ticker_type = listing.ticker_types()[ticker]
         self._ticker_type = torch.tensor(ticker_type, dtype=torch.long, device=DEVICE)
 
-    def __getitem__(self, item: int) -> torch.Tensor:
-        return self._ticker_type
+    def batch(self, items: torch.Tensor) -> torch.Tensor:
+        return self._ticker_type.expand(len(items))
 
     @property
     def type_and_size(self) -> Tuple[FeatureType, int]:
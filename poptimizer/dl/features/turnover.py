@@ -8,7 +8,7 @@ import poptimizer.data.views.quotes
 from poptimizer.config import DEVICE
 from poptimizer.data.views import listing
 from poptimizer.dl.features.data_params import DataParams
-from poptimizer.dl.features.feature import Feature, FeatureType
+from poptimizer.dl.features.feature import Feature, FeatureType, windows
 
 # Ключ для хранения данных оборота в кеше параметров данных
 TURNOVER = "turnover"
@@ -33,8 +33,8 @@ class Turnover(Feature):
         self.turnover = torch.log1p(turnover)
         self.history_days = params.history_days
 
-    def __getitem__(self, item: int) -> torch.Tensor:
-        return self.turnover[item : item + self.history_days]
+    def batch(self, items: torch.Tensor) -> torch.Tensor:
+        return windows(self.turnover, items, self.history_days)
 
     @property
     def type_and_size(self) -> Tuple[FeatureType, int]:
@@ -66,8 +66,8 @@ class AverageTurnover(Feature):
         self.turnover = torch.tensor(turnover.values, dtype=torch.float, device=DEVICE)
         self.history_days = params.history_days
 
-    def __getitem__(self, item: int) -> torch.Tensor:
-        return self.turnover[item : item + self.history_days]
+    def batch(self, items: torch.Tensor) -> torch.Tensor:
+        return windows(self.turnover, items, self.history_days)
 
     @property
     def type_and_size(self) -> Tuple[FeatureType, int]:
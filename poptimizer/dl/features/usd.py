@@ -6,7 +6,7 @@ import torch
 from poptimizer.config import DEVICE
 from poptimizer.data.views import indexes
 from poptimizer.dl.features.data_params import DataParams
-from poptimizer.dl.features.feature import Feature, FeatureType
+from poptimizer.dl.features.feature import Feature, FeatureType, windows
 
 
 class USD(Feature):
@@ -29,8 +29,9 @@ class USD(Feature):
         self.usd = torch.tensor(usd.values, dtype=torch.float, device=DEVICE)
         self.history_days = params.history_days
 
-    def __getitem__(self, item: int) -> torch.Tensor:
-        return self.usd[item : item + self.history_days] / self.usd[item] - 1
+    def batch(self, items: torch.Tensor) -> torch.Tensor:
+        usd = self.usd
+        return windows(usd, items, self.history_days) / usd[items].unsqueeze(1) - 1
 
     @property
     def type_and_size(self) -> Tuple[FeatureType, int]:
@@ -1,25 +1,297 @@
 """Представление прогноза."""
+import collections
 import dataclasses
-from typing import Tuple
+import hashlib
+import io
+import types
+from typing import Callable, Final, Iterable, Optional, Tuple, TypedDict
 
 import numpy as np
+import numpy.typing as npt
 import pandas as pd
+from pymongo.collection import Collection
 
 import poptimizer.data.views.quotes
+from poptimizer.config import COV_ESTIMATOR, POptimizerError
 from poptimizer.data.views import listing
-from poptimizer.dl import ledoit_wolf
+from poptimizer.dl import ledoit_wolf, ledoit_wolf_nonlinear
+from poptimizer.store.database import DB, MONGO_CLIENT
 
+# Максимальное количество корреляционных матриц в памяти процесса
+MAX_ENTRIES = 64
 
-def ledoit_wolf_cor(
-    tickers: tuple, date: pd.Timestamp, history_days: int
-) -> Tuple[np.array, float, float]:
-    """Корреляционная матрица на основе Ledoit Wolf."""
+# Коллекция для сохранения рассчитанных корреляционных матриц между процессами
+_COLLECTION = MONGO_CLIENT[DB]["ledoit_wolf"]
+
+Correlation = Tuple[npt.NDArray[np.float64], float, float]
+
+# Тикеры, дата, длина истории, способ оценки и версия данных корреляционной матрицы
+CorKey = tuple[tuple[str, ...], pd.Timestamp, int, str, str]
+
+
+class _CorFilter(TypedDict):
+    """Ключ сохраненной корреляционной матрицы."""
+
+    tickers: list[str]
+    date: pd.Timestamp
+    history_days: int
+    estimator: str
+    version: str
+
+
+class _CorDoc(_CorFilter):
+    """Сохраненная корреляционная матрица, средняя корреляция и сила сжатия."""
+
+    sigma: bytes
+    cor: float
+    shrinkage: float
+
+
+def _returns(tickers: tuple[str, ...], date: pd.Timestamp) -> pd.DataFrame:
     div, p1 = poptimizer.data.views.quotes.div_and_prices(tickers, date)
     p0 = p1.shift(1)
-    returns = (p1 + div) / p0
-    returns = returns.iloc[-history_days:]
-    returns = (returns - returns.mean()) / returns.std(ddof=0)
-    return ledoit_wolf.shrinkage(returns.values)
+    return (p1 + div) / p0
+
+
+def data_version(tickers: tuple[str, ...], date: pd.Timestamp) -> str:
+    """Хеш доходностей, по которым рассчитываются корреляционные матрицы.
+
+    Меняется при пересмотре котировок или дивидендов задним числом.
+    """
+    returns = np.ascontiguousarray(_returns(tickers, date).values)
+    return hashlib.sha1(returns.tobytes()).hexdigest()  # noqa: S324
+
+
+def ledoit_wolf_cors(
+    tickers: tuple[str, ...], date: pd.Timestamp, windows: Iterable[int]
+) -> dict[int, Correlation]:
+    """Корреляционные матрицы на основе Ledoit Wolf для нескольких длин истории за один проход."""
+    returns = _returns(tickers, date).values
+    return ledoit_wolf.multi_window(returns, windows, standardize=True)
+
+
+def qis_cors(
+    tickers: tuple[str, ...], date: pd.Timestamp, windows: Iterable[int]
+) -> dict[int, Correlation]:
+    """Корреляционные матрицы на основе нелинейного сжатия QIS для нескольких длин истории.
+
+    Выборочные корреляционные матрицы строятся за один проход, а каждая из них раскладывается на
+    собственные числа и векторы один раз. Сжатие оценивается как доля суммы квадратов внедиагональных
+    выборочных корреляций, устраненная оценкой. Для окон с пропусками в доходностях разложение
+    невозможно, поэтому оценки для них отсутствуют.
+    """
+    returns = _returns(tickers, date).values
+    cors = {}
+    for window, moments in ledoit_wolf.trailing(returns, windows):
+        sample_cor = moments.sample_cov(standardize=True)
+        if not np.isfinite(sample_cor).all():
+            cors[window] = np.full_like(sample_cor, np.nan), np.nan, np.nan
+            continue
+        n = len(moments) - 1
+        cov = ledoit_wolf_nonlinear.qis_from_spectrum(*ledoit_wolf_nonlinear.spectrum(sample_cor), n)
+
+        scale = np.diag(cov).reshape(-1, 1) ** -0.5
+        cor = cov * scale * scale.transpose()
+
+        p = len(cor)
+        off_diag = ~np.eye(p, dtype=bool)
+        average_cor = cor[off_diag].mean()
+        shrink = 1 - (cor[off_diag] ** 2).sum() / (sample_cor[off_diag] ** 2).sum()
+        cors[window] = cor, average_cor, shrink
+
+    return cors
+
+
+# Способы оценки корреляционной матрицы прогнозов
+ESTIMATORS: Final = types.MappingProxyType(
+    {
+        "ledoit_wolf": ledoit_wolf_cors,
+        "qis": qis_cors,
+    },
+)
+
+
+class EstimatorError(POptimizerError):
+    """Неизвестный способ оценки корреляционной матрицы."""
+
+
+def correlations(
+    tickers: tuple[str, ...], date: pd.Timestamp, windows: Iterable[int], estimator: str = COV_ESTIMATOR
+) -> dict[int, Correlation]:
+    """Корреляционные матрицы выбранным способом для нескольких длин истории."""
+    if (compute := ESTIMATORS.get(estimator)) is None:
+        raise EstimatorError(f"{estimator} не входит в {', '.join(ESTIMATORS)}")
+    return compute(tickers, date, windows)
+
+
+@dataclasses.dataclass
+class CorStats:
+    """Статистика обращений к хранилищу корреляционных матриц."""
+
+    hits: int = 0
+    loaded: int = 0
+    misses: int = 0
+
+    def __str__(self) -> str:
+        """Количество попаданий в память, загрузок из базы и расчетов."""
+        total = self.hits + self.loaded + self.misses
+        share = (self.hits + self.loaded) / max(1, total)
+        return (
+            f"Ledoit-Wolf cache - hits {self.hits}, loaded {self.loaded}, misses {self.misses} "
+            f"({share:.1%})"
+        )
+
+
+class CorStore:
+    """Хранилище корреляционных матриц общее для всех прогнозов.
+
+    Матрица зависит только от тикеров, даты, длины истории, способа оценки и версии данных, а значение
+    длины истории совпадает у многих организмов, поэтому каждая матрица рассчитывается один раз.
+    Матрицы для нескольких длин истории рассчитываются за один проход по накопленным моментам
+    доходностей. Рассчитанные хранятся в памяти процесса и в MongoDB, откуда их могут загрузить другие
+    процессы. При расчете матрицы на новую дату сохраненные матрицы на более ранние даты удаляются.
+
+    Версия данных определяется при первом обращении для тикеров и даты и обновляется при каждой
+    предварительной загрузке, поэтому пересмотр котировок или дивидендов приводит к пересчету матриц.
+    """
+
+    def __init__(
+        self,
+        collection: Collection[_CorDoc] = _COLLECTION,
+        compute: Callable[
+            [tuple[str, ...], pd.Timestamp, list[int], str],
+            dict[int, Correlation],
+        ] = correlations,
+        max_entries: int = MAX_ENTRIES,
+        version: Callable[[tuple[str, ...], pd.Timestamp], str] = data_version,
+    ) -> None:
+        """Создает пустое хранилище в памяти поверх коллекции MongoDB.
+
+        :param compute:
+            Функция расчета матриц по тикерам, дате, длинам истории и способу оценки.
+        :param version:
+            Функция версии данных, на основе которых рассчитываются матрицы, по тикерам и дате.
+        """
+        self._collection = collection
+        self._compute = compute
+        self._max_entries = max_entries
+        self._version = version
+        self._versions: dict[tuple[tuple[str, ...], pd.Timestamp], str] = {}
+        self._cache: collections.OrderedDict[CorKey, Correlation] = collections.OrderedDict()
+        self._stats = CorStats()
+
+    @property
+    def stats(self) -> CorStats:
+        """Статистика обращений."""
+        return self._stats
+
+    def prefetch(
+        self,
+        tickers: tuple[str, ...],
+        date: pd.Timestamp,
+        windows: Iterable[int],
+        estimator: str = COV_ESTIMATOR,
+    ) -> None:
+        """Загружает или рассчитывает за один проход матрицы для нескольких длин истории."""
+        version = self._refresh_version(tickers, date)
+        missing = []
+        for window in set(windows):
+            key = (tuple(tickers), date, window, estimator, version)
+            if key in self._cache:
+                continue
+            if (loaded := self._load(key)) is None:
+                missing.append(window)
+                continue
+            self._stats.loaded += 1
+            self._put(key, loaded)
+
+        if missing:
+            self._compute_missing(tickers, date, missing, estimator, version)
+
+    def get(
+        self,
+        tickers: tuple[str, ...],
+        date: pd.Timestamp,
+        history_days: int,
+        estimator: str = COV_ESTIMATOR,
+    ) -> Correlation:
+        """Корреляционная матрица, средняя корреляция и сила сжатия.
+
+        Матрица общая для всех прогнозов, поэтому доступна только для чтения.
+        """
+        if (version := self._versions.get((tuple(tickers), date))) is None:
+            version = self._refresh_version(tickers, date)
+        key = (tuple(tickers), date, history_days, estimator, version)
+        if (cached := self._cache.get(key)) is not None:
+            self._stats.hits += 1
+            self._cache.move_to_end(key)
+            return cached
+
+        if (loaded := self._load(key)) is not None:
+            self._stats.loaded += 1
+            self._put(key, loaded)
+        else:
+            self._compute_missing(tickers, date, [history_days], estimator, version)
+
+        return self._cache[key]
+
+    def _refresh_version(self, tickers: tuple[str, ...], date: pd.Timestamp) -> str:
+        version = self._version(tickers, date)
+        self._versions[(tuple(tickers), date)] = version
+        return version
+
+    def _compute_missing(
+        self,
+        tickers: tuple[str, ...],
+        date: pd.Timestamp,
+        windows: list[int],
+        estimator: str,
+        version: str,
+    ) -> None:
+        computed = self._compute(tickers, date, windows, estimator)
+        for window in windows:
+            key = (tuple(tickers), date, window, estimator, version)
+            self._stats.misses += 1
+            self._save(key, computed[window])
+            self._put(key, computed[window])
+
+    def _put(self, key: CorKey, correlation: Correlation) -> None:
+        correlation[0].flags.writeable = False
+        self._cache[key] = correlation
+        if len(self._cache) > self._max_entries:
+            self._cache.popitem(last=False)
+
+    def _load(self, key: CorKey) -> Optional[Correlation]:
+        doc = self._collection.find_one(_make_filter(key))
+        if doc is None:
+            return None
+        return np.load(io.BytesIO(doc["sigma"])), doc["cor"], doc["shrinkage"]
+
+    def _save(self, key: CorKey, correlation: Correlation) -> None:
+        sigma, average_cor, shrink = correlation
+        buffer = io.BytesIO()
+        np.save(buffer, sigma)
+        doc_filter = _make_filter(key)
+        doc = _CorDoc(**doc_filter, sigma=buffer.getvalue(), cor=average_cor, shrinkage=shrink)
+        replace_filter = {field: value for field, value in doc_filter.items() if field != "version"}
+
+        self._collection.delete_many({"date": {"$lt": doc_filter["date"]}})
+        # Матрица, рассчитанная по другой версии данных, заменяется
+        self._collection.replace_one(replace_filter, doc, upsert=True)
+
+
+def _make_filter(key: CorKey) -> _CorFilter:
+    tickers, date, history_days, estimator, version = key
+    return {
+        "tickers": list(tickers),
+        "date": date,
+        "history_days": history_days,
+        "estimator": estimator,
+        "version": version,
+    }
+
+
+COR_STORE = CorStore()
 
 
 @dataclasses.dataclass
@@ -31,11 +303,17 @@ class Forecast:
     history_days: int
     mean: pd.Series
     std: pd.Series
-    cov: np.array = dataclasses.field(init=False)
+    estimator: str = COV_ESTIMATOR
+    cov: npt.NDArray[np.float64] = dataclasses.field(init=False)
     cor: float = dataclasses.field(init=False)
     shrinkage: float = dataclasses.field(init=False)
 
-    def __post_init__(self):
-        sigma, self.cor, self.shrinkage = ledoit_wolf_cor(self.tickers, self.date, self.history_days)
+    def __post_init__(self) -> None:
+        sigma, self.cor, self.shrinkage = COR_STORE.get(
+            self.tickers,
+            self.date,
+            self.history_days,
+            self.estimator,
+        )
         std = self.std.values
         self.cov = std.reshape(1, -1) * sigma * std.reshape(-1, 1)
@@ -1,10 +1,11 @@
 """Ledoit & Wolf constant correlation unequal variance shrinkage estimator."""
-from typing import Tuple
+from typing import Iterable, Iterator, Tuple
 
 import numpy as np
+import numpy.typing as npt
 
 
-def shrinkage(returns: np.array) -> Tuple[np.array, float, float]:
+def shrinkage(returns: npt.NDArray[np.float64]) -> Tuple[npt.NDArray[np.float64], float, float]:
     """Shrinks sample covariance matrix towards constant correlation unequal variance matrix.
 
     Ledoit & Wolf ("Honey, I shrunk the sample covariance matrix", Portfolio Management, 30(2004),
@@ -29,6 +30,26 @@ def shrinkage(returns: np.array) -> Tuple[np.array, float, float]:
     returns -= mean_returns
     sample_cov = returns.transpose() @ returns / t
 
+    # pi-hat
+    y = returns ** 2
+    phi_mat = (y.transpose() @ y) / t - sample_cov ** 2
+
+    # rho-hat
+    var = np.diag(sample_cov).reshape(-1, 1)
+    theta_mat = ((returns ** 3).transpose() @ returns) / t - var * sample_cov
+
+    return _estimate(sample_cov, phi_mat, theta_mat, t)
+
+
+def _estimate(
+    sample_cov: npt.NDArray[np.float64],
+    phi_mat: npt.NDArray[np.float64],
+    theta_mat: npt.NDArray[np.float64],
+    t: int,
+) -> Tuple[npt.NDArray[np.float64], float, float]:
+    """Shrinkage estimator from the sample covariance and the fourth and third moments matrices."""
+    n = len(sample_cov)
+
     # sample average correlation
     var = np.diag(sample_cov).reshape(-1, 1)
     sqrt_var = var ** 0.5
@@ -38,12 +59,9 @@ def shrinkage(returns: np.array) -> Tuple[np.array, float, float]:
     np.fill_diagonal(prior, var)
 
     # pi-hat
-    y = returns ** 2
-    phi_mat = (y.transpose() @ y) / t - sample_cov ** 2
     phi = phi_mat.sum()
 
     # rho-hat
-    theta_mat = ((returns ** 3).transpose() @ returns) / t - var * sample_cov
     np.fill_diagonal(theta_mat, 0)
     rho = (
         np.diag(phi_mat).sum()
@@ -61,3 +79,183 @@ def shrinkage(returns: np.array) -> Tuple[np.array, float, float]:
     sigma = shrink * prior + (1 - shrink) * sample_cov
 
     return sigma, average_cor, shrink
+
+
+class Moments:
+    """Sums of powers and cross products of shifted returns over a window.
+
+    Returns are shifted by a constant close to their mean. The shift doesn't change central moments,
+    but keeps raw sums well conditioned. Rows can be added and removed, so the estimator for a window
+    of any length is obtained from the sums at a cost independent of the window length.
+    """
+
+    def __init__(self, shift: npt.NDArray[np.float64]):
+        """Creates empty sums for returns shifted by the given row."""
+        n = shift.size
+        self._shift = shift.reshape(1, -1)
+        self._t = 0
+        self._s1 = np.zeros(n)
+        self._s2 = np.zeros(n)
+        self._s3 = np.zeros(n)
+        self._s11 = np.zeros((n, n))
+        self._s21 = np.zeros((n, n))
+        self._s22 = np.zeros((n, n))
+        self._s31 = np.zeros((n, n))
+
+    def __len__(self) -> int:
+        """Number of observations in the window."""
+        return self._t
+
+    def add(self, rows: npt.NDArray[np.float64], sign: int = 1) -> None:
+        """Adds rows of returns to the window or removes them for negative sign."""
+        x1 = rows - self._shift
+        x2 = x1 ** 2
+        x3 = x2 * x1
+
+        self._t += sign * len(x1)
+        self._s1 += sign * x1.sum(axis=0)
+        self._s2 += sign * x2.sum(axis=0)
+        self._s3 += sign * x3.sum(axis=0)
+        self._s11 += sign * x1.transpose() @ x1
+        self._s21 += sign * x2.transpose() @ x1
+        self._s22 += sign * x2.transpose() @ x2
+        self._s31 += sign * x3.transpose() @ x1
+
+    def sample_cov(self, standardize: bool = False) -> npt.NDArray[np.float64]:
+        """Sample covariance matrix of the window or correlation matrix for standardized returns."""
+        mean = self._s1 / self._t
+        sample_cov = self._s11 / self._t - mean.reshape(-1, 1) * mean.reshape(1, -1)
+        if standardize:
+            scale = _scale(sample_cov)
+            sample_cov = sample_cov * scale * scale.transpose()
+        return sample_cov
+
+    def shrinkage(self, standardize: bool = False) -> Tuple[npt.NDArray[np.float64], float, float]:
+        """Same result as shrinkage for the returns of the window.
+
+        :param standardize:
+            Scale returns of each share to unit variance before shrinkage.
+        """
+        t = self._t
+        mean = self._s1 / t
+        p = mean.reshape(-1, 1)
+        q = mean.reshape(1, -1)
+        m2 = (self._s2 / t).reshape(-1, 1)
+        m3 = (self._s3 / t).reshape(-1, 1)
+        m11 = self._s11 / t
+        m21 = self._s21 / t
+
+        # central moments E[(a - p)(b - q)], E[(a - p)^2(b - q)^2] and E[(a - p)^3(b - q)]
+        c11 = self.sample_cov()
+        c22 = (
+            self._s22 / t
+            - 2 * q * m21
+            - 2 * p * m21.transpose()
+            + q ** 2 * m2
+            + p ** 2 * m2.transpose()
+            + 4 * p * q * m11
+            - 3 * p ** 2 * q ** 2
+        )
+        c31 = self._s31 / t - q * m3 - 3 * p * m21 + 3 * p * q * m2 + 3 * p ** 2 * m11 - 3 * p ** 3 * q
+
+        if standardize:
+            scale = _scale(c11)
+            c11 = c11 * scale * scale.transpose()
+            c22 = c22 * scale ** 2 * scale.transpose() ** 2
+            c31 = c31 * scale ** 3 * scale.transpose()
+
+        var = np.diag(c11).reshape(-1, 1)
+
+        return _estimate(c11, c22 - c11 ** 2, c31 - var * c11, t)
+
+
+def _scale(sample_cov: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    return np.diag(sample_cov).reshape(-1, 1) ** -0.5
+
+
+def _finite_mean(returns: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """Mean of finite returns of each share or zero if there are none.
+
+    The shift must be finite, otherwise missing returns in the longest window would spoil sums of
+    all shorter windows.
+    """
+    finite = np.isfinite(returns)
+    total: npt.NDArray[np.float64] = np.where(finite, returns, 0).sum(axis=0)
+    count: npt.NDArray[np.float64] = np.maximum(finite.sum(axis=0), 1)
+    return total / count
+
+
+def trailing(returns: npt.NDArray[np.float64], windows: Iterable[int]) -> Iterator[Tuple[int, Moments]]:
+    """Sums for trailing windows of returns in ascending order of their lengths.
+
+    Sums are accumulated from the most recent rows, so each row is processed once for all windows.
+    The same Moments object is updated and yielded for each window. Windows longer than returns
+    contain all returns. Only windows that contain missing returns have missing sums.
+    """
+    windows = sorted(set(windows))
+    t = len(returns)
+    moments = Moments(_finite_mean(returns[-windows[-1] :]))
+
+    start = t
+    for window in windows:
+        begin = max(t - window, 0)
+        moments.add(returns[begin:start])
+        start = begin
+        yield window, moments
+
+
+def multi_window(
+    returns: npt.NDArray[np.float64],
+    windows: Iterable[int],
+    standardize: bool = False,
+) -> dict[int, Tuple[npt.NDArray[np.float64], float, float]]:
+    """Shrinkage estimators for several trailing windows of returns.
+
+    :param returns:
+        t, n - returns of t observations of n shares.
+    :param windows:
+        Lengths of trailing windows.
+    :param standardize:
+        Scale returns of each share in each window to unit variance before shrinkage.
+    :return:
+        Covariance matrix, sample average correlation and shrinkage for each window.
+    """
+    return {window: moments.shrinkage(standardize) for window, moments in trailing(returns, windows)}
+
+
+def rolling(
+    returns: npt.NDArray[np.float64],
+    window: int,
+    standardize: bool = False,
+) -> Iterator[Tuple[npt.NDArray[np.float64], float, float]]:
+    """Shrinkage estimators for a window rolling over returns one observation at a time.
+
+    :param returns:
+        t, n - returns of t observations of n shares.
+    :param window:
+        Length of the window.
+    :param standardize:
+        Scale returns of each share in each window to unit variance before shrinkage.
+    :return:
+        Covariance matrix, sample average correlation and shrinkage for windows ending at each
+        observation starting from the window-th one. Estimators for windows with missing returns
+        are missing.
+    """
+    moments = _window_moments(returns[:window])
+    yield moments.shrinkage(standardize)
+
+    for end in range(window, len(returns)):
+        removed = returns[end - window : end - window + 1]
+        if np.isfinite(removed).all():
+            moments.add(returns[end : end + 1])
+            moments.add(removed, sign=-1)
+        else:
+            # Missing returns can't be subtracted from sums, so they are accumulated anew
+            moments = _window_moments(returns[end - window + 1 : end + 1])
+        yield moments.shrinkage(standardize)
+
+
+def _window_moments(returns: npt.NDArray[np.float64]) -> Moments:
+    moments = Moments(_finite_mean(returns))
+    moments.add(returns)
+    return moments
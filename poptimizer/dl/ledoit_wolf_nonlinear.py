@@ -1,7 +1,10 @@
+from typing import Tuple
+
 import numpy as np
+import numpy.typing as npt
 
 
-def qis(returns: np.array, k=1) -> np.array:
+def qis(returns: npt.NDArray[np.float64], k: int = 1) -> npt.NDArray[np.float64]:
     """The estimator keeps the eigenvectors of the sample covariance matrix and applies shrinkage
     to the inverse sample eigenvalues.
     Non-normality and the case where the matrix dimension exceeds the sample size are accommodated.
@@ -23,9 +26,16 @@ def qis(returns: np.array, k=1) -> np.array:
     mean_rets = np.mean(returns, axis=0, keepdims=True)
     returns -= mean_rets
     n = n - k
-    c = p / n  # concentration ratio
     sample = returns.transpose() @ returns / n
 
+    return qis_from_spectrum(*spectrum(sample), n)
+
+
+def spectrum(sample: npt.NDArray[np.float64]) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """Eigenvalues in ascending order and eigenvectors of the sample covariance matrix.
+
+    Decomposition is the most expensive step of QIS, so it can be computed once and reused.
+    """
     # Spectral decomposition
     # Extract sample eigenvalues and eigenvectors
     # Note that linalg.eigh function returns eigenvalues in ascending order
@@ -34,6 +44,28 @@ def qis(returns: np.array, k=1) -> np.array:
     # Take real parts of eigenvalues and reset negative values to 0
     lambda1 = lambda1.real.clip(min=0)
 
+    return lambda1, u
+
+
+def qis_from_spectrum(
+    lambda1: npt.NDArray[np.float64],
+    u: npt.NDArray[np.float64],
+    n: int,
+) -> npt.NDArray[np.float64]:
+    """Quadratic-Inverse Shrinkage estimator from the spectrum of the sample covariance matrix.
+
+    :param lambda1:
+        Sample eigenvalues in ascending order.
+    :param u:
+        Sample eigenvectors.
+    :param n:
+        Sample size adjusted for the lost degrees of freedom.
+    :return:
+        Covariance matrix.
+    """
+    p = len(lambda1)
+    c = p / n  # concentration ratio
+
     # COMPUTE Quadratic-Inverse Shrinkage estimator of the covariance matrix
     # smoothing parameter
     h = (min(c ** 2, 1 / c ** 2) ** 0.35) / p ** 0.35
@@ -67,12 +99,12 @@ def qis(returns: np.array, k=1) -> np.array:
     deltaqis = delta * (sum(lambda1) / sum(delta))
 
     # reconstruct covariance matrix
-    res = u @ np.diag(deltaqis) @ u.transpose().conjugate()
+    res: npt.NDArray[np.float64] = (u * deltaqis) @ u.transpose().conjugate()
 
     return res
 
 
-def analytical_shrinkage(returns: np.array, k=1) -> np.array:
+def analytical_shrinkage(returns: npt.NDArray[np.float64], k: int = 1) -> npt.NDArray[np.float64]:
     """This nonlinear shrinkage estimator explores connection between nonlinear shrinkage and
     nonparametric estimation of the Hilbert transform of the sample spectral density.
     Uses analytical formula for nonlinear shrinkage estimation of large-dimensional covariance matrices.
@@ -136,6 +168,6 @@ def analytical_shrinkage(returns: np.array, k=1) -> np.array:
         dtilde = np.concatenate((dtilde0 * np.ones((p - n, 1)), dtilde1.reshape(-1, 1)), axis=None)
 
     # reconstruct covariance matrix
-    res = u @ np.diag(dtilde) @ u.transpose()
+    res: npt.NDArray[np.float64] = u @ np.diag(dtilde) @ u.transpose()
 
     return res
@@ -0,0 +1,123 @@
+"""Потоковый расчет метрик качества модели на тестовой выборке.
+
+Оптимальный портфель для прогнозов с диагональной ковариацией имеет веса w = p * (m - λ), где p —
+обратная дисперсия, m — прогноз доходности, а λ = Σpm / Σp обеспечивает нулевую сумму весов.
+Так как λ входит в веса линейно, все метрики портфеля выражаются через суммы произведений p, pm и
+меток, которые накапливаются по батчам без хранения прогнозов.
+"""
+from typing import Final
+
+import numpy as np
+import torch
+from scipy import stats
+
+from poptimizer.config import YEAR_IN_TRADING_DAYS
+from poptimizer.dl.features import data_params
+
+# Индексы накапливаемых сумм
+_N: Final = 0
+_A: Final = 1
+_B: Final = 2
+_AY: Final = 3
+_BY: Final = 4
+_AAYY: Final = 5
+_ABYY: Final = 6
+_BBYY: Final = 7
+_AA: Final = 8
+_AB: Final = 9
+_BB: Final = 10
+_Y: Final = 11
+_YY: Final = 12
+_SUMS: Final = 13
+
+
+class Metrics:
+    """Накапливает достаточные статистики для LLH и оптимального портфеля по батчам.
+
+    Память не зависит от размера тестовой выборки, а время расчета линейно по количеству примеров.
+    """
+
+    def __init__(self) -> None:
+        """Инициализирует нулевые суммы."""
+        self._llh_sum = 0.0
+        self._sums = np.zeros(_SUMS)
+
+    def update(
+        self,
+        loss: torch.Tensor,
+        mean: torch.Tensor,
+        var: torch.Tensor,
+        labels: torch.Tensor,
+    ) -> None:
+        """Добавляет результаты батча — сумму минус логарифмов правдоподобия, прогнозы и метки."""
+        self._llh_sum -= loss.item()
+
+        precision = 1 / var.double().flatten()
+        weighted = precision * mean.double().flatten()
+        labels = labels.double().flatten()
+        labels2 = labels ** 2
+
+        batch_sums = torch.stack(
+            [
+                torch.ones_like(labels),
+                weighted,
+                precision,
+                weighted * labels,
+                precision * labels,
+                weighted ** 2 * labels2,
+                weighted * precision * labels2,
+                precision ** 2 * labels2,
+                weighted ** 2,
+                weighted * precision,
+                precision ** 2,
+                labels,
+                labels2,
+            ],
+        ).sum(dim=1)
+        self._sums += batch_sums.cpu().numpy()
+
+    @property
+    def count(self) -> int:
+        """Количество примеров."""
+        return int(self._sums[_N])
+
+    @property
+    def llh(self) -> float:
+        """Средний логарифм правдоподобия в пересчете на дневное выражение."""
+        return float(self._llh_sum / self.count + np.log(data_params.FORECAST_DAYS) / 2)
+
+    @property
+    def t_test(self) -> tuple[float, float]:
+        """Одностороннее значение t-статистики и p-value для доходности оптимального портфеля."""
+        sums = self._sums
+        n = sums[_N]
+        lambda_ = self._lambda
+        mean = (sums[_AY] - lambda_ * sums[_BY]) / n
+        square = sums[_AAYY] - 2 * lambda_ * sums[_ABYY] + lambda_ ** 2 * sums[_BBYY]
+        std = ((square - n * mean ** 2) / (n - 1)) ** 0.5
+        t_stat = mean / std * n ** 0.5
+
+        return t_stat, stats.t.sf(t_stat, n - 1)
+
+    @property
+    def ic(self) -> float:
+        """Корреляция весов оптимального портфеля с метками."""
+        sums = self._sums
+        n = sums[_N]
+        lambda_ = self._lambda
+        cov = (sums[_AY] - lambda_ * sums[_BY]) / n
+        var_w = (sums[_AA] - 2 * lambda_ * sums[_AB] + lambda_ ** 2 * sums[_BB]) / n
+        var_y = sums[_YY] / n - (sums[_Y] / n) ** 2
+
+        return float(cov / (var_w * var_y) ** 0.5)
+
+    @property
+    def ir(self) -> float:
+        """Годовой коэффициент информации оптимального портфеля."""
+        t_stat, _ = self.t_test
+        annualization = (YEAR_IN_TRADING_DAYS / data_params.FORECAST_DAYS) ** 0.5
+        return float(t_stat / self.count ** 0.5 * annualization)
+
+    @property
+    def _lambda(self) -> float:
+        return float(self._sums[_A] / self._sums[_B])
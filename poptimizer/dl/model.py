@@ -6,23 +6,32 @@ import sys
 from typing import Optional
 
 import numpy as np
+import numpy.typing as npt
 import pandas as pd
 import torch
 import tqdm
-from numpy import linalg
-from scipy import stats
 from torch import nn, optim
 
-from poptimizer.config import DEVICE, YEAR_IN_TRADING_DAYS, POptimizerError
-from poptimizer.dl import data_loader, models
+from poptimizer.config import COMPILE, DEVICE, YEAR_IN_TRADING_DAYS, POptimizerError
+from poptimizer.dl import cost, data_loader, metrics, models, prefetch
 from poptimizer.dl.features import data_params
 from poptimizer.dl.forecast import Forecast
 
 # Ограничение на максимальное снижение правдоподобия во время обучения для его прерывания
 LLH_DRAW_DOWN = 1
 
-# Максимальный размер документа в MongoDB
-MAX_SIZE = 2 * (2 ** 10) ** 2
+# Количество контрольных точек кривой обучения, равномерно распределенных по шагам обучения
+CURVE_POINTS = 10
+
+# Обучение прерывается, если LLH в контрольной точке ниже данного квантиля кривых популяции
+PRUNE_QUANTILE = 0.25
+
+# Минимальное количество кривых популяции для прерывания обучения
+PRUNE_MIN_CURVES = 8
+
+# Максимальное количество параметров модели, если None — не ограничено. Веса хранятся в GridFS, поэтому
+# размер модели не ограничен размером документа MongoDB
+MAX_SIZE: Optional[int] = None
 
 
 class ModelError(POptimizerError):
@@ -46,7 +55,7 @@ class GradientsError(ModelError):
 class TooLargeModelError(ModelError):
     """Слишком большая модель.
 
-    Модель с 2 млн параметров не может быть сохранена.
+    Количество параметров превышает заданное ограничение.
     """
 
 
@@ -54,6 +63,24 @@ class DegeneratedModelError(ModelError):
     """В модели отключены все признаки."""
 
 
+class PrunedError(ModelError):
+    """Обучение прервано досрочно.
+
+    Кривая обучения в контрольной точке оказалась хуже заданного квантиля кривых популяции.
+    """
+
+
+def check_cost(phenotype: data_loader.PhenotypeData, n_tickers: int) -> cost.Cost:
+    """Оценивает затраты на модель и отбраковывает непригодные модели до загрузки данных."""
+    if len(cost.features_description(phenotype, n_tickers)) == 1:
+        raise DegeneratedModelError()
+    model_cost = cost.estimate(phenotype, n_tickers)
+    if MAX_SIZE is not None and model_cost.params > MAX_SIZE:
+        raise TooLargeModelError()
+
+    return model_cost
+
+
 def log_normal_llh_mix(
     model: nn.Module,
     batch: dict[str, torch.Tensor],
@@ -74,6 +101,8 @@ class Model:
         end: pd.Timestamp,
         phenotype: data_loader.PhenotypeData,
         pickled_model: Optional[bytes] = None,
+        warm_start: Optional[float] = None,
+        curves: Optional[np.ndarray] = None,
     ):
         """Сохраняет необходимые данные.
 
@@ -85,14 +114,23 @@ class Model:
             Параметры данных, модели, оптимизатора и политики обучения.
         :param pickled_model:
             Сохраненные параметры для натренированной модели.
+        :param warm_start:
+            Доля эпох политики обучения, в течение которых сохраненная модель дообучается. Если не
+            задана, то сохраненная модель используется без дообучения.
+        :param curves:
+            Кривые обучения организмов размером (кривые, CURVE_POINTS) для досрочного прерывания
+            бесперспективного обучения. Точки после прерывания обучения кривой равны NaN.
         """
         self._tickers = tickers
         self._end = end
         self._phenotype = phenotype
         self._pickled_model = pickled_model
+        self._warm_start = warm_start
+        self._curves = curves
 
-        self._model = None
-        self._llh = None
+        self._model: Optional[nn.Module] = None
+        self._llh: Optional[tuple[float, float]] = None
+        self._curve: Optional[list[float]] = None
 
     def __bytes__(self) -> bytes:
         """Сохраненные параметры для натренированной модели."""
@@ -107,6 +145,11 @@ class Model:
         torch.save(state_dict, buffer)
         return buffer.getvalue()
 
+    @property
+    def curve(self) -> Optional[list[float]]:
+        """LLH на обучении в контрольных точках, если модель обучалась."""
+        return self._curve
+
     @property
     def quality_metrics(self) -> tuple[float, float]:
         """Логарифм правдоподобия."""
@@ -120,8 +163,11 @@ class Model:
             return self._model
 
         pickled_model = self._pickled_model
-        if pickled_model:
+        if pickled_model and self._warm_start is None:
             self._model = self._load_trained_model(pickled_model, loader, verbose)
+        elif pickled_model:
+            self._model = self._train_model(pickled_model)
+            self._pickled_model = None
         else:
             self._model = self._train_model()
 
@@ -132,7 +178,12 @@ class Model:
 
         Прогнозы пересчитываются в дневное выражение для сопоставимости и вычисляется логарифм
         правдоподобия. Модель загружается при наличии сохраненных весов или обучается с нуля.
+
+        Тестовая выборка содержит по одному примеру на тикер для последнего окна, не пересекающегося
+        с обучающей выборкой, поэтому повторная оценка занимает один проход по тикерам.
         """
+        check_cost(self._phenotype, len(self._tickers))
+
         loader = data_loader.DescribedDataLoader(
             self._tickers,
             self._end,
@@ -149,33 +200,22 @@ class Model:
         model.to(DEVICE)
         loss_fn = log_normal_llh_mix
 
-        llh_sum = 0
-        weight_sum = 0
-        all_means = []
-        all_vars = []
-        all_labels = []
-
         print(f"Тестовых дней: {days}")
         print(f"Тестовых примеров: {len(loader.dataset)}")
-        llh_adj = np.log(data_params.FORECAST_DAYS) / 2
+        test_metrics = metrics.Metrics()
         with torch.no_grad():
             model.eval()
-            bars = tqdm.tqdm(loader, file=sys.stdout, desc="~~> Test")
+            batches = prefetch.Prefetcher(loader)
+            bars = tqdm.tqdm(batches, file=sys.stdout, total=len(loader), desc="~~> Test")
             for batch in bars:
                 loss, mean, var = loss_fn(model, batch)
-                llh_sum -= loss.item()
-                weight_sum += mean.shape[0]
-                all_means.append(mean)
-                all_vars.append(var)
-                all_labels.append(batch["Label"])
-
-                bars.set_postfix_str(f"{llh_sum / weight_sum + llh_adj:.5f}")
-
-        all_means = torch.cat(all_means).cpu().numpy().flatten()
-        all_vars = torch.cat(all_vars).cpu().numpy().flatten()
-        all_labels = torch.cat(all_labels).cpu().numpy().flatten()
-        llh = llh_sum / weight_sum + llh_adj
-        ir = _opt_port(all_means, all_vars, all_labels)
+                test_metrics.update(loss, mean, var, batch["Label"])
+
+                bars.set_postfix_str(f"{test_metrics.llh:.5f}")
+
+        llh = test_metrics.llh
+        ir = _report(test_metrics)
+        print(batches.stats)
         print(f"LLH:   {llh:.4f}")
 
         return llh, ir
@@ -188,9 +228,7 @@ class Model:
     ) -> nn.Module:
         """Создание тренированной модели."""
         model = self._make_untrained_model(loader, verbose)
-        buffer = io.BytesIO(pickled_model)
-        state_dict = torch.load(buffer)
-        model.load_state_dict(state_dict)
+        _load_state(model, pickled_model)
         return model
 
     def _make_untrained_model(
@@ -207,13 +245,13 @@ class Model:
             print(f"Количество слоев - {modules}")
             model_params = sum(tensor.numel() for tensor in model.parameters())
             print(f"Количество параметров - {model_params}")
-            if model_params > MAX_SIZE:
+            if MAX_SIZE is not None and model_params > MAX_SIZE:
                 raise TooLargeModelError()
 
         return model
 
-    def _train_model(self) -> nn.Module:
-        """Тренировка модели."""
+    def _train_model(self, pickled_model: Optional[bytes] = None) -> nn.Module:
+        """Тренировка модели с нуля или дообучение сохраненной модели."""
         phenotype = self._phenotype
 
         loader = data_loader.DescribedDataLoader(
@@ -227,12 +265,18 @@ class Model:
             raise DegeneratedModelError()
 
         model = self._make_untrained_model(loader)
+        if pickled_model:
+            _load_state(model, pickled_model)
         model.to(DEVICE)
+        if phenotype.get("compile", COMPILE):
+            _compile(model)
         optimizer = optim.AdamW(model.parameters(), **phenotype["optimizer"])
 
         steps_per_epoch = len(loader)
         scheduler_params = dict(phenotype["scheduler"])
         epochs = scheduler_params.pop("epochs")
+        if pickled_model:
+            epochs *= self._warm_start
         total_steps = 1 + int(steps_per_epoch * epochs)
         scheduler_params["total_steps"] = total_steps
         scheduler = optim.lr_scheduler.OneCycleLR(optimizer, **scheduler_params)
@@ -249,12 +293,16 @@ class Model:
         loader = itertools.repeat(loader)
         loader = itertools.chain.from_iterable(loader)
         loader = itertools.islice(loader, total_steps)
+        batches = prefetch.Prefetcher(loader)
 
         model.train()
-        bars = tqdm.tqdm(loader, file=sys.stdout, total=total_steps, desc="~~> Train")
+        bars = tqdm.tqdm(batches, file=sys.stdout, total=total_steps, desc="~~> Train")
         llh_min = None
         llh_adj = np.log(data_params.FORECAST_DAYS) / 2
-        for batch in bars:
+        checkpoints = [total_steps * point // CURVE_POINTS for point in range(1, CURVE_POINTS + 1)]
+        curve: list[float] = []
+        self._curve = curve
+        for step, batch in enumerate(bars, 1):
             optimizer.zero_grad()
 
             loss, means, _ = loss_fn(model, batch)
@@ -278,8 +326,31 @@ class Model:
             if not (llh > llh_min):
                 raise GradientsError(llh)
 
+            while len(curve) < CURVE_POINTS and step >= checkpoints[len(curve)]:
+                curve.append(float(llh))
+                self._prune(len(curve) - 1, llh)
+
+        print(batches.stats)
+
         return model
 
+    def _prune(self, point: int, llh: float) -> None:
+        """Прерывает обучение, если LLH в контрольной точке хуже квантиля кривых популяции.
+
+        Учитываются только кривые, дошедшие до контрольной точки.
+        """
+        if self._curves is None or point == CURVE_POINTS - 1:
+            return
+
+        llh_at_point = self._curves[:, point]
+        llh_at_point = llh_at_point[~np.isnan(llh_at_point)]
+        if len(llh_at_point) < PRUNE_MIN_CURVES:
+            return
+
+        threshold = np.quantile(llh_at_point, PRUNE_QUANTILE)
+        if llh < threshold:
+            raise PrunedError(f"LLH {llh:.4f} < {threshold:.4f} в точке {point + 1}/{CURVE_POINTS}")
+
     def forecast(self) -> Forecast:
         """Прогноз годовой доходности."""
         loader = data_loader.DescribedDataLoader(
@@ -302,41 +373,80 @@ class Model:
                 means.append(dist.mean - torch.tensor(1.0))
                 stds.append(dist.variance ** 0.5)
 
-        means = torch.cat(means, dim=0).cpu().numpy().flatten()
-        stds = torch.cat(stds, dim=0).cpu().numpy().flatten()
-
-        means = pd.Series(means, index=list(self._tickers))
-        means = means.mul(YEAR_IN_TRADING_DAYS / data_params.FORECAST_DAYS)
-
-        stds = pd.Series(stds, index=list(self._tickers))
-        stds = stds.mul((YEAR_IN_TRADING_DAYS / data_params.FORECAST_DAYS) ** 0.5)
+        net_means = torch.cat(means, dim=0).cpu().numpy().flatten()
+        net_stds = torch.cat(stds, dim=0).cpu().numpy().flatten()
+        history_days: int = self._phenotype["data"]["history_days"]  # type: ignore
 
-        return Forecast(
-            tickers=self._tickers,
-            date=self._end,
-            history_days=self._phenotype["data"]["history_days"],
-            mean=means,
-            std=stds,
+        return make_forecast(
+            self._tickers,
+            self._end,
+            history_days,
+            net_means,
+            net_stds,
         )
 
 
-def _opt_weight(mean: np.array, var: np.array):
-    precision = linalg.inv(np.diag(var))
-    weighted_mean = precision @ mean.reshape(-1, 1)
-    lambda_ = weighted_mean.sum() / precision.sum()
-    optimal_weights = precision @ (mean.reshape(-1, 1) - lambda_)
-    return optimal_weights.ravel()
+def _compile(model: nn.Module) -> None:
+    """Компилирует модель на месте.
 
-
-def _opt_port(mean: np.array, var: np.array, labels: np.array) -> float:
-    weight = _opt_weight(mean, var)
-
-    rez = stats.ttest_1samp(weight * labels, 0, alternative="greater")
-    print(rez)
-
-    n = len(mean)
-    ir = rez[0] / n ** 0.5 * (YEAR_IN_TRADING_DAYS / data_params.FORECAST_DAYS) ** 0.5
-    ic = np.corrcoef(weight, labels)[0, 1]
+    Имена параметров не меняются, поэтому веса сохраняются и загружаются как у обычной модели. Графы
+    кешируются по архитектуре и размерам входов и повторно используются моделями других организмов.
+    При ошибке компиляции модель переключается на обычный режим без изменения глобальных настроек
+    torch.
+    """
+    eager = model.forward
+    compiled = torch.compile(eager)
+    failed = False
+
+    def forward(*args: object, **kwargs: object) -> object:  # noqa: WPS430
+        nonlocal failed
+        if not failed:
+            try:
+                return compiled(*args, **kwargs)
+            except torch._dynamo.exc.TorchDynamoException as error:  # noqa: WPS437
+                print(f"Ошибка компиляции - {error.__class__.__name__}")
+                failed = True
+        return eager(*args, **kwargs)
+
+    model.forward = forward
+
+
+def _load_state(model: nn.Module, pickled_model: bytes) -> None:
+    """Загружает сохраненные веса в модель."""
+    buffer = io.BytesIO(pickled_model)
+    state_dict = torch.load(buffer)
+    model.load_state_dict(state_dict)
+
+
+def make_forecast(
+    tickers: tuple[str, ...],
+    end: pd.Timestamp,
+    history_days: int,
+    means: npt.NDArray[np.float32],
+    stds: npt.NDArray[np.float32],
+) -> Forecast:
+    """Пересчитывает прогноз сети для тикеров в годовое выражение."""
+    annual_means = pd.Series(means, index=list(tickers))
+    annual_means = annual_means.mul(YEAR_IN_TRADING_DAYS / data_params.FORECAST_DAYS)
+
+    annual_stds = pd.Series(stds, index=list(tickers))
+    annual_stds = annual_stds.mul((YEAR_IN_TRADING_DAYS / data_params.FORECAST_DAYS) ** 0.5)
+
+    return Forecast(
+        tickers=tickers,
+        date=end,
+        history_days=history_days,
+        mean=annual_means,
+        std=annual_stds,
+    )
+
+
+def _report(test_metrics: metrics.Metrics) -> float:
+    t_stat, p_value = test_metrics.t_test
+    print(f"t = {t_stat:.2f}, p-value = {p_value:.4f}")
+
+    ir = test_metrics.ir
+    ic = test_metrics.ic
     br = (ir / ic) ** 2
     print(f"IR = IC * sqrt(BR) = {ic:.2f} * sqrt({br:.2f}) = {ir:.2f}")
 
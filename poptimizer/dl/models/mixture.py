@@ -0,0 +1,49 @@
+"""Смесь логнормальных распределений для выходов сети.
+
+Логарифм правдоподобия, среднее и дисперсия считаются в замкнутой форме по параметрам смеси без
+создания объектов torch.distributions и проверки аргументов, что заметно быстрее на небольших
+батчах.
+"""
+import math
+
+import torch
+
+# Логарифм нормировочной константы нормального распределения
+_LOG_SQRT_2PI = math.log(math.sqrt(2 * math.pi))
+
+
+class LogNormalMixture:
+    """Смесь логнормальных распределений с одинаковым количеством компонент для каждого примера.
+
+    Последнее измерение параметров соответствует компонентам смеси.
+    """
+
+    def __init__(self, logits: torch.Tensor, m: torch.Tensor, s: torch.Tensor):
+        """Сохраняет логарифмы весов компонент и параметры нормальных распределений логарифмов."""
+        self._log_weights = torch.log_softmax(logits, dim=-1)
+        self._m = m
+        self._s = s
+
+    @property
+    def mean(self) -> torch.Tensor:
+        """Среднее смеси."""
+        return (self._log_weights + self._m + self._s ** 2 / 2).exp().sum(dim=-1)
+
+    @property
+    def variance(self) -> torch.Tensor:
+        """Дисперсия смеси как сумма средней дисперсии компонент и дисперсии их средних."""
+        weights = self._log_weights.exp()
+        s2 = self._s ** 2
+        comp_mean = (self._m + s2 / 2).exp()
+        comp_var = torch.expm1(s2) * comp_mean ** 2
+        mean = (weights * comp_mean).sum(dim=-1, keepdim=True)
+
+        return (weights * (comp_var + (comp_mean - mean) ** 2)).sum(dim=-1)
+
+    def log_prob(self, value: torch.Tensor) -> torch.Tensor:  # noqa: WPS110
+        """Логарифм плотности смеси для положительных значений."""
+        log_value = value.log().unsqueeze(-1)
+        z_score = (log_value - self._m) / self._s
+        comp_log_prob = -(z_score ** 2) / 2 - self._s.log() - _LOG_SQRT_2PI - log_value
+
+        return torch.logsumexp(self._log_weights + comp_log_prob, dim=-1)
@@ -0,0 +1,63 @@
+import pytest
+import torch
+from torch import distributions
+
+from poptimizer.dl.models import mixture
+
+
+@pytest.fixture(scope="module", name="params")
+def make_params():
+    torch.manual_seed(0)
+    logits = torch.randn(50, 1, 4)
+    m = torch.randn(50, 1, 4) / 10
+    s = torch.rand(50, 1, 4) / 5 + 0.01
+    value = torch.exp(torch.randn(50, 1) / 10)
+
+    return logits, m, s, value
+
+
+@pytest.fixture(scope="module", name="reference")
+def make_reference(params):
+    logits, m, s, _ = params
+
+    return distributions.MixtureSameFamily(
+        distributions.Categorical(logits=logits),
+        distributions.LogNormal(m, s),
+    )
+
+
+def test_log_prob(params, reference):
+    *mix_params, value = params
+    llh = mixture.LogNormalMixture(*mix_params).log_prob(value)
+
+    assert llh.shape == (50, 1)
+    assert torch.allclose(llh, reference.log_prob(value), atol=1e-5)
+
+
+def test_mean(params, reference):
+    *mix_params, _ = params
+
+    assert torch.allclose(mixture.LogNormalMixture(*mix_params).mean, reference.mean, atol=1e-6)
+
+
+def test_variance(params, reference):
+    *mix_params, _ = params
+    variance = mixture.LogNormalMixture(*mix_params).variance
+
+    assert variance.shape == (50, 1)
+    assert torch.allclose(variance, reference.variance, rtol=1e-4, atol=1e-7)
+
+
+def test_gradients_match(params):
+    logits, m, s, value = params
+    fused = [tensor.clone().requires_grad_() for tensor in (logits, m, s)]
+    torch_params = [tensor.clone().requires_grad_() for tensor in (logits, m, s)]
+
+    mixture.LogNormalMixture(*fused).log_prob(value).sum().backward()
+    distributions.MixtureSameFamily(
+        distributions.Categorical(logits=torch_params[0]),
+        distributions.LogNormal(torch_params[1], torch_params[2]),
+    ).log_prob(value).sum().backward()
+
+    for fused_param, torch_param in zip(fused, torch_params):
+        assert torch.allclose(fused_param.grad, torch_param.grad, atol=1e-4)
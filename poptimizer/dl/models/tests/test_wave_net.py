@@ -3,11 +3,10 @@ import copy
 import pandas as pd
 import pytest
 import torch
-from torch import distributions
 
 from poptimizer.dl import data_loader
 from poptimizer.dl.features import data_params
-from poptimizer.dl.models import wave_net
+from poptimizer.dl.models import mixture, wave_net
 
 DATA_PARAMS = {
     "batch_size": 100,
@@ -170,10 +169,11 @@ def test_dist(loader):
     net = wave_net.WaveNet(loader.history_days, loader.features_description, **NET_PARAMS)
     dist = net.dist(batch)
 
-    assert isinstance(dist, distributions.MixtureSameFamily)
+    assert isinstance(dist, mixture.LogNormalMixture)
 
     assert dist.mean.shape == (100, 1)
     assert dist.variance.shape == (100, 1)
 
     llh = dist.log_prob(batch["Label"] + torch.tensor(1.0))
     assert llh.shape == (100, 1)
+
@@ -3,10 +3,11 @@ from typing import Union
 
 import numpy as np
 import torch
-from torch import distributions, nn
+from torch import nn
 
 from poptimizer.config import DEVICE
 from poptimizer.dl.features import FeatureType
+from poptimizer.dl.models.mixture import LogNormalMixture
 
 EPS = torch.tensor(torch.finfo().eps)
 
@@ -187,7 +188,17 @@ class WaveNet(nn.Module):
         """
         super().__init__()
 
-        self._features_description = features_description
+        # Ключи признаков разбираются заранее, чтобы не перебирать описание при каждом проходе
+        self._sequence_keys = tuple(
+            key
+            for key, (feature_type, _) in features_description.items()
+            if feature_type is FeatureType.SEQUENCE
+        )
+        self._embedding_keys = tuple(
+            (key, feature_type is FeatureType.EMBEDDING_SEQUENCE)
+            for key, (feature_type, _) in features_description.items()
+            if feature_type in {FeatureType.EMBEDDING, FeatureType.EMBEDDING_SEQUENCE}
+        )
 
         sequence_count = 0
         self.embedding_dict = nn.ModuleDict()
@@ -265,35 +276,40 @@ class WaveNet(nn.Module):
         ->........------+                                                     |--------|
         ->embedding-----+                                                     |-output_s-softplus->
         """
-        y = torch.zeros(1, 1, 1, dtype=torch.float, device=DEVICE)
+        y = self._inputs(batch)
 
-        y_seq = []
+        skips = torch.tensor(0.0, dtype=torch.float)
 
-        for key, (feature_type, _) in self._features_description.items():
-            if feature_type is FeatureType.SEQUENCE:
-                y_seq.append(batch[key])
+        for block in self.blocks:
+            y, skip = block(y)
+            skips = skips + skip
+
+        return self._outputs(y, skips)
+
+    def _inputs(self, batch: dict[str, Union[torch.Tensor, list[torch.Tensor]]]) -> torch.Tensor:
+        """Объединяет последовательности и эмбеддинги во входные каналы сети."""
+        y = torch.zeros(1, 1, 1, dtype=torch.float, device=DEVICE)
 
-        if y_seq:
-            y = torch.stack(y_seq, dim=1)
+        if self._sequence_keys:
+            y = torch.stack([batch[key] for key in self._sequence_keys], dim=1)
             y = self.bn(y)
             y = self.start_conv(y)
 
-        for key, (feature_type, _) in self._features_description.items():
-            if feature_type is FeatureType.EMBEDDING_SEQUENCE:
-                emb_seq = self.embedding_seq_dict[key](batch[key])
-                emb_seq = emb_seq.permute((0, 2, 1))
-                y = emb_seq + y
-            if feature_type is FeatureType.EMBEDDING:
+        for key, is_sequence in self._embedding_keys:
+            if is_sequence:
+                emb = self.embedding_seq_dict[key](batch[key])
+                emb = emb.permute((0, 2, 1))
+            else:
                 emb = self.embedding_dict[key](batch[key])
                 emb = emb.unsqueeze(2)
-                y = emb + y
+            y = emb + y
 
-        skips = torch.tensor(0.0, dtype=torch.float)
-
-        for block in self.blocks:
-            y, skip = block(y)
-            skips = skips + skip
+        return y
 
+    def _outputs(
+        self, y: torch.Tensor, skips: torch.Tensor
+    ) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """Рассчитывает параметры смеси по выходу последнего блока и сумме скипов."""
         skip = self.final_skip_conv(y)
         skips = skip + skips
 
@@ -312,10 +328,14 @@ class WaveNet(nn.Module):
 
     def dist(
         self, batch: dict[str, Union[torch.Tensor, list[torch.Tensor]]]
-    ) -> distributions.Distribution:
-        logits, mean, std = self(batch)
-
-        weights_dist = distributions.Categorical(logits=logits)
-        comp_dist = distributions.LogNormal(mean, std)
-
-        return distributions.MixtureSameFamily(weights_dist, comp_dist)
+    ) -> LogNormalMixture:
+        return self.mixture(*self(batch))
+
+    @staticmethod
+    def mixture(
+        logits: torch.Tensor,
+        mean: torch.Tensor,
+        std: torch.Tensor,
+    ) -> LogNormalMixture:
+        """Распределение по выходам сети."""
+        return LogNormalMixture(logits, mean, std)
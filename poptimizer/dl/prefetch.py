@@ -0,0 +1,118 @@
+"""Подготовка батчей в фоновом потоке."""
+import dataclasses
+import queue
+import threading
+import time
+from typing import Generic, Iterable, Iterator, TypeVar, Union
+
+# Количество батчей, которые готовятся заранее
+PREFETCH_DEPTH = 4
+
+# Интервал проверки необходимости остановки фонового потока в секундах
+_STOP_CHECK = 0.1
+
+Batch = TypeVar("Batch")
+_Item = TypeVar("_Item")
+
+
+@dataclasses.dataclass
+class PrefetchStats:
+    """Статистика ожидания батчей."""
+
+    batches: int = 0
+    starved: int = 0
+    wait: float = 0.0
+
+    def __str__(self) -> str:
+        """Доля батчей, которые пришлось ждать, и общее время ожидания."""
+        share = self.starved / max(1, self.batches)
+        return f"Prefetch starved - {self.starved}/{self.batches} ({share:.1%}), wait - {self.wait:.2f}s"
+
+
+class _Error:
+    """Обертка для передачи исключения из фонового потока."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class _End:
+    """Признак окончания батчей."""
+
+
+_END = _End()
+
+
+class Prefetcher(Generic[Batch]):
+    """Готовит следующие батчи в фоновом потоке, пока текущий используется для вычислений.
+
+    Тяжелые операции с тензорами освобождают GIL, поэтому подготовка данных выполняется параллельно с
+    прямым и обратным проходом сети. Ведет статистику случаев, когда очередь оказывается пустой и
+    вычисления простаивают в ожидании данных.
+    """
+
+    def __init__(self, batches: Iterable[Batch], depth: int = PREFETCH_DEPTH):
+        """Сохраняет источник батчей и глубину очереди."""
+        self._batches = batches
+        self._depth = depth
+        self._stats = PrefetchStats()
+
+    @property
+    def stats(self) -> PrefetchStats:
+        """Статистика ожидания батчей."""
+        return self._stats
+
+    def __iter__(self) -> Iterator[Batch]:
+        """Запускает фоновый поток и выдает подготовленные им батчи."""
+        batches_queue: queue.Queue[Union[Batch, _Error, _End]] = queue.Queue(maxsize=self._depth)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._produce, args=(batches_queue, stop), daemon=True)
+        producer.start()
+
+        stats = self._stats
+        try:
+            while True:
+                start = time.perf_counter()
+                starved = batches_queue.empty()
+                batch = batches_queue.get()
+
+                if isinstance(batch, _End):
+                    return
+                if isinstance(batch, _Error):
+                    raise batch.error
+
+                stats.batches += 1
+                stats.starved += starved
+                stats.wait += time.perf_counter() - start
+                yield batch
+        finally:
+            stop.set()
+            producer.join()
+
+    def _produce(
+        self,
+        batches_queue: "queue.Queue[Union[Batch, _Error, _End]]",
+        stop: threading.Event,
+    ) -> None:
+        """Заполняет очередь батчами, пока они не закончатся или не будет запрошена остановка."""
+        try:
+            for batch in self._batches:
+                if not _put(batches_queue, batch, stop):
+                    return
+        except Exception as error:  # noqa: WPS424
+            _put(batches_queue, _Error(error), stop)
+            return
+
+        _put(batches_queue, _END, stop)
+
+
+def _put(batches_queue: "queue.Queue[_Item]", item: _Item, stop: threading.Event) -> bool:
+    """Помещает значение в очередь, периодически проверяя необходимость остановки."""
+    while not stop.is_set():
+        try:
+            batches_queue.put(item, timeout=_STOP_CHECK)
+        except queue.Full:
+            continue
+        return True
+
+    return False
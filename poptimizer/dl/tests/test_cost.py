@@ -0,0 +1,71 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from poptimizer.dl import cost, data_loader, model, models
+from poptimizer.dl.features import data_params
+from poptimizer.evolve.genotype import Genotype
+
+TICKERS = ("KRKNP", "NMTP", "TATNP")
+DATE = pd.Timestamp("2020-05-23")
+
+
+@pytest.fixture(name="phenotype")
+def make_phenotype():
+    return Genotype().get_phenotype()
+
+
+def test_features_description_matches_loader(phenotype):
+    loader = data_loader.DescribedDataLoader(
+        TICKERS,
+        DATE,
+        phenotype["data"],
+        data_params.TestParams,
+    )
+
+    assert cost.features_description(phenotype, len(TICKERS)) == loader.features_description
+
+
+def test_estimate_params_match_real_model(phenotype):
+    description = cost.features_description(phenotype, len(TICKERS))
+    model_type = getattr(models, phenotype["type"])
+    net = model_type(phenotype["data"]["history_days"], description, **phenotype["model"])
+
+    model_cost = cost.estimate(phenotype, len(TICKERS))
+
+    assert model_cost.params == sum(tensor.numel() for tensor in net.parameters())
+    assert model_cost.flops > 0
+    assert model_cost.memory > 0
+
+
+def test_estimate_grows_with_history(phenotype):
+    longer = copy.deepcopy(phenotype)
+    longer["data"]["history_days"] *= 2
+
+    assert cost.estimate(longer, 3).flops > cost.estimate(phenotype, 3).flops
+
+
+def test_check_cost_degenerated(phenotype):
+    for name, feat_params in phenotype["data"]["features"].items():
+        feat_params["on"] = name == "Label"
+
+    with pytest.raises(model.DegeneratedModelError):
+        model.check_cost(phenotype, len(TICKERS))
+
+
+def test_check_cost_too_large(phenotype, monkeypatch):
+    monkeypatch.setattr(model, "MAX_SIZE", 1)
+
+    with pytest.raises(model.TooLargeModelError):
+        model.check_cost(phenotype, len(TICKERS))
+
+
+def test_time_model():
+    flops = np.array([1e9, 1e10, 1e11, 1e12])
+    seconds = 3 * flops ** 0.8
+
+    time_model = cost.TimeModel().fit(flops, seconds)
+
+    assert time_model.predict(np.array([1e13])) == pytest.approx(3 * 1e13 ** 0.8)
@@ -32,6 +32,15 @@ class TestOneTickerDataset:
         for key in keys:
             assert isinstance(example[key], torch.Tensor)
 
+    def test_batch(self, dataset_params):
+        dataset, _ = dataset_params
+        items = [22, 3, 100]
+        batch = dataset.batch(torch.tensor(items))
+        assert set(batch) == {"Label", "Prices", "Dividends"}
+        for key, batch_value in batch.items():
+            assert batch_value.shape[0] == len(items)
+            assert torch.allclose(batch_value, torch.stack([dataset[item][key] for item in items]))
+
     def test_len(self, dataset_params):
         dataset, params = dataset_params
         assert len(dataset) == params.len("NMTP")
@@ -48,6 +57,29 @@ class TestOneTickerDataset:
         )
 
 
+@pytest.fixture(scope="class", name="tickers_dataset")
+def make_tickers_dataset():
+    params = data_params.TrainParams(TICKERS, DATE, PARAMS)
+    data_sets = [data_loader.OneTickerDataset(ticker, params) for ticker in TICKERS]
+    return data_loader.TickersDataset(data_sets), data_sets
+
+
+class TestTickersDataset:
+    def test_len(self, tickers_dataset):
+        dataset, data_sets = tickers_dataset
+        assert len(dataset) == sum(len(data_set) for data_set in data_sets)
+
+    def test_getitem_keeps_order(self, tickers_dataset):
+        dataset, data_sets = tickers_dataset
+        first_len = len(data_sets[0])
+        items = [first_len + 5, 7, first_len, 0]
+        batch = dataset[items]
+
+        expected = [data_sets[1][5], data_sets[0][7], data_sets[1][0], data_sets[0][0]]
+        for key, batch_value in batch.items():
+            assert torch.allclose(batch_value, torch.stack([example[key] for example in expected]))
+
+
 @pytest.fixture(scope="class", name="loader")
 def make_data_loader():
     return data_loader.DescribedDataLoader(TICKERS, DATE, PARAMS, data_params.ForecastParams)
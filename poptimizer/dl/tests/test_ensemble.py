@@ -0,0 +1,68 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from poptimizer.dl import ensemble, model
+from poptimizer.evolve import population, store
+
+TICKERS = ("KRKNP", "NMTP", "TATNP")
+DATE = pd.Timestamp("2020-05-23")
+
+
+@pytest.fixture(scope="module", name="trained_models")
+def make_trained_models():
+    # noinspection PyProtectedMember
+    saved_collection = store._COLLECTION
+    test_collection = saved_collection.database["test"]
+    store._COLLECTION = test_collection
+
+    trained_models = []
+    for _ in range(3):
+        org = population.create_new_organism()
+        org.evaluate_fitness(TICKERS, DATE)
+        trained_models.append(org.trained_model(TICKERS))
+
+    phenotype, pickled_model = trained_models[0]
+    phenotype = copy.deepcopy(phenotype)
+    phenotype["data"]["batch_size"] += 1
+    trained_models.append((phenotype, pickled_model))
+
+    yield trained_models
+
+    store._COLLECTION = saved_collection
+    test_collection.drop()
+
+
+def test_group_key_ignores_batch_size(trained_models):
+    first, *_, last = trained_models
+
+    assert ensemble._group_key(first[0]) == ensemble._group_key(last[0])
+
+
+def test_group_key_ignores_disabled_features(trained_models):
+    phenotype, _ = trained_models[0]
+    changed = copy.deepcopy(phenotype)
+    changed["data"]["features"]["Unused"] = {"on": False}
+
+    assert ensemble._group_key(phenotype) == ensemble._group_key(changed)
+
+    changed["data"]["features"]["Unused"]["on"] = True
+
+    assert ensemble._group_key(phenotype) != ensemble._group_key(changed)
+
+
+def test_forecast_matches_single_models(trained_models):
+    forecasts = ensemble.forecast(TICKERS, DATE, trained_models)
+
+    assert len(forecasts) == len(trained_models)
+
+    for (phenotype, pickled_model), forecast in zip(trained_models, forecasts):
+        single = model.Model(TICKERS, DATE, phenotype, pickled_model).forecast()
+
+        assert forecast.tickers == TICKERS
+        assert forecast.date == DATE
+        assert forecast.history_days == single.history_days
+        assert np.allclose(forecast.mean, single.mean, atol=1e-5)
+        assert np.allclose(forecast.std, single.std, atol=1e-5)
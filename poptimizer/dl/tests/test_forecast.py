@@ -1,7 +1,10 @@
 import numpy as np
 import pandas as pd
+import pytest
 
-from poptimizer.dl import forecast
+from poptimizer.data.views import quotes
+from poptimizer.dl import forecast, ledoit_wolf_nonlinear
+from poptimizer.store.database import DB, MONGO_CLIENT
 
 TICKERS = ("CHEP", "MTSS", "PLZL")
 DATE = pd.Timestamp("2020-05-19")
@@ -11,8 +14,8 @@ MEAN = pd.Series([0.1, 0.2, 0.3], index=list(TICKERS))
 STD = pd.Series([0.15, 0.25, 0.35], index=list(TICKERS))
 
 
-def test_ledoit_wolf_cor():
-    cor, average_cor, shrink = forecast.ledoit_wolf_cor(TICKERS, DATE, HISTORY_DAYS)
+def test_ledoit_wolf_cors():
+    cor, average_cor, shrink = forecast.ledoit_wolf_cors(TICKERS, DATE, [HISTORY_DAYS])[HISTORY_DAYS]
 
     assert cor.shape == (3, 3)
     assert np.allclose(cor, cor.transpose())
@@ -31,8 +34,141 @@ def test_forecast():
     assert np.allclose(np.diag(data.cov), STD.values ** 2)
     assert np.allclose(data.cov, data.cov.transpose())
 
-    cor, *_ = forecast.ledoit_wolf_cor(TICKERS, DATE, HISTORY_DAYS)
+    cor, *_ = forecast.ledoit_wolf_cors(TICKERS, DATE, [HISTORY_DAYS])[HISTORY_DAYS]
     assert np.allclose(cor, data.cov / STD.values.reshape(1, -1) / STD.values.reshape(-1, 1))
 
     assert np.allclose(data.cor, 0.3009843442553877)
     assert np.allclose(data.shrinkage, 0.8625220790109036)
+
+
+@pytest.fixture(name="collection")
+def make_collection():
+    collection = MONGO_CLIENT[DB]["test_ledoit_wolf"]
+    yield collection
+    collection.drop()
+
+
+def test_cor_store(collection):
+    calls = []
+
+    def compute(tickers, date, windows, estimator):
+        calls.append((tickers, date, *windows))
+        return forecast.correlations(tickers, date, windows, estimator)
+
+    store = forecast.CorStore(collection, compute)
+    sigma, average_cor, shrink = store.get(TICKERS, DATE, HISTORY_DAYS)
+    cached_sigma, *_ = store.get(TICKERS, DATE, HISTORY_DAYS)
+
+    assert calls == [(TICKERS, DATE, HISTORY_DAYS)]
+    assert cached_sigma is sigma
+    assert not sigma.flags.writeable
+    assert np.allclose(average_cor, 0.3009843442553877)
+    assert np.allclose(shrink, 0.8625220790109036)
+    assert (store.stats.hits, store.stats.loaded, store.stats.misses) == (1, 0, 1)
+
+    other_store = forecast.CorStore(collection, compute)
+    loaded_sigma, *_ = other_store.get(TICKERS, DATE, HISTORY_DAYS)
+
+    assert len(calls) == 1
+    assert np.allclose(loaded_sigma, sigma)
+    assert (other_store.stats.hits, other_store.stats.loaded, other_store.stats.misses) == (0, 1, 0)
+    assert str(other_store.stats) == "Ledoit-Wolf cache - hits 0, loaded 1, misses 0 (100.0%)"
+
+
+def test_cor_store_prefetch(collection):
+    calls = []
+
+    def compute(tickers, date, windows, estimator):
+        calls.append(sorted(windows))
+        return forecast.correlations(tickers, date, windows, estimator)
+
+    store = forecast.CorStore(collection, compute)
+    store.get(TICKERS, DATE, HISTORY_DAYS)
+    store.prefetch(TICKERS, DATE, [HISTORY_DAYS, 60, 90, 60])
+    sigma, average_cor, shrink = store.get(TICKERS, DATE, 60)
+
+    assert calls == [[HISTORY_DAYS], [60, 90]]
+    assert (store.stats.hits, store.stats.loaded, store.stats.misses) == (1, 0, 3)
+
+    expected_sigma, expected_cor, expected_shrink = forecast.ledoit_wolf_cors(TICKERS, DATE, [60])[60]
+    assert np.allclose(sigma, expected_sigma)
+    assert np.allclose(average_cor, expected_cor)
+    assert np.allclose(shrink, expected_shrink)
+
+
+def test_cor_store_drops_old_dates(collection):
+    store = forecast.CorStore(collection)
+    store.get(TICKERS, DATE - pd.Timedelta(days=1), HISTORY_DAYS)
+    store.get(TICKERS, DATE, HISTORY_DAYS)
+
+    assert collection.count_documents({}) == 1
+    assert collection.find_one()["date"] == DATE
+
+
+def test_cor_store_recomputes_revised_data(collection):
+    calls = []
+    versions = iter(["old", "new"])
+
+    def compute(tickers, date, windows, estimator):
+        calls.append(sorted(windows))
+        return forecast.correlations(tickers, date, windows, estimator)
+
+    store = forecast.CorStore(collection, compute, version=lambda tickers, date: next(versions))
+    store.get(TICKERS, DATE, HISTORY_DAYS)
+    store.prefetch(TICKERS, DATE, [HISTORY_DAYS])
+    store.get(TICKERS, DATE, HISTORY_DAYS)
+
+    assert calls == [[HISTORY_DAYS], [HISTORY_DAYS]]
+    assert (store.stats.hits, store.stats.loaded, store.stats.misses) == (1, 0, 2)
+    assert collection.count_documents({}) == 1
+    assert collection.find_one()["version"] == "new"
+
+
+def test_data_version():
+    version = forecast.data_version(TICKERS, DATE)
+
+    assert version == forecast.data_version(TICKERS, DATE)
+    assert version != forecast.data_version(TICKERS, DATE - pd.DateOffset(months=1))
+
+
+def test_qis_forecast(collection):
+    forecast.COR_STORE, saved_store = forecast.CorStore(collection), forecast.COR_STORE
+    try:
+        data = forecast.Forecast(TICKERS, DATE, HISTORY_DAYS, MEAN, STD, estimator="qis")
+    finally:
+        forecast.COR_STORE = saved_store
+
+    div, p1 = quotes.div_and_prices(TICKERS, DATE)
+    returns = ((p1 + div) / p1.shift(1)).iloc[-HISTORY_DAYS:]
+    returns = (returns - returns.mean()) / returns.std(ddof=0)
+    cov = ledoit_wolf_nonlinear.qis(returns.to_numpy(copy=True))
+    std = np.diag(cov) ** 0.5
+    cor = cov / std.reshape(1, -1) / std.reshape(-1, 1)
+
+    assert np.allclose(np.diag(data.cov), STD.values ** 2)
+    assert np.allclose(data.cov / STD.values.reshape(1, -1) / STD.values.reshape(-1, 1), cor)
+    assert np.allclose(data.cor, (cor.sum() - 3) / 6)
+    assert 0 < data.shrinkage < 1
+    assert collection.count_documents({"estimator": "qis"}) == 1
+
+
+@pytest.mark.parametrize("estimator", ["ledoit_wolf", "qis"])
+def test_young_ticker_spoils_only_long_windows(monkeypatch, estimator):
+    rng = np.random.default_rng(0)
+    returns = 1 + rng.normal(0, 0.02, (300, 3))
+    returns[:100, 2] = np.nan
+    monkeypatch.setattr(forecast, "_returns", lambda tickers, date: pd.DataFrame(returns))
+
+    cors = forecast.correlations(TICKERS, DATE, [60, 250, 400], estimator)
+
+    cor, average_cor, shrink = cors[60]
+    assert np.isfinite(cor).all()
+    assert np.isfinite([average_cor, shrink]).all()
+    assert np.allclose(np.diag(cor), 1)
+    assert np.isnan(cors[250][0]).any()
+    assert np.isnan(cors[400][0]).any()
+
+
+def test_unknown_estimator():
+    with pytest.raises(forecast.EstimatorError):
+        forecast.correlations(TICKERS, DATE, [HISTORY_DAYS], "sample")
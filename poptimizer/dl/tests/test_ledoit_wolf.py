@@ -26,3 +26,86 @@ def test_ledoit_wolf():
     assert np.allclose(np.diag(cov1), np.diag(cov2))
     assert np.allclose(average_cor1, average_cor2)
     assert shrinkage2 < shrinkage1
+
+
+def _standardized(returns):
+    return (returns - returns.mean(axis=0)) / returns.std(axis=0)
+
+
+def test_multi_window():
+    rng = np.random.default_rng(0)
+    returns = 1 + rng.normal(0, 0.02, (300, 5))
+    windows = [30, 100, 252, 60, 100]
+
+    estimators = ledoit_wolf.multi_window(returns, windows)
+    standardized = ledoit_wolf.multi_window(returns, windows, standardize=True)
+
+    assert sorted(estimators) == [30, 60, 100, 252]
+    for window, (cov, average_cor, shrink) in estimators.items():
+        expected_cov, expected_cor, expected_shrink = ledoit_wolf.shrinkage(returns[-window:].copy())
+        assert np.allclose(cov, expected_cov, rtol=1e-8, atol=0)
+        assert np.isclose(average_cor, expected_cor, rtol=1e-8)
+        assert np.isclose(shrink, expected_shrink, rtol=1e-8)
+
+        cor, average_cor, shrink = standardized[window]
+        expected_cor, expected_average, expected_shrink = ledoit_wolf.shrinkage(
+            _standardized(returns[-window:]),
+        )
+        assert np.allclose(cor, expected_cor, rtol=1e-8, atol=1e-12)
+        assert np.allclose(np.diag(cor), 1)
+        assert np.isclose(average_cor, expected_average, rtol=1e-8)
+        assert np.isclose(shrink, expected_shrink, rtol=1e-8)
+
+
+def test_rolling():
+    rng = np.random.default_rng(1)
+    returns = 1 + rng.normal(0, 0.02, (200, 4))
+    window = 50
+
+    estimators = list(ledoit_wolf.rolling(returns, window, standardize=True))
+
+    assert len(estimators) == len(returns) - window + 1
+    for end, (cor, average_cor, shrink) in enumerate(estimators, window):
+        expected = ledoit_wolf.shrinkage(_standardized(returns[end - window : end]))
+        assert np.allclose(cor, expected[0], rtol=1e-8, atol=1e-12)
+        assert np.isclose(average_cor, expected[1], rtol=1e-8)
+        assert np.isclose(shrink, expected[2], rtol=1e-8)
+
+
+def test_multi_window_young_share():
+    rng = np.random.default_rng(2)
+    returns = 1 + rng.normal(0, 0.02, (300, 4))
+    returns[:100, 3] = np.nan
+
+    estimators = ledoit_wolf.multi_window(returns, [60, 250], standardize=True)
+
+    expected = ledoit_wolf.shrinkage(_standardized(returns[-60:]))
+    assert np.allclose(estimators[60][0], expected[0], rtol=1e-8, atol=1e-12)
+    assert np.isclose(estimators[60][2], expected[2], rtol=1e-8)
+    assert np.isnan(estimators[250][0]).any()
+
+
+def test_multi_window_longer_than_returns():
+    rng = np.random.default_rng(3)
+    returns = 1 + rng.normal(0, 0.02, (50, 3))
+
+    estimators = ledoit_wolf.multi_window(returns, [30, 80])
+
+    expected = ledoit_wolf.shrinkage(returns.copy())
+    assert np.allclose(estimators[80][0], expected[0], rtol=1e-8, atol=0)
+    assert np.isclose(estimators[80][2], expected[2], rtol=1e-8)
+
+
+def test_rolling_over_missing_returns():
+    rng = np.random.default_rng(4)
+    returns = 1 + rng.normal(0, 0.02, (120, 3))
+    returns[:10, 2] = np.nan
+    window = 40
+
+    estimators = list(ledoit_wolf.rolling(returns, window))
+
+    assert np.isnan(estimators[0][0]).any()
+    for end, (cov, _, shrink) in list(enumerate(estimators, window))[10:]:
+        expected = ledoit_wolf.shrinkage(returns[end - window : end].copy())
+        assert np.allclose(cov, expected[0], rtol=1e-8, atol=0)
+        assert np.isclose(shrink, expected[2], rtol=1e-8)
@@ -0,0 +1,67 @@
+"""Тесты для метрик качества прогнозов."""
+import numpy as np
+import pytest
+import torch
+from scipy import stats
+
+from poptimizer.config import YEAR_IN_TRADING_DAYS
+from poptimizer.dl import metrics
+from poptimizer.dl.features import data_params
+
+SIZE = 1000
+BATCH = 64
+
+
+@pytest.fixture(scope="module", name="sample")
+def make_sample():
+    rng = np.random.default_rng(0)
+    mean = rng.normal(0, 0.1, SIZE)
+    var = rng.uniform(0.01, 0.1, SIZE)
+    labels = mean + rng.normal(0, 0.3, SIZE)
+    loss = rng.normal(0, 1, SIZE)
+
+    test_metrics = metrics.Metrics()
+    for start in range(0, SIZE, BATCH):
+        batch = slice(start, start + BATCH)
+        test_metrics.update(
+            torch.tensor(loss[batch].sum()),
+            torch.tensor(mean[batch], dtype=torch.float).reshape(-1, 1),
+            torch.tensor(var[batch], dtype=torch.float).reshape(-1, 1),
+            torch.tensor(labels[batch], dtype=torch.float).reshape(-1, 1),
+        )
+
+    return test_metrics, mean, var, labels, loss
+
+
+def _dense_weight(mean, var):
+    precision = np.linalg.inv(np.diag(var))
+    weighted_mean = precision @ mean.reshape(-1, 1)
+    lambda_ = weighted_mean.sum() / precision.sum()
+    return (precision @ (mean.reshape(-1, 1) - lambda_)).ravel()
+
+
+def test_llh(sample):
+    test_metrics, *_, loss = sample
+
+    assert test_metrics.count == SIZE
+    assert test_metrics.llh == pytest.approx(-loss.mean() + np.log(data_params.FORECAST_DAYS) / 2)
+
+
+def test_t_test_and_ir(sample):
+    test_metrics, mean, var, labels, _ = sample
+    weight = _dense_weight(mean, var)
+    rez = stats.ttest_1samp(weight * labels, 0, alternative="greater")
+
+    t_stat, p_value = test_metrics.t_test
+
+    assert t_stat == pytest.approx(rez.statistic, rel=1e-5)
+    assert p_value == pytest.approx(rez.pvalue, rel=1e-4)
+    annual = (YEAR_IN_TRADING_DAYS / data_params.FORECAST_DAYS) ** 0.5
+    assert test_metrics.ir == pytest.approx(rez.statistic / SIZE ** 0.5 * annual, rel=1e-5)
+
+
+def test_ic(sample):
+    test_metrics, mean, var, labels, _ = sample
+    weight = _dense_weight(mean, var)
+
+    assert test_metrics.ic == pytest.approx(np.corrcoef(weight, labels)[0, 1], rel=1e-5)
@@ -1,7 +1,10 @@
 import copy
 
+import numpy as np
 import pandas as pd
 import pytest
+import torch
+from torch import nn
 
 from poptimizer.dl import model
 from poptimizer.dl.forecast import Forecast
@@ -60,3 +63,84 @@ def test_forecast(org):
     assert forecast.mean.index.tolist() == list(org._doc.tickers)
     assert isinstance(forecast.std, pd.Series)
     assert forecast.std.index.tolist() == list(org._doc.tickers)
+
+
+def test_warm_start(org):
+    phenotype = org.genotype.get_phenotype()
+    pickled_model = org._doc.model
+
+    net = model.Model(tuple(org._doc.tickers), org._doc.date, phenotype, pickled_model, warm_start=0.1)
+    llh, _ = net.quality_metrics
+
+    assert isinstance(llh, float)
+    assert bytes(net) != pickled_model
+
+
+def test_pruned(org):
+    gen = copy.deepcopy(org.genotype)
+    gen["Scheduler"]["epochs"] /= 10
+    phenotype = gen.get_phenotype()
+    curves = np.full((model.PRUNE_MIN_CURVES, model.CURVE_POINTS), 100.0)
+
+    net = model.Model(tuple(org._doc.tickers), org._doc.date, phenotype, curves=curves)
+    with pytest.raises(model.PrunedError):
+        net.quality_metrics
+
+    assert len(net.curve) == 1
+
+
+def test_prune_by_curves_reached_point():
+    curves = np.full((model.PRUNE_MIN_CURVES + 1, model.CURVE_POINTS), np.nan)
+    curves[:, 0] = 1
+    curves[0] = 2
+    net = model.Model(("A",), pd.Timestamp("2021-04-09"), {}, curves=curves)
+
+    with pytest.raises(model.PrunedError):
+        net._prune(0, 0)
+    net._prune(1, 0)
+
+
+def test_curve(org):
+    gen = copy.deepcopy(org.genotype)
+    gen["Scheduler"]["epochs"] /= 10
+    phenotype = gen.get_phenotype()
+    curves = np.full((model.PRUNE_MIN_CURVES, model.CURVE_POINTS), -np.inf)
+
+    net = model.Model(tuple(org._doc.tickers), org._doc.date, phenotype, curves=curves)
+    net.quality_metrics
+
+    assert len(net.curve) == model.CURVE_POINTS
+
+
+def test_compiled(org):
+    gen = copy.deepcopy(org.genotype)
+    gen["Scheduler"]["epochs"] /= 10
+    phenotype = gen.get_phenotype()
+    phenotype["compile"] = True
+
+    net = model.Model(tuple(org._doc.tickers), org._doc.date, phenotype)
+    llh, _ = net.quality_metrics
+
+    del phenotype["compile"]
+    reloaded = model.Model(tuple(org._doc.tickers), org._doc.date, phenotype, bytes(net))
+
+    assert reloaded.quality_metrics[0] == pytest.approx(llh)
+
+
+def test_compile_falls_back_to_eager(monkeypatch):
+    def failing_compile(fn):
+        def compiled(*args, **kwargs):
+            raise torch._dynamo.exc.TorchDynamoException("compile failed")
+
+        return compiled
+
+    monkeypatch.setattr(model.torch, "compile", failing_compile)
+    net = nn.Linear(2, 1)
+    batch = torch.ones(1, 2)
+    expected = net(batch)
+
+    model._compile(net)
+
+    assert torch.equal(net(batch), expected)
+    assert list(net.state_dict()) == ["weight", "bias"]
+    assert not torch._dynamo.config.suppress_errors
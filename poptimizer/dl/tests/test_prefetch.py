@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+from poptimizer.dl import prefetch
+
+
+def slow_batches(count, delay=0.0):
+    for batch in range(count):
+        time.sleep(delay)
+        yield batch
+
+
+def test_prefetch_order_and_stats():
+    batches = prefetch.Prefetcher(slow_batches(10), depth=2)
+
+    assert list(batches) == list(range(10))
+    assert batches.stats.batches == 10
+    assert 0 <= batches.stats.starved <= 10
+    assert "10" in str(batches.stats)
+
+
+def test_prefetch_starved():
+    batches = prefetch.Prefetcher(slow_batches(3, delay=0.05))
+
+    assert list(batches) == [0, 1, 2]
+    assert batches.stats.starved >= 2
+    assert batches.stats.wait > 0.05
+
+
+def test_prefetch_error():
+    def bad_batches():
+        yield 1
+        raise ValueError("bad batch")
+
+    with pytest.raises(ValueError, match="bad batch"):
+        list(prefetch.Prefetcher(bad_batches()))
+
+
+def test_prefetch_early_stop():
+    batches = prefetch.Prefetcher(iter(range(1000)), depth=2)
+    for batch in batches:
+        if batch == 3:
+            break
+
+    assert batches.stats.batches == 4
@@ -1,16 +1,25 @@
 """Эволюция параметров модели."""
+from concurrent import futures
+from concurrent.futures import process
+from typing import Optional
+
+import bson
 import numpy as np
 from scipy import stats
 
 from poptimizer import config
 from poptimizer.data.views import listing
-from poptimizer.dl import ModelError
-from poptimizer.evolve import population
+from poptimizer.dl.features.feature_store import STORE
+from poptimizer.dl.model import PrunedError
+from poptimizer.evolve import jobs, population, store, workers
 from poptimizer.portfolio.portfolio import load_from_yaml
 
 # Понижение масштаба разницы между родителями после возникновения ошибки
 SCALE_DOWN = 0.91
 
+# Ошибки слабых организмов, после которых масштаб не понижается
+_WEAK_ERRORS = frozenset((PrunedError.__name__, population.ScreenError.__name__))
+
 
 class Evolution:
     """Эволюция параметров модели.
@@ -31,12 +40,36 @@ class Evolution:
 
     Процесс выбора организма родителя, жертвы, размножения и уничтожения регулируется функциями
     модуля популяции.
+
+    При использовании нескольких процессов организм отправляется на оценку в пул, а шаги продолжаются
+    до заполнения всех процессов. Организмы на оценке не участвуют в отборе родителей и жертв. Пулом
+    может быть очередь заданий, которые выполняются исполнителями на других узлах.
     """
 
-    def __init__(self, max_population: int = config.MAX_POPULATION):
-        """Сохраняет предельный размер популяции."""
+    def __init__(
+        self,
+        max_population: int = config.MAX_POPULATION,
+        n_workers: int = 1,
+        distributed: bool = False,
+    ):
+        """Сохраняет предельный размер популяции и параметры оценки организмов.
+
+        :param max_population:
+            Предельный размер популяции.
+        :param n_workers:
+            Количество одновременно оцениваемых организмов. При распределенной оценке — количество
+            заданий в очереди, которое должно быть не меньше общего количества исполнителей, иначе
+            часть из них будет простаивать.
+        :param distributed:
+            Оценивать организмы с помощью исполнителей, получающих задания через очередь в MongoDB.
+        """
         self._max_population = max_population
+        self._n_workers = n_workers
+        self._distributed = distributed
+        self._pool: Optional[futures.Executor] = None
+        self._in_flight: dict[futures.Future[Optional[str]], tuple[str, bson.ObjectId]] = {}
         self._end = listing.last_history_date()
+        STORE.invalidate(self._end)
         port = load_from_yaml(self._end)
         self._tickers = tuple(port.index[:-2])
         self._scale = 1.0
@@ -48,36 +81,63 @@ class Evolution:
         """
         self._setup()
 
+        self._pool = self._make_pool()
+        try:
+            self._steps()
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+
+    def _make_pool(self) -> Optional[futures.Executor]:
+        if self._distributed:
+            return jobs.Executor(workers.OPERATIONS)
+        if self._n_workers > 1:
+            return workers.make_pool(self._n_workers)
+        return None
+
+    def _steps(self) -> None:
         step = 0
         while True:  # noqa: WPS457
 
             if (new_end := listing.last_history_date()) != self._end:
                 self._end = new_end
+                STORE.invalidate(new_end)
                 self._scale = 1.0
                 step = 0
 
+            if len(self._in_flight) >= population.count():
+                self._collect(wait=True)
+                continue
+
             step += 1
             date = self._end.date()
             print(f"***{date}: Шаг эволюции — {step}***")  # noqa: WPS421
             population.print_stat()
             print(f"Фактор - {self._scale:.2%}\n")  # noqa: WPS421
 
-            parent = population.get_parent()
+            busy = self._busy()
+            parent = population.get_parent(busy)
             if self._child_produced(parent):
                 continue
 
-            prey = population.get_prey()
+            prey = population.get_prey(busy)
             if self._prey_killed(parent, prey):
                 continue
 
             if prey.scores * prey.timer < parent.scores * parent.timer:
-                self._eval_organism("Добыча", prey)
+                self._dispatch("Добыча", prey)
                 continue
 
-            self._eval_organism("Родитель", parent)
+            self._dispatch("Родитель", parent)
 
     def _setup(self) -> None:
-        """Создает популяцию из организмов по умолчанию, если организмов меньше 4."""
+        """Создает популяцию из организмов по умолчанию, если организмов меньше 4.
+
+        Веса моделей, сохраненные внутри документов, переносятся в GridFS.
+        """
+        if migrated := store.migrate_blobs():
+            print(f"Перенесено в GridFS моделей - {migrated}")  # noqa: WPS421
+
         count = population.count()
         print(f"Имеется {count} организмов из {self._max_population}")  # noqa: WPS421
         print()  # noqa: WPS421
@@ -100,24 +160,84 @@ class Evolution:
         print(parent)  # noqa: WPS421
         print()  # noqa: WPS421
 
-        child = parent.make_child(self._scale)
-        self._eval_organism("Потомок", child)
+        child = parent.make_child(self._scale, self._tickers)
+        self._dispatch("Потомок", child)
 
         return True
 
+    def _busy(self) -> list[bson.ObjectId]:
+        """Организмы, которые находятся на оценке."""
+        return [id_ for _, id_ in self._in_flight.values()]
+
+    def _dispatch(self, name: str, organism: population.Organism) -> None:
+        """Оценивает организм или отправляет его в пул процессов.
+
+        При заполнении всех процессов дожидается завершения оценки хотя бы одного организма.
+        """
+        if self._pool is None:
+            self._eval_organism(name, organism)
+            return
+
+        print(f"{name} - отправлен на обучение:")  # noqa: WPS421
+        print(organism)  # noqa: WPS421
+        print()  # noqa: WPS421
+
+        organism.save()
+        try:
+            future = self._pool.submit(workers.evaluate, organism.id, self._tickers, self._end)
+        except process.BrokenProcessPool:
+            # После падения процесса пул отклоняет новые задания, а его задания завершаются ошибкой
+            self._pool.shutdown(wait=False)
+            self._pool = workers.make_pool(self._n_workers)
+            future = self._pool.submit(workers.evaluate, organism.id, self._tickers, self._end)
+        self._in_flight[future] = (name, organism.id)
+
+        self._collect(wait=len(self._in_flight) >= self._n_workers)
+
+    def _collect(self, wait: bool) -> None:
+        """Обрабатывает результаты завершившихся оценок.
+
+        Оценка, завершившаяся исключением, например, из-за падения процесса пула, считается ошибкой
+        организма.
+        """
+        done, _ = futures.wait(
+            self._in_flight,
+            timeout=None if wait else 0,
+            return_when=futures.FIRST_COMPLETED,
+        )
+        for future in done:
+            name, id_ = self._in_flight.pop(future)
+            try:
+                error = future.result()
+            except Exception as eval_error:  # noqa: WPS424
+                error = eval_error.__class__.__name__
+            try:
+                organism = population.Organism(_id=id_)
+            except store.IdError:
+                continue
+
+            print(f"{name} - обучен:")  # noqa: WPS421
+            print(organism)  # noqa: WPS421
+            print()  # noqa: WPS421
+
+            self._process_result(organism, error)
+
     def _eval_organism(self, name: str, organism: population.Organism) -> None:
         print(f"{name} - обучается:")  # noqa: WPS421
         print(organism)  # noqa: WPS421
         print()  # noqa: WPS421
 
-        try:
-            organism.evaluate_fitness(self._tickers, self._end)
-        except (ModelError, AttributeError) as error:
+        self._process_result(organism, workers.fit(organism, self._tickers, self._end))
+
+    def _process_result(self, organism: population.Organism, error: Optional[str]) -> None:
+        """Удаляет организм при ошибке оценки или неположительном IR."""
+        if error is not None:
             organism.die()
-            error = error.__class__.__name__
             print(f"Удаляю - {error}\n")  # noqa: WPS421
 
-            self._scale *= SCALE_DOWN
+            # Отсев слабых организмов не свидетельствует о слишком сильных мутациях
+            if error not in _WEAK_ERRORS:
+                self._scale *= SCALE_DOWN
             return
 
         if not (organism.ir > 0):  # noqa: WPS508 - защита от NaN
@@ -138,7 +258,10 @@ class Evolution:
         print(prey)  # noqa: WPS421
         print()  # noqa: WPS421
 
-        if hunter.scores < 2 or prey.scores < 2:
+        # Оценки после дообучения не сопоставимы с оценками обучения с нуля
+        hunter_llh = hunter.comparable_llh
+        prey_llh = prey.comparable_llh
+        if len(hunter_llh) < 2 or len(prey_llh) < 2:
             print("Недостаточно оценок...")  # noqa: WPS421
             print()  # noqa: WPS421
 
@@ -146,8 +269,8 @@ class Evolution:
 
         print("Родитель нападает на добычу:")  # noqa: WPS421
         _, p_value = stats.ttest_ind(
-            hunter.llh,
-            prey.llh,
+            hunter_llh,
+            prey_llh,
             permutations=np.inf,
             alternative="greater",
         )
@@ -1,21 +1,56 @@
-"""Формирует прогноз по всем моделям в популяции."""
+"""Формирует прогноз по всем моделям в популяции.
+
+Прогнозы кешируются по отдельности для каждого организма с ключом из ID организма, ссылки на файл
+с весами модели, даты и тикеров. Повторно рассчитываются только прогнозы организмов, модели которых
+изменились с момента предыдущего расчета.
+"""
+import io
 from collections.abc import Iterable
-from typing import Iterator
+from typing import Final, Iterator, Optional, TypedDict
 
+import bson
+import numpy as np
 import pandas as pd
-import tqdm
+from pymongo.collection import Collection
 
-from poptimizer.dl import Forecast
+from poptimizer.dl import ensemble
+from poptimizer.dl.forecast import COR_STORE, Forecast
 from poptimizer.evolve import population
 from poptimizer.evolve.population import ForecastError
-
-# Ключ для хранений кеша прогноза
 from poptimizer.store import database
 
+# Коллекция для хранения кеша прогнозов организмов
+_COLLECTION = database.MONGO_CLIENT[database.DB]["forecasts"]
+
+# Ключ устаревшего кеша всех прогнозов в коллекции misc
 FORECAST = "forecast"
 
+# Поля документа кеша прогноза
+_ORGANISM: Final = "organism"
+_MODEL: Final = "model"
+_DATE: Final = "date"
+_TICKERS: Final = "tickers"
+_HISTORY_DAYS: Final = "history_days"
+_DATA: Final = "data"
+
+
+class _CachedForecast(TypedDict):
+    """Закешированный прогноз организма."""
+
+    organism: bson.ObjectId
+    model: bson.ObjectId
+    date: pd.Timestamp
+    tickers: list[str]
+    history_days: int
+    data: bytes
+
 
-class Forecasts(Iterable):
+def get_collection() -> Collection[_CachedForecast]:
+    """Коллекция для хранения кеша прогнозов организмов."""
+    return _COLLECTION
+
+
+class Forecasts(Iterable[Forecast]):
     """Прогнозы доходностей и ковариационных матриц для DL-моделей."""
 
     def __init__(
@@ -26,13 +61,42 @@ class Forecasts(Iterable):
         self._tickers = tickers
         self._date = date
 
-        self._forecasts = []
-        for organism in tqdm.tqdm(population.get_all_organisms(), desc="Forecasts"):
+        cache = _load_cache(tickers, date)
+        slots: list[tuple[population.Organism, Optional[_CachedForecast]]] = []
+        trained_models = []
+        for organism in population.get_all_organisms():
+            if not _is_fresh(doc := cache.get(organism.id), organism):
+                doc = None
+                try:
+                    trained_models.append(organism.trained_model(tickers))
+                except ForecastError:
+                    continue
+            slots.append((organism, doc))
+
+        windows: list[int] = [
+            phenotype["data"]["history_days"] for phenotype, _ in trained_models  # type: ignore
+        ]
+        windows.extend(doc[_HISTORY_DAYS] for _, doc in slots if doc is not None)
+        COR_STORE.prefetch(tickers, date, windows)
+
+        new_forecasts = iter(ensemble.forecast(tickers, date, trained_models) if trained_models else ())
+
+        self._forecasts: list[Forecast] = []
+        for organism, doc in slots:
+            if doc is None:
+                forecast = next(new_forecasts)
+            else:
+                forecast = _from_cache(doc, tickers, date)
             try:
-                forecast = organism.forecast(tickers, date)
+                self._forecasts.append(organism.check_forecast(forecast))
             except ForecastError:
                 continue
-            self._forecasts.append(forecast)
+            if doc is None:
+                _save_cache(organism, forecast)
+
+        _prune_cache(date, [organism.id for organism, _ in slots])
+        print(COR_STORE.stats)  # noqa: WPS421
+
         if not self._forecasts:
             raise population.ForecastError("Отсутствуют прогнозы - необходимо обучить модели")
 
@@ -50,8 +114,57 @@ class Forecasts(Iterable):
         return self._date
 
 
+def _load_cache(tickers: tuple[str, ...], date: pd.Timestamp) -> dict[bson.ObjectId, _CachedForecast]:
+    """Закешированные прогнозы для тикеров на дату по ID организмов."""
+    docs = get_collection().find({_DATE: date, _TICKERS: list(tickers)})
+    return {doc[_ORGANISM]: doc for doc in docs}
+
+
+def _is_fresh(doc: Optional[_CachedForecast], organism: population.Organism) -> bool:
+    """Закешированный прогноз рассчитан текущей моделью организма."""
+    model_id = organism.model_id
+    return doc is not None and model_id is not None and doc[_MODEL] == model_id
+
+
+def _from_cache(doc: _CachedForecast, tickers: tuple[str, ...], date: pd.Timestamp) -> Forecast:
+    """Прогноз из сохраненных в кеше массивов."""
+    with np.load(io.BytesIO(doc[_DATA])) as arrays:
+        return Forecast(
+            tickers=tickers,
+            date=date,
+            history_days=doc[_HISTORY_DAYS],
+            mean=pd.Series(arrays["mean"], index=list(tickers)),
+            std=pd.Series(arrays["std"], index=list(tickers)),
+        )
+
+
+def _save_cache(organism: population.Organism, forecast: Forecast) -> None:
+    """Сохраняет прогноз организма в виде массивов numpy.
+
+    Прогнозы моделей, веса которых хранятся вне GridFS, не кешируются.
+    """
+    if (model_id := organism.model_id) is None:
+        return
+
+    buffer = io.BytesIO()
+    np.savez(buffer, mean=forecast.mean.to_numpy(), std=forecast.std.to_numpy())
+    key = {_ORGANISM: organism.id, _DATE: forecast.date, _TICKERS: list(forecast.tickers)}
+    doc = {
+        **key,
+        _MODEL: model_id,
+        _HISTORY_DAYS: forecast.history_days,
+        _DATA: buffer.getvalue(),
+    }
+    get_collection().replace_one(key, doc, upsert=True)
+
+
+def _prune_cache(date: pd.Timestamp, ids: list[bson.ObjectId]) -> None:
+    """Удаляет прогнозы на другие даты и прогнозы удаленных организмов."""
+    get_collection().delete_many({"$or": [{_DATE: {"$ne": date}}, {_ORGANISM: {"$nin": ids}}]})
+
+
 def get_forecasts(tickers: tuple[str, ...], date: pd.Timestamp) -> Forecasts:
-    """Создает или загружает закешированный прогноз для набора тикеров на указанную дату.
+    """Создает прогноз для набора тикеров на указанную дату с использованием кеша прогнозов организмов.
 
     :param tickers:
         Тикеры, для которых необходимо составить прогноз.
@@ -60,15 +173,6 @@ def get_forecasts(tickers: tuple[str, ...], date: pd.Timestamp) -> Forecasts:
     :return:
         Прогнозная доходность, ковариация и дополнительная информация.
     """
-    mongodb = database.MongoDB()
+    del database.MongoDB()[FORECAST]  # noqa: WPS420
 
-    forecasts_cache = mongodb[FORECAST]
-    if (
-        forecasts_cache is not None
-        and forecasts_cache.date == date
-        and forecasts_cache.tickers == tickers
-    ):
-        return forecasts_cache
-    forecasts = Forecasts(tickers, date)
-    mongodb[FORECAST] = forecasts
-    return forecasts
+    return Forecasts(tickers, date)
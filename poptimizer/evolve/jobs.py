@@ -0,0 +1,339 @@
+"""Очередь заданий на оценку организмов в MongoDB для распределенной эволюции.
+
+Задание проходит состояния: ожидает исполнителя, арендовано исполнителем, выполнено или завершилось
+ошибкой. Исполнитель атомарно арендует задание на ограниченное время и периодически продлевает
+аренду. Задания с истекшей арендой, например, после падения исполнителя, повторно выдаются другим
+исполнителям, а после нескольких неудачных попыток завершаются ошибкой.
+"""
+import datetime
+import os
+import socket
+import threading
+import time
+from collections.abc import Mapping
+from concurrent import futures
+from typing import Callable, Final, Optional, ParamSpec, TypedDict, TypeVar
+
+import bson
+import pymongo
+from pymongo.collection import Collection
+
+from poptimizer.config import POptimizerError
+from poptimizer.store.database import DB, MONGO_CLIENT
+
+# Коллекция для хранения заданий
+_COLLECTION: Final[Collection[dict[str, object]]] = MONGO_CLIENT[DB]["jobs"]
+
+# Длительность аренды задания без продления
+LEASE: Final = datetime.timedelta(minutes=5)
+
+# Интервал продления аренды
+HEARTBEAT: Final = LEASE / 5
+
+# Интервал опроса очереди в секундах
+POLL: Final = 1
+
+# Количество попыток выполнения задания, после которых оно считается неудачным
+MAX_ATTEMPTS: Final = 3
+
+# Состояния задания
+PENDING: Final = "pending"
+LEASED: Final = "leased"
+DONE: Final = "done"
+FAILED: Final = "failed"
+
+_P = ParamSpec("_P")
+_T = TypeVar("_T")
+
+# Операции, которые исполнители выполняют по названию. Каждой операции передается именованный
+# аргумент lease с токеном аренды задания, который меняется при каждой аренде, поэтому операция может
+# защитить свои записи от исполнителя, аренда которого истекла и была перехвачена
+Operations = Mapping[str, Callable[..., object]]  # type: ignore
+
+
+class Job(TypedDict):
+    """Арендованное задание на выполнение операции."""
+
+    _id: bson.ObjectId
+    operation: str
+    args: list[object]
+    kwargs: dict[str, object]
+    token: bson.ObjectId
+    attempts: int
+
+
+def get_collection() -> Collection[dict[str, object]]:
+    """Коллекция для хранения заданий."""
+    return _COLLECTION
+
+
+class JobError(POptimizerError):
+    """Задание не выполнено."""
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+
+def worker_name() -> str:
+    """Уникальное имя исполнителя."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def submit(operation: str, *args: object, **kwargs: object) -> bson.ObjectId:
+    """Добавляет в очередь задание на выполнение операции с аргументами.
+
+    В очереди сохраняются только название операции и аргументы в формате BSON, а сама операция
+    выбирается исполнителем из известных ему операций, поэтому записи в очереди не могут привести к
+    выполнению произвольного кода.
+    """
+    job_id = bson.ObjectId()
+    get_collection().insert_one(
+        {
+            "_id": job_id,
+            "operation": operation,
+            "args": list(args),
+            "kwargs": kwargs,
+            "status": PENDING,
+            "attempts": 0,
+        },
+    )
+    return job_id
+
+
+def acquire(worker: str, lease: datetime.timedelta = LEASE) -> Optional[Job]:
+    """Атомарно арендует самое старое ожидающее задание или задание с истекшей арендой."""
+    now = _now()
+    job: Optional[Job] = get_collection().find_one_and_update(  # type: ignore
+        filter={
+            "$or": [
+                {"status": PENDING},
+                {"status": LEASED, "lease_until": {"$lt": now}, "attempts": {"$lt": MAX_ATTEMPTS}},
+            ],
+        },
+        update={
+            "$set": {
+                "status": LEASED,
+                "worker": worker,
+                "lease_until": now + lease,
+                "token": bson.ObjectId(),
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("_id", pymongo.ASCENDING)],
+        return_document=pymongo.ReturnDocument.AFTER,
+    )
+    return job
+
+
+def _leased_filter(
+    job_id: bson.ObjectId,
+    worker: str,
+    token: Optional[bson.ObjectId],
+) -> dict[str, object]:
+    """Фильтр задания, аренда которого сохранилась за исполнителем и, если указан, токеном аренды."""
+    job_filter: dict[str, object] = {"_id": job_id, "status": LEASED, "worker": worker}
+    if token is not None:
+        job_filter["token"] = token
+    return job_filter
+
+
+def heartbeat(
+    job_id: bson.ObjectId,
+    worker: str,
+    lease: datetime.timedelta = LEASE,
+    token: Optional[bson.ObjectId] = None,
+) -> bool:
+    """Продлевает аренду и возвращает, сохранилась ли она за исполнителем."""
+    rez = get_collection().update_one(
+        _leased_filter(job_id, worker, token),
+        {"$set": {"lease_until": _now() + lease}},
+    )
+    return rez.matched_count == 1
+
+
+def commit(
+    job_id: bson.ObjectId,
+    worker: str,
+    rez: object = None,
+    error: Optional[BaseException] = None,
+    token: Optional[bson.ObjectId] = None,
+) -> bool:
+    """Сохраняет результат, если аренда задания сохранилась за исполнителем.
+
+    Результат должен быть представим в формате BSON, а от ошибки сохраняются название класса и
+    сообщение.
+    """
+    update: dict[str, object] = {"status": DONE, "result": rez}
+    if error is None:
+        error = _bson_error(update)
+    if error is not None:
+        update = {"status": FAILED, "error": _dump_error(error)}
+
+    rez = get_collection().update_one(_leased_filter(job_id, worker, token), {"$set": update})
+    return rez.matched_count == 1
+
+
+def _bson_error(update: dict[str, object]) -> Optional[bson.InvalidDocument]:
+    """Ошибка, если результат не может быть сохранен в формате BSON."""
+    try:
+        bson.encode(update)
+    except bson.InvalidDocument as error:
+        return error
+    return None
+
+
+def _dump_error(error: BaseException) -> dict[str, str]:
+    return {"name": error.__class__.__name__, "message": str(error)}
+
+
+def expire_abandoned() -> int:
+    """Завершает ошибкой задания с истекшей арендой, исчерпавшие количество попыток."""
+    rez = get_collection().update_many(
+        {"status": LEASED, "lease_until": {"$lt": _now()}, "attempts": {"$gte": MAX_ATTEMPTS}},
+        {"$set": {"status": FAILED, "error": _dump_error(JobError("Аренда истекла"))}},
+    )
+    return rez.modified_count
+
+
+def run(job: Job, worker: str, operations: Operations) -> bool:
+    """Выполняет арендованное задание, продлевая аренду в фоновом потоке, и сохраняет результат."""
+    stop = threading.Event()
+    token = job["token"]
+    beats = threading.Thread(
+        target=_heartbeats,
+        args=(job["_id"], worker, token, stop),
+        daemon=True,
+    )
+    beats.start()
+
+    try:
+        if (operation := operations.get(job["operation"])) is None:
+            raise JobError(f"Неизвестная операция {job['operation']}")
+        rez = operation(*job["args"], lease=token, **job["kwargs"])
+    except Exception as error:  # noqa: WPS424
+        return commit(job["_id"], worker, error=error, token=token)
+    finally:
+        stop.set()
+        beats.join()
+
+    return commit(job["_id"], worker, rez, token=token)
+
+
+def _heartbeats(
+    job_id: bson.ObjectId,
+    worker: str,
+    token: bson.ObjectId,
+    stop: threading.Event,
+) -> None:
+    while not stop.wait(HEARTBEAT.total_seconds()):
+        if not heartbeat(job_id, worker, token=token):
+            return
+
+
+def work(operations: Operations, poll: float = POLL) -> None:
+    """Бесконечно выполняет задания из очереди."""
+    worker = worker_name()
+    print(f"Исполнитель {worker} запущен")  # noqa: WPS421
+    while True:  # noqa: WPS457
+        if (job := acquire(worker)) is None:
+            time.sleep(poll)
+            continue
+
+        if not run(job, worker, operations):
+            print(f"Аренда задания {job['_id']} утрачена")  # noqa: WPS421
+
+
+class Executor(futures.Executor):
+    """Исполнитель, распределяющий задания через очередь в MongoDB.
+
+    Задания выполняются процессами на любых узлах, запущенными с помощью work с теми же операциями.
+    Аргументы операций и их результаты должны быть представимы в формате BSON. Результаты передаются
+    в фьючерсы фоновым потоком, который опрашивает очередь.
+    """
+
+    def __init__(self, operations: Operations, poll: float = POLL) -> None:
+        """Запускает фоновый поток опроса очереди."""
+        self._names = {operation: name for name, operation in operations.items()}
+        self._poll = poll
+        self._futures: dict[bson.ObjectId, futures.Future[object]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._poller = threading.Thread(target=self._collect, daemon=True)
+        self._poller.start()
+
+    def submit(
+        self,
+        fn: Callable[_P, _T],
+        /,
+        *args: _P.args,
+        **kwargs: _P.kwargs,
+    ) -> futures.Future[_T]:
+        """Добавляет в очередь задание на выполнение одной из операций исполнителя."""
+        if (name := self._names.get(fn)) is None:
+            raise JobError(f"Неизвестная операция {fn}")
+
+        future: futures.Future[_T] = futures.Future()
+        with self._lock:
+            self._futures[submit(name, *args, **kwargs)] = future  # type: ignore
+
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:  # noqa: WPS110
+        """Прекращает опрос очереди и удаляет из нее свои задания.
+
+        Уже арендованные задания будут выполнены, но их результаты не будут получены.
+        """
+        self._stop.set()
+        if wait:
+            self._poller.join()
+
+        with self._lock:
+            get_collection().delete_many({"_id": {"$in": list(self._futures)}})
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+
+    def _collect(self) -> None:
+        while not self._stop.wait(self._poll):
+            expire_abandoned()
+            with self._lock:
+                ids = list(self._futures)
+            if not ids:
+                continue
+
+            self._collect_done(ids)
+
+    def _collect_done(self, ids: list[bson.ObjectId]) -> None:
+        """Передает в фьючерсы результаты завершившихся заданий.
+
+        Фьючерсы могут быть удалены при завершении работы исполнителя после получения списка ID —
+        такие задания пропускаются.
+        """
+        cursor = get_collection().find({"_id": {"$in": ids}, "status": {"$in": [DONE, FAILED]}})
+        done = {job["_id"]: job for job in cursor}
+        for job_id in ids:
+            if (job := done.get(job_id)) is None:
+                continue
+            with self._lock:
+                future = self._futures.pop(job_id, None)
+            if future is None:
+                continue
+            get_collection().delete_one({"_id": job_id})
+            _set_future(future, job)
+
+
+def _set_future(future: futures.Future[object], job: Mapping[str, object]) -> None:
+    if not future.set_running_or_notify_cancel():
+        return
+    if job["status"] == DONE:
+        future.set_result(job["result"])
+    else:
+        future.set_exception(_load_error(job["error"]))
+
+
+def _load_error(error: object) -> JobError:
+    """Ошибка с названием класса и сообщением исходной ошибки исполнителя."""
+    if not isinstance(error, Mapping):
+        return JobError(error)
+    return JobError(f"{error['name']}: {error['message']}")
@@ -1,23 +1,43 @@
 """Класс организма и операции с популяцией организмов."""
-import contextlib
 import time
-from typing import Iterable, Optional
+from collections.abc import Iterator, Mapping
+from typing import Collection, Iterable, Optional
 
 import bson
 import numpy as np
+import numpy.typing as npt
 import pandas as pd
 import pymongo
 
 from poptimizer import config
-from poptimizer.dl import Forecast, Model
-from poptimizer.evolve import store
+from poptimizer.dl.data_loader import PhenotypeData
+from poptimizer.dl.forecast import Forecast
+from poptimizer.dl.model import CURVE_POINTS, Model, PrunedError
+from poptimizer.evolve import store, surrogate
 from poptimizer.evolve.genotype import Genotype
 
 
+# Режимы получения LLH: загрузка модели, обученной на предыдущих данных, обучение с нуля и дообучение
+LOADED = "loaded"
+SCRATCH = "scratch"
+WARM = "warm"
+
+
+# Минимальное количество организмов с предварительной и полной оценками для калибровки
+SCREEN_MIN_PAIRS = 8
+
+# Количество последних кривых обучения с нуля, с которыми сравниваются кривые новых организмов
+CURVES_HISTORY = 2 * config.MAX_POPULATION
+
+
 class ForecastError(config.POptimizerError):
     """Отсутствующий прогноз."""
 
 
+class ScreenError(config.POptimizerError):
+    """Новый организм не прошел предварительную оценку."""
+
+
 class Organism:
     """Организм и основные операции с ним.
 
@@ -30,9 +50,10 @@ class Organism:
         *,
         _id: Optional[bson.ObjectId] = None,
         genotype: Optional[Genotype] = None,
+        doc: Optional[store.Doc] = None,
     ) -> None:
-        """Загружает организм из базы данных."""
-        self._doc = store.Doc(id_=_id, genotype=genotype)
+        """Загружает организм из базы данных или использует уже загруженный документ."""
+        self._doc = doc or store.Doc(id_=_id, genotype=genotype)
         # TODO: временно — убрать после преобразования всех значений
         if isinstance(self._doc.llh, float):
             self._doc.llh = [self._doc.llh + np.log(config.FORECAST_DAYS) / 2]
@@ -69,6 +90,12 @@ class Organism:
         """Генотип организма."""
         return self._doc.genotype
 
+    @property
+    def model_id(self) -> Optional[bson.ObjectId]:
+        """Ссылка на файл с весами модели, которая меняется при каждом сохранении новых весов."""
+        model_id: Optional[bson.ObjectId] = store.Doc.model.file_id(self._doc)
+        return model_id
+
     @property
     def timer(self) -> float:
         """Генотип организма."""
@@ -84,6 +111,17 @@ class Organism:
         """List of LLH OOS."""
         return self._doc.llh
 
+    @property
+    def modes(self) -> list[Optional[str]]:
+        """Режимы, в которых получены LLH, — для старых оценок режим неизвестен."""
+        modes: list[Optional[str]] = self._doc.modes
+        return modes + [None] * (self.scores - len(modes))
+
+    @property
+    def comparable_llh(self) -> list[float]:
+        """LLH, полученные без дообучения, для статистического сравнения организмов."""
+        return [llh for llh, mode in zip(self.llh, self.modes) if mode != WARM]
+
     @property
     def ir(self) -> float:
         """Information ratio."""
@@ -93,22 +131,52 @@ class Organism:
         """Вычисляет качество организма.
 
         В первый вызов для нового дня используется метрика существующей натренированной модели.
-        При последующих вызовах в течение дня происходит обучение с нуля.
+        При последующих вызовах в течение дня происходит обучение с нуля или, если это задано в
+        настройках, дообучение существующей модели. Режим получения каждого LLH сохраняется.
+
+        Обучение новых организмов прерывается досрочно, если их кривая обучения хуже последних кривых
+        обучения с нуля. Кривые обучения с нуля, в том числе прерванные, сохраняются для последующих
+        сравнений.
         """
         tickers = list(tickers)
         doc = self._doc
 
         pickled_model = None
-        if doc.date is not None and doc.date < end and tickers == doc.tickers:
-            pickled_model = doc.model
-
+        warm_start = None
+        mode = SCRATCH
+        if doc.model is not None and tickers == doc.tickers:
+            if doc.date is not None and doc.date < end:
+                pickled_model, mode = doc.model, LOADED
+            elif config.WARM_START is not None:
+                pickled_model, warm_start, mode = doc.model, config.WARM_START, WARM
+
+        curves = None
+        if not doc.llh:
+            curves = get_curves()
+
+        phenotype = self.genotype.get_phenotype()
         timer = time.monotonic_ns()
-        model = Model(tuple(tickers), end, self.genotype.get_phenotype(), pickled_model)
-        llh, ir = model.quality_metrics
+        model = Model(
+            tuple(tickers),
+            end,
+            phenotype,
+            pickled_model,
+            warm_start,
+            curves,
+        )
+        try:
+            llh, ir = model.quality_metrics
+        except PrunedError:
+            _save_curve(model.curve)
+            raise
 
         if pickled_model is None:
             doc.timer = time.monotonic_ns() - timer
+            doc.flops = surrogate.train_flops(phenotype, len(tickers))
+            doc.curve = model.curve
+            _save_curve(model.curve)
 
+        doc.modes = [mode] + self.modes
         doc.llh = [llh] + doc.llh
         doc.wins = len(doc.llh)
         doc.ir = ir
@@ -122,15 +190,49 @@ class Organism:
 
         return self.llh
 
+    def screen(self, tickers: tuple[str, ...], end: pd.Timestamp) -> float:
+        """Предварительная оценка нового организма с сокращенным количеством эпох обучения.
+
+        Результат сохраняется для калибровки. Если прогноз полного LLH на его основе хуже заданного
+        квантиля популяции, выбрасывается исключение. Если доля эпох не задана, обучение проводится по
+        полной политике.
+        """
+        phenotype = self.genotype.get_phenotype()
+        epochs: float = phenotype["scheduler"]["epochs"]  # type: ignore
+        phenotype["scheduler"]["epochs"] = epochs * (config.SCREEN_EPOCHS or 1)
+
+        model = Model(tuple(tickers), end, phenotype)
+        llh, _ = model.quality_metrics
+
+        threshold = screen_threshold()
+        doc = self._doc
+        doc.screen_llh = llh
+        doc.save()
+
+        if not (llh >= threshold):  # noqa: WPS508 - защита от NaN
+            raise ScreenError(f"LLH {llh:.4f} < {threshold:.4f}")
+
+        return llh
+
     def die(self) -> None:
         """Организм удаляется из популяции."""
         self._doc.delete()
 
-    def make_child(self, scale: float) -> "Organism":
-        """Создает новый организм с помощью дифференциальной мутации."""
-        parent, *_ = [organism.genotype for organism in _sample_organism(1)]
-        child_genotype = self.genotype.make_child(parent, scale)
-        return Organism(genotype=child_genotype)
+    def make_child(self, scale: float, tickers: tuple[str, ...] = ()) -> "Organism":
+        """Создает новый организм с помощью дифференциальной мутации.
+
+        Создается несколько кандидатов со случайными вторыми родителями, из которых с помощью
+        суррогатной модели выбирается наиболее перспективный. Затраты на модели кандидатов
+        оцениваются для количества тикеров, на котором обучался родитель, а если он не обучался —
+        для текущего набора тикеров.
+        """
+        others = [
+            organism.genotype
+            for organism in _sample_organism(surrogate.CANDIDATES, lazy=("curve",))
+        ]
+        candidates = [self.genotype.make_child(other, scale) for other in others]
+        n_tickers = len(self._doc.tickers or tickers)
+        return Organism(genotype=surrogate.select(candidates, n_tickers))
 
     def forecast(self, tickers: tuple[str, ...], end: pd.Timestamp) -> Forecast:
         """Выдает прогноз для текущего организма.
@@ -138,31 +240,92 @@ class Organism:
         При наличии натренированной модели, которая составлена на предыдущей статистике и для таких же
         тикеров, будет использованы сохраненные веса сети, или выбрасывается исключение.
         """
+        model = Model(tickers, end, *self.trained_model(tickers))
+        return self.check_forecast(model.forecast())
+
+    def trained_model(self, tickers: tuple[str, ...]) -> tuple[PhenotypeData, bytes]:
+        """Параметры и веса натренированной модели для прогноза.
+
+        Если модель отсутствует, натренирована для других тикеров или организм удален после пакетной
+        загрузки популяции, выбрасывается исключение.
+        """
         doc = self._doc
         if (pickled_model := doc.model) is None or tickers != tuple(doc.tickers):
             raise ForecastError
 
-        model = Model(tickers, end, self.genotype.get_phenotype(), pickled_model)
-        forecast = model.forecast()
+        try:
+            return self.genotype.get_phenotype(), pickled_model
+        except store.IdError as error:
+            raise ForecastError from error
+
+    def check_forecast(self, forecast: Forecast) -> Forecast:
+        """Организм с некорректным прогнозом удаляется, и выбрасывается исключение."""
         if np.any(np.isnan(forecast.cov)):
             self.die()
             raise ForecastError
         return forecast
 
+    def claim(self, token: bson.ObjectId) -> None:
+        """Арендует организм для оценки — изменения сохраняются, только пока аренда не перехвачена."""
+        self._doc.claim(token)
+
     def save(self) -> None:
         """Сохраняет все изменения в организме."""
         self._doc.save()
 
 
-def _sample_organism(num: int) -> Iterable[Organism]:
+def _exclude(ids: Collection[bson.ObjectId]) -> dict[str, dict[str, object]]:
+    """Стадия агрегации, исключающая организмы, например, находящиеся на обучении."""
+    return {"$match": {store.ID: {"$nin": list(ids)}}}
+
+
+def _lean(lazy: Collection[str] = store.LAZY_FIELDS, *helpers: str) -> dict[str, dict[str, bool]]:
+    """Стадия агрегации, исключающая объемные и вспомогательные поля."""
+    return {"$project": {field: False for field in (*lazy, *helpers)}}
+
+
+def _comparable_llh() -> dict[str, object]:
+    """Выражение агрегации для среднего LLH, полученных без дообучения.
+
+    Режимы хранятся в том же порядке, что и LLH, а для старых оценок могут отсутствовать.
+    """
+    return {
+        "$avg": {
+            "$map": {
+                "input": {"$range": [0, {"$size": "$llh"}]},
+                "as": "n",
+                "in": {
+                    "$cond": [
+                        {"$eq": [{"$arrayElemAt": [{"$ifNull": ["$modes", []]}, "$$n"]}, WARM]},
+                        None,
+                        {"$arrayElemAt": ["$llh", "$$n"]},
+                    ],
+                },
+            },
+        },
+    }
+
+
+def _organisms(docs: Iterable[Mapping[str, object]]) -> Iterator[Organism]:
+    """Организмы на основе документов, полученных одним запросом."""
+    yield from (Organism(doc=store.Doc(fields=doc)) for doc in docs)
+
+
+def _sample_organism(
+    num: int,
+    exclude: Collection[bson.ObjectId] = (),
+    lazy: Collection[str] = store.LAZY_FIELDS,
+) -> Iterable[Organism]:
     """Выбирает несколько случайных организмов.
 
-    Необходимо для реализации размножения и отбора.
+    Необходимо для реализации размножения и отбора. Организмы загружаются одним запросом без полей
+    lazy, которые загружаются при обращении.
     """
     collection = store.get_collection()
-    pipeline = [{"$sample": {"size": num}}, {"$project": {"_id": True}}]
-    organisms = collection.aggregate(pipeline)
-    yield from (Organism(**organism) for organism in organisms)
+    pipeline: list[Mapping[str, object]] = [_exclude(exclude), {"$sample": {"size": num}}]
+    if lazy:
+        pipeline.append(_lean(lazy))
+    yield from _organisms(collection.aggregate(pipeline))
 
 
 def count() -> int:
@@ -184,80 +347,134 @@ def get_random_organism() -> Organism:
     return organism
 
 
-def get_parent() -> Organism:
+def get_parent(exclude: Collection[bson.ObjectId] = ()) -> Organism:
     """Родитель отбирается по трем критериям среди давно не оценивавшихся.
 
-    - Должен входить в лучшую половину по LLH
+    - Должен входить в лучшую половину по LLH, полученным без дообучения
     - Внутри этой половины входить в лучшую половину по IR
     - Было затрачено минимальное время на обучение
+
+    Организмы из exclude не рассматриваются.
     """
     n_llh = (config.MAX_POPULATION + 1) // 2
     n_irr = (n_llh + 1) // 2
 
     collection = store.get_collection()
-    pipeline = [
+    pipeline: list[Mapping[str, object]] = [
+        _exclude(exclude),
+        _lean(store.LAZY_FIELDS),
         {
-            "$project": {
-                "date": True,
-                "llh": {"$avg": "$llh"},
-                "ir": True,
+            "$addFields": {
+                "mean_llh": _comparable_llh(),
                 "total": {"$multiply": ["$timer", "$wins"]},
             },
         },
-        {"$sort": {"date": pymongo.ASCENDING, "llh": pymongo.DESCENDING}},
+        {"$sort": {"date": pymongo.ASCENDING, "mean_llh": pymongo.DESCENDING}},
         {"$limit": n_llh},
         {"$sort": {"date": pymongo.ASCENDING, "ir": pymongo.DESCENDING}},
         {"$limit": n_irr},
         {"$sort": {"date": pymongo.ASCENDING, "total": pymongo.ASCENDING}},
         {"$limit": 1},
-        {"$project": {"_id": True}},
+        _lean((), "mean_llh", "total"),
     ]
-    doc = next(collection.aggregate(pipeline))
+    return next(_organisms(collection.aggregate(pipeline)))
 
-    return Organism(**doc)
 
+def get_prey(exclude: Collection[bson.ObjectId] = ()) -> Organism:
+    """Жертва — самый слабый по LLH среди давно не оценивавшихся, кроме организмов из exclude.
 
-def get_prey() -> Organism:
-    """Жертва — самый слабый по LLH среди давно не оценивавшихся."""
+    LLH, полученные с дообучением, не учитываются, так как не сравнимы с остальными.
+    """
     collection = store.get_collection()
-    pipeline = [
-        {"$project": {"date": True, "llh": {"$avg": "$llh"}}},
-        {"$sort": {"date": pymongo.ASCENDING, "llh": pymongo.ASCENDING}},
+    pipeline: list[Mapping[str, object]] = [
+        _exclude(exclude),
+        _lean(store.LAZY_FIELDS),
+        {"$addFields": {"mean_llh": _comparable_llh()}},
+        {"$sort": {"date": pymongo.ASCENDING, "mean_llh": pymongo.ASCENDING}},
         {"$limit": 1},
-        {"$project": {"_id": True}},
+        _lean((), "mean_llh"),
     ]
-    doc = next(collection.aggregate(pipeline))
-
-    return Organism(**doc)
+    return next(_organisms(collection.aggregate(pipeline)))
 
 
-def get_all_organisms() -> Iterable[Organism]:
-    """Получить все имеющиеся организмы."""
+def get_all_organisms(lazy: Collection[str] = store.LAZY_FIELDS) -> Iterable[Organism]:
+    """Получить все имеющиеся организмы одним запросом без полей lazy."""
     collection = store.get_collection()
-    id_dicts = collection.find(
+    docs = collection.find(
         filter={},
-        projection=["_id"],
+        projection={field: False for field in lazy} or None,
         sort=[("date", pymongo.ASCENDING), ("llh", pymongo.DESCENDING)],
     )
-    for id_dict in id_dicts:
-        with contextlib.suppress(store.IdError):
-            yield Organism(**id_dict)
+    yield from _organisms(docs)
 
 
-def print_stat() -> None:
-    """Статистика — минимальное и максимальное значение коэффициента Шарпа."""
-    _print_key_stats("llh")
-    _print_key_stats("ir")
-    _print_wins_stats()
+def _save_curve(curve: Optional[list[float]]) -> None:
+    """Сохраняет кривую обучения с нуля, в том числе прерванного досрочно."""
+    if curve:
+        store.get_curves_collection().insert_one({"curve": curve})
 
 
-def _print_key_stats(key: str) -> None:
-    """Статистика по минимуму, медиане и максимуму llh."""
+def get_curves() -> npt.NDArray[np.float64]:
+    """Последние кривые обучения с нуля размером (кривые, CURVE_POINTS).
+
+    Учитываются кривые всех организмов, в том числе погибших и прерванных досрочно, чтобы порог не
+    смещался в сторону выживших. Точки после прерывания обучения отсутствуют.
+    """
+    cursor = store.get_curves_collection().find(
+        projection={store.ID: False, "curve": True},
+        sort=[(store.ID, pymongo.DESCENDING)],
+        limit=CURVES_HISTORY,
+    )
+    curves = [doc["curve"][:CURVE_POINTS] for doc in cursor]
+    padded = np.full((len(curves), CURVE_POINTS), np.nan)
+    for row, curve in zip(padded, curves):
+        row[: len(curve)] = curve
+
+    return padded
+
+
+def screen_threshold() -> float:
+    """Порог предварительной оценки.
+
+    Связь между предварительными и полными оценками организмов популяции оценивается с помощью
+    линейной регрессии. Порогом является предварительная оценка, для которой прогноз полной оценки
+    равен заданному квантилю полных оценок популяции. Если данных недостаточно или связь
+    отсутствует, порог не ограничивает организмы.
+    """
+    collection = store.get_collection()
+    cursor = collection.find(
+        filter={"screen_llh": {"$type": "number"}, "llh.0": {"$exists": True}},
+        projection=["screen_llh", "llh"],
+    )
+    pairs = np.array([(doc["screen_llh"], np.mean(doc["llh"])) for doc in cursor])
+
+    if len(pairs) < SCREEN_MIN_PAIRS:
+        return -np.inf
+
+    screen, full = pairs.T
+    slope, intercept = np.polyfit(screen, full, 1)
+    if not (slope > 0):  # noqa: WPS508 - защита от NaN
+        return -np.inf
+
+    return float((np.quantile(full, config.SCREEN_QUANTILE) - intercept) / slope)
+
+
+def print_stat() -> None:
+    """Статистика — минимальное и максимальное значение коэффициента Шарпа.
+
+    Рассчитывается по снимку легких полей всех организмов, загруженному одним запросом.
+    """
     collection = store.get_collection()
-    db_find = collection.find
-    cursor = db_find(filter={key: {"$exists": True}}, projection=[key])
+    docs = list(collection.find(filter={}, projection=["llh", "ir", "wins"]))
+
+    _print_key_stats(docs, "llh")
+    _print_key_stats(docs, "ir")
+    _print_wins_stats(docs)
 
-    keys = map(lambda doc: doc[key], cursor)
+
+def _print_key_stats(docs: list[Mapping[str, object]], key: str) -> None:
+    """Статистика по минимуму, медиане и максимуму llh."""
+    keys = (doc[key] for doc in docs if key in doc)
     keys = map(
         lambda amount: amount if isinstance(amount, float) else np.array(amount).mean(),
         keys,
@@ -276,20 +493,9 @@ def _print_key_stats(key: str) -> None:
     print(f"{key.upper()} - ({quantiles})")  # noqa: WPS421
 
 
-def _print_wins_stats() -> None:
+def _print_wins_stats(docs: list[Mapping[str, object]]) -> None:
     """Статистика по максимуму побед."""
-    collection = store.get_collection()
-    db_find = collection.find
-    request = {
-        "filter": {"wins": {"$exists": True}},
-        "projection": ["wins"],
-        "sort": [("wins", pymongo.DESCENDING)],
-        "limit": 1,
-    }
-    wins = list(db_find(**request))
-    max_wins = None
-    if wins:
-        max_wins, *_ = wins
-        max_wins = max_wins["wins"]
+    wins = [doc_wins for doc in docs if isinstance(doc_wins := doc.get("wins"), int)]
+    max_wins = max(wins, default=None)
 
     print(f"Максимум оценок - {max_wins}")  # noqa: WPS421
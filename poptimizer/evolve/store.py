@@ -1,8 +1,11 @@
 """Доступ к данным для эволюции."""
 import math
+import zlib
+from collections.abc import Mapping
 from typing import Any, Callable, Final, Optional
 
 import bson
+import gridfs
 from pymongo.collection import Collection
 
 from poptimizer.config import POptimizerError
@@ -15,12 +18,33 @@ _COLLECTION = MONGO_CLIENT[DB]["models"]
 # Название столбца с индексом
 ID: Final = "_id"
 
+# Поле с токеном аренды документа исполнителем
+LEASE: Final = "lease"
+
+# Объемные поля, которые не загружаются при пакетной загрузке документов и получаются при обращении
+LAZY_FIELDS: Final = ("genotype", "curve")
+
 
 def get_collection() -> Collection:
     """Коллекция для хранения моделей."""
     return _COLLECTION
 
 
+def get_curves_collection() -> Collection[dict[str, list[float]]]:
+    """Коллекция кривых обучения в пространстве имен коллекции моделей.
+
+    Кривые сохраняются независимо от документов организмов, поэтому не удаляются при их гибели.
+    """
+    collection = get_collection()
+    return collection.database[f"{collection.name}.curves"]
+
+
+def get_blobs() -> gridfs.GridFS:
+    """Хранилище весов моделей в GridFS с коллекциями в пространстве имен коллекции моделей."""
+    collection = get_collection()
+    return gridfs.GridFS(collection.database, collection=collection.name)
+
+
 class BaseField:
     """Базовый дескриптор поля.
 
@@ -30,7 +54,7 @@ class BaseField:
 
     def __init__(self, *, index: bool = False):
         """Для индексируемых полей сохраняет специальное значение названия поля."""
-        self._name = index and ID
+        self._name: str = ID if index else ""
 
     def __set_name__(self, owner: type, name: str):
         """Использует специальное имя для индексируемых полей."""
@@ -47,6 +71,7 @@ class BaseField:
 
     def __get__(self, instance: Any, owner: type) -> Any:
         """Получает значение атрибута дескриптера."""
+        _fetch_lazy(instance, self._name)
         data_dict = vars(instance)  # noqa: WPS421
         try:
             return data_dict[self._name]
@@ -54,6 +79,12 @@ class BaseField:
             raise AttributeError(f"'{owner.__name__}' object has no attribute {error}")
 
 
+def _fetch_lazy(instance: object, name: str) -> None:
+    """Загружает объемные поля документа при первом обращении к одному из них."""
+    if isinstance(instance, Doc) and name in instance._lazy:  # noqa: WPS437
+        instance.fetch_lazy()
+
+
 class DefaultField(BaseField):
     """Дескриптор поля со значением по умолчанию."""
 
@@ -64,6 +95,7 @@ class DefaultField(BaseField):
 
     def __get__(self, instance: Any, owner: type) -> Any:
         """При отсутствии значения возвращает значение по умолчанию."""
+        _fetch_lazy(instance, self._name)
         data_dict = vars(instance)  # noqa: WPS421
         return data_dict.get(self._name, self._default)
 
@@ -78,6 +110,7 @@ class FactoryField(BaseField):
 
     def __get__(self, instance: Any, owner: type) -> Any:
         """При отсутствии значения возвращает результат вызова фабрики."""
+        _fetch_lazy(instance, self._name)
         data_dict = vars(instance)  # noqa: WPS421
         return data_dict.get(self._name, self._factory())
 
@@ -92,10 +125,90 @@ class GenotypeField(BaseField):
         super().__set__(instance, value)
 
 
+class BlobField(BaseField):
+    """Дескриптор для двоичных данных, хранящихся в GridFS в сжатом виде.
+
+    В документе сохраняется ссылка на файл, а данные загружаются при первом обращении к полю. Новое
+    значение записывается в GridFS при сохранении документа, после чего старый файл удаляется.
+    Данные, сохраненные внутри документа до перехода на GridFS, читаются как есть.
+    """
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        """Дополнительно формирует имена для загруженных данных и заменяемого файла."""
+        super().__set_name__(owner, name)
+        self._data = f"_{name}_data"
+        self._replaced = f"_{name}_replaced"
+
+    def __set__(self, instance: object, value: object) -> None:  # noqa: WPS110
+        """Ссылка на файл сохраняется как есть, а данные запоминаются для записи при сохранении."""
+        data_dict = vars(instance)  # noqa: WPS421
+        if isinstance(data_dict.get(self._name), bson.ObjectId):
+            data_dict.setdefault(self._replaced, data_dict[self._name])
+        data_dict.pop(self._data, None)
+        if not isinstance(value, bson.ObjectId):
+            data_dict[self._data] = value
+        super().__set__(instance, value)
+
+    def __get__(self, instance: Any, owner: type) -> Any:
+        """При первом обращении загружает данные по ссылке, а при обращении через класс — дескриптор."""
+        if instance is None:
+            return self
+        _fetch_lazy(instance, self._name)
+        data_dict = vars(instance)  # noqa: WPS421
+        if self._data not in data_dict:
+            data_dict[self._data] = _read_blob(data_dict.get(self._name))
+        return data_dict[self._data]
+
+    def pending(self, instance: object) -> bool:
+        """Есть ли новое значение, которое будет записано в GridFS при сохранении."""
+        return isinstance(vars(instance)["_update"].get(self._name), bytes)  # noqa: WPS421
+
+    def flush(self, instance: object) -> Optional[bson.ObjectId]:
+        """Записывает новое значение в GridFS и возвращает ссылку на заменяемый файл."""
+        data_dict = vars(instance)  # noqa: WPS421
+        update = data_dict["_update"]
+        if self.pending(instance):
+            file_id = get_blobs().put(zlib.compress(update[self._name]))
+            update[self._name] = file_id
+            data_dict[self._name] = file_id
+        replaced = data_dict.pop(self._replaced, None)
+        return replaced if isinstance(replaced, bson.ObjectId) else None
+
+    def file_id(self, instance: object) -> Optional[bson.ObjectId]:
+        """Ссылка на файл с данными, если они хранятся в GridFS."""
+        file_id = vars(instance).get(self._name)  # noqa: WPS421
+        return file_id if isinstance(file_id, bson.ObjectId) else None
+
+
+def _read_blob(stored: object) -> Optional[bytes]:
+    if not isinstance(stored, bson.ObjectId):
+        return stored if isinstance(stored, bytes) else None
+    try:
+        return zlib.decompress(get_blobs().get(stored).read())
+    except gridfs.errors.NoFile:
+        return None
+
+
+def migrate_blobs(field: str = "model") -> int:
+    """Переносит данные, сохраненные внутри документов, в GridFS и возвращает количество документов."""
+    collection = get_collection()
+    cursor = collection.find({field: {"$type": "binData"}}, projection=[field])
+    count = 0
+    for doc in cursor:
+        file_id = get_blobs().put(zlib.compress(doc[field]))
+        collection.update_one({ID: doc[ID]}, {"$set": {field: file_id}})
+        count += 1
+    return count
+
+
 class IdError(POptimizerError):
     """Ошибка попытки загрузить ID, которого нет в MongoDB."""
 
 
+class LeaseError(POptimizerError):
+    """Документ арендован другим исполнителем, и изменения не сохранены."""
+
+
 class Doc:
     """Документ в базе данных."""
 
@@ -104,30 +217,81 @@ class Doc:
         *,
         id_: Optional[bson.ObjectId] = None,
         genotype: Optional[Genotype] = None,
+        fields: Optional[Mapping[str, object]] = None,
     ):
-        """Создает словарь для хранения изменений. Загружает данные по id или создает id."""
-        self._update = {}
-        if id_ is None:
+        """Создает словарь для хранения изменений. Загружает данные по id или создает id.
+
+        Если переданы поля документа, полученные пакетным запросом, то они используются без
+        дополнительного обращения к базе, а отсутствующие среди них LAZY_FIELDS загружаются при
+        первом обращении.
+        """
+        self._update: dict[str, object] = {}
+        self._lazy: frozenset[str] = frozenset()
+        self._lease_token: Optional[bson.ObjectId] = None
+        if fields is not None:
+            self._fill(fields)
+            self._lazy = frozenset(LAZY_FIELDS) - fields.keys()
+        elif id_ is None:
             self.id = bson.ObjectId()  # noqa: WPS601
             self.genotype = genotype  # noqa: WPS601
         else:
             self._load(id_)
 
+    def claim(self, token: bson.ObjectId) -> None:
+        """Арендует документ — последующие изменения сохраняются, только пока аренда не перехвачена.
+
+        Повторная аренда с другим токеном отменяет сохранение изменений предыдущим арендатором.
+        """
+        rez = get_collection().update_one({ID: self.id}, {"$set": {LEASE: token}})
+        if rez.matched_count != 1:
+            raise IdError(self.id)
+        self._lease_token = token
+
     def save(self) -> None:
-        """Сохраняет измененные значения в MongoDB."""
+        """Сохраняет измененные значения в MongoDB.
+
+        Изменения арендованного документа сохраняются, только если аренда не перехвачена, иначе
+        выбрасывается исключение, а записанные в GridFS файлы удаляются.
+        """
         collection = get_collection()
         update = self._update
-        collection.update_one(
-            filter={ID: self.id},
-            update={"$set": self._update},
-            upsert=True,
-        )
+        written = [field for field in _blob_fields(self) if field.pending(self)]
+        replaced = [field.flush(self) for field in _blob_fields(self)]
+
+        if self._lease_token is None:
+            collection.update_one(filter={ID: self.id}, update={"$set": update}, upsert=True)
+        else:
+            rez = collection.update_one({ID: self.id, LEASE: self._lease_token}, {"$set": update})
+            if rez.matched_count != 1:
+                for field in written:
+                    get_blobs().delete(field.file_id(self))
+                raise LeaseError(self.id)
+
         update.clear()
+        for file_id in filter(None, replaced):
+            get_blobs().delete(file_id)
 
     def delete(self) -> None:
-        """Удаляет документ из базы."""
+        """Удаляет документ и связанные с ним файлы из базы."""
         collection = get_collection()
         collection.delete_one({ID: self.id})
+        for field in _blob_fields(self):
+            if (file_id := field.file_id(self)) is not None:
+                get_blobs().delete(file_id)
+
+    def fetch_lazy(self) -> None:
+        """Загружает объемные поля, не полученные при пакетной загрузке."""
+        lazy, self._lazy = self._lazy, frozenset()
+        doc = get_collection().find_one({ID: self.id}, projection=list(lazy))
+
+        if doc is None:
+            raise IdError(self.id)
+
+        update = self._update
+        for key in lazy & doc.keys():
+            if key not in vars(self):  # noqa: WPS421
+                setattr(self, key, doc[key])
+                update.pop(key)
 
     def _load(self, id_: bson.ObjectId) -> None:
         collection = get_collection()
@@ -136,6 +300,9 @@ class Doc:
         if doc is None:
             raise IdError(id_)
 
+        self._fill(doc)
+
+    def _fill(self, doc: Mapping[str, object]) -> None:
         for key, value in doc.items():  # noqa: WPS110
             setattr(self, key, value)
 
@@ -144,9 +311,17 @@ class Doc:
     id = BaseField(index=True)
     genotype = GenotypeField()
     wins = DefaultField(0)
-    model = DefaultField()
+    model = BlobField()
     llh = FactoryField(list)
+    modes = FactoryField(list)
+    curve = DefaultField()
+    screen_llh = DefaultField()
     ir = DefaultField(-math.inf)
     date = DefaultField()
     timer = DefaultField(0)
+    flops = DefaultField()
     tickers = DefaultField()
+
+
+def _blob_fields(doc: Doc) -> list[BlobField]:
+    return [field for field in vars(type(doc)).values() if isinstance(field, BlobField)]  # noqa: WPS421
@@ -0,0 +1,176 @@
+"""Суррогатная модель для отбора потомков до обучения.
+
+По истории оцененных организмов оценивается зависимость LLH от значений генов, а время обучения — по
+количеству операций модели. Это позволяет из нескольких кандидатов в потомки выбрать наиболее
+перспективного.
+"""
+import numpy as np
+import numpy.typing as npt
+from scipy import linalg
+
+from poptimizer.dl import cost
+from poptimizer.dl.data_loader import PhenotypeData
+from poptimizer.dl.model import ModelError, check_cost
+from poptimizer.evolve import store
+from poptimizer.evolve.genotype import Genotype
+
+# Количество кандидатов, из которых выбирается потомок
+CANDIDATES = 8
+
+# Минимальное количество оцененных организмов для использования суррогатной модели
+MIN_HISTORY = 16
+
+# Доля дисперсии целевой переменной, приходящаяся на шум
+NOISE = 0.1
+
+# Названия генов в векторном представлении генотипа
+GeneNames = list[tuple[str, str]]
+
+# Вещественный массив значений генов, LLH, времени обучения и операций
+Array = npt.NDArray[np.float64]
+
+
+def gene_names(genotype: Genotype) -> GeneNames:
+    """Упорядоченные названия хромосом и генов."""
+    return [(key, gene) for key in sorted(genotype) for gene in sorted(genotype[key])]
+
+
+def gene_vector(genotype: Genotype, names: GeneNames) -> Array:
+    """Значения генов в виде вектора."""
+    return np.array([genotype[key][gene] for key, gene in names], dtype=float)
+
+
+class GaussianProcess:
+    """Регрессия на основе гауссовского процесса с RBF-ядром.
+
+    Признаки и целевая переменная стандартизируются. Масштаб ядра выбирается равным медиане попарных
+    расстояний между обучающими примерами.
+    """
+
+    def __init__(self, noise: float = NOISE) -> None:
+        """Сохраняет долю дисперсии, приходящуюся на шум."""
+        self._noise = noise
+        self._x_mean: Array = np.zeros(0)
+        self._x_std: Array = np.ones(0)
+        self._y_mean = 0.0
+        self._y_std = 1.0
+        self._x_train: Array = np.zeros((0, 0))
+        self._length = 1.0
+        self._alpha: Array = np.zeros(0)
+
+    def fit(self, x_train: Array, y_train: Array) -> "GaussianProcess":
+        """Обучает модель на примерах размером (количество, признаки)."""
+        self._x_mean = x_train.mean(axis=0)
+        self._x_std = x_train.std(axis=0) + np.finfo(float).eps
+        self._y_mean = float(y_train.mean())
+        self._y_std = float(y_train.std()) + np.finfo(float).eps
+
+        self._x_train = (x_train - self._x_mean) / self._x_std
+        distances = _distances(self._x_train, self._x_train)
+        self._length = float(np.median(distances[distances > 0])) if np.any(distances > 0) else 1.0
+
+        kernel = self._kernel(distances) + self._noise * np.eye(len(x_train))
+        self._alpha = linalg.cho_solve(
+            linalg.cho_factor(kernel),
+            (y_train - self._y_mean) / self._y_std,
+        )
+
+        return self
+
+    def predict(self, x_test: Array) -> Array:
+        """Прогноз среднего значения."""
+        x_test = (x_test - self._x_mean) / self._x_std
+        kernel = self._kernel(_distances(x_test, self._x_train))
+        return self._y_mean + self._y_std * kernel @ self._alpha
+
+    def _kernel(self, distances: Array) -> Array:
+        return np.exp(-((distances / self._length) ** 2) / 2)
+
+
+def _distances(x_left: Array, x_right: Array) -> Array:
+    diff = x_left[:, np.newaxis, :] - x_right[np.newaxis, :, :]
+    distances: Array = np.sqrt((diff ** 2).sum(axis=-1))
+    return distances
+
+
+def train_flops(phenotype: PhenotypeData, n_tickers: int) -> float:
+    """Количество операций для обучения модели."""
+    return cost.train_flops(phenotype, cost.estimate(phenotype, n_tickers))
+
+
+def load_history(names: GeneNames) -> tuple[Array, Array, Array, Array]:
+    """Векторы генов, средние LLH, время оценки в секундах и операции обучения оцененных организмов.
+
+    Количество операций сохраняется при оценке организма и рассчитывается заново только для
+    организмов, оцененных до появления этого поля.
+    """
+    collection = store.get_collection()
+    cursor = collection.find(
+        filter={"llh.0": {"$exists": True}, "timer": {"$gt": 0}},
+        projection=["genotype", "llh", "timer", "tickers", "flops"],
+    )
+
+    genes = []
+    llh = []
+    seconds = []
+    flops = []
+    for doc in cursor:
+        genotype = Genotype(doc["genotype"])
+        genes.append(gene_vector(genotype, names))
+        llh.append(np.mean(doc["llh"]))
+        seconds.append(doc["timer"] / 10 ** 9)
+        if (doc_flops := doc.get("flops")) is None:
+            doc_flops = train_flops(genotype.get_phenotype(), len(doc["tickers"]))
+        flops.append(doc_flops)
+
+    return (
+        np.array(genes).reshape(-1, len(names)),
+        np.array(llh),
+        np.array(seconds),
+        np.array(flops),
+    )
+
+
+def feasible(candidates: list[Genotype], n_tickers: int) -> list[tuple[Genotype, float]]:
+    """Кандидаты, прошедшие проверку затрат на модель, и количество операций для их обучения."""
+    rez = []
+    for candidate in candidates:
+        phenotype = candidate.get_phenotype()
+        try:
+            model_cost = check_cost(phenotype, n_tickers)
+        except ModelError:
+            continue
+        rez.append((candidate, cost.train_flops(phenotype, model_cost)))
+
+    return rez
+
+
+def select(candidates: list[Genotype], n_tickers: int) -> Genotype:
+    """Выбирает кандидата с наилучшим прогнозом прироста LLH на секунду обучения.
+
+    Кандидаты с непригодными моделями отбрасываются, если есть хотя бы один пригодный. Прирост
+    считается относительно худшего LLH среди оцененных организмов и прогнозов кандидатов, поэтому он
+    не бывает отрицательным, а время обучения прогнозируется по количеству операций. Если оцененных
+    организмов недостаточно, выбирается первый кандидат.
+    """
+    if not (checked := feasible(candidates, n_tickers)):
+        return candidates[0]
+    candidates = [candidate for candidate, _ in checked]
+    candidates_flops = np.array([flops for _, flops in checked])
+
+    names = gene_names(candidates[0])
+    genes, llh, seconds, flops = load_history(names)
+    finite = np.isfinite(llh)
+    if finite.sum() < MIN_HISTORY or len(candidates) == 1:
+        return candidates[0]
+
+    genes, llh, seconds, flops = genes[finite], llh[finite], seconds[finite], flops[finite]
+    candidates_genes = np.stack([gene_vector(candidate, names) for candidate in candidates])
+
+    llh_forecast = GaussianProcess().fit(genes, llh).predict(candidates_genes)
+    seconds_forecast = cost.TimeModel().fit(flops, seconds).predict(candidates_flops)
+
+    gain = llh_forecast - min(llh.min(), llh_forecast.min()) + np.finfo(float).eps
+    score = gain / seconds_forecast
+
+    return candidates[int(np.argmax(score))]
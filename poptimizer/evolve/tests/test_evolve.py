@@ -1,7 +1,7 @@
 """Тесты для эволюционного процесса."""
 import pytest
 
-from poptimizer.dl import ModelError
+from poptimizer.dl import ModelError, PrunedError
 from poptimizer.evolve import evolve
 
 
@@ -71,3 +71,87 @@ def test_eval_and_print_low_ir(mocker):
     assert evolution._scale == pytest.approx(evolve.SCALE_DOWN)
 
     org.evaluate_fitness.assert_called_once()
+
+
+class FakePool:
+    """Пул, который сразу выполняет задачу в текущем процессе."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append(args)
+        future = evolve.futures.Future()
+        future.set_result("ModelError")
+        return future
+
+
+def test_dispatch_to_pool(mocker):
+    """Организм сохраняется перед отправкой в пул, а результат обрабатывается после завершения."""
+    fake_population = mocker.patch.object(evolve, "population")
+    org = mocker.Mock()
+
+    evolution = evolve.Evolution(n_workers=2)
+    evolution._pool = FakePool()
+    evolution._dispatch("name", org)
+
+    org.save.assert_called_once_with()
+    assert evolution._pool.submitted == [(org.id, evolution._tickers, evolution._end)]
+
+    assert not evolution._in_flight
+    fake_population.Organism.assert_called_once_with(_id=org.id)
+    fake_population.Organism.return_value.die.assert_called_once_with()
+    assert evolution._scale == pytest.approx(evolve.SCALE_DOWN)
+
+
+def test_collect_failed_evaluation(mocker):
+    """Оценка, завершившаяся исключением, считается ошибкой организма."""
+    fake_population = mocker.patch.object(evolve, "population")
+    future = evolve.futures.Future()
+    future.set_exception(evolve.process.BrokenProcessPool())
+
+    evolution = evolve.Evolution(n_workers=2)
+    evolution._in_flight = {future: ("name", 1)}
+    evolution._collect(wait=True)
+
+    assert not evolution._in_flight
+    fake_population.Organism.assert_called_once_with(_id=1)
+    fake_population.Organism.return_value.die.assert_called_once_with()
+    assert evolution._scale == pytest.approx(evolve.SCALE_DOWN)
+
+
+def test_dispatch_to_broken_pool(mocker):
+    """Сломанный пул процессов пересоздается."""
+    mocker.patch.object(evolve, "population")
+    make_pool = mocker.patch.object(evolve.workers, "make_pool", return_value=FakePool())
+    broken_pool = mocker.Mock()
+    broken_pool.submit.side_effect = evolve.process.BrokenProcessPool
+
+    evolution = evolve.Evolution(n_workers=2)
+    evolution._pool = broken_pool
+    evolution._dispatch("name", mocker.Mock())
+
+    broken_pool.shutdown.assert_called_once_with(wait=False)
+    make_pool.assert_called_once_with(2)
+    assert len(evolution._pool.submitted) == 1
+
+
+def test_busy(mocker):
+    """Организмы на оценке исключаются из отбора."""
+    evolution = evolve.Evolution(n_workers=2)
+    evolution._in_flight = {mocker.Mock(): ("name", 1), mocker.Mock(): ("name", 2)}
+
+    assert evolution._busy() == [1, 2]
+
+
+def test_eval_pruned(mocker):
+    """Досрочное прерывание обучения не меняет шкалу разброса."""
+    org = mocker.Mock()
+    org.evaluate_fitness.side_effect = PrunedError
+
+    evolution = evolve.Evolution()
+    evolution._eval_organism("name", org)
+
+    assert evolution._scale == pytest.approx(1)
+
+    org.die.assert_called_once_with()
@@ -1,9 +1,9 @@
-from collections import Iterable
+from collections.abc import Iterable
 
 import pandas as pd
 import pytest
 
-from poptimizer.dl import Forecast
+from poptimizer.dl import Forecast, forecast
 from poptimizer.evolve import forecaster, population, store
 
 
@@ -13,6 +13,12 @@ def set_test_collection():
     saved_collection = store._COLLECTION
     test_collection = saved_collection.database["test"]
     store._COLLECTION = test_collection
+    saved_forecasts = forecaster._COLLECTION
+    forecasts_collection = saved_collection.database["test_forecasts"]
+    forecaster._COLLECTION = forecasts_collection
+    saved_cor_store = forecast.COR_STORE
+    cor_collection = saved_collection.database["test_ledoit_wolf"]
+    forecast.COR_STORE = forecaster.COR_STORE = forecast.CorStore(collection=cor_collection)
 
     org = population.create_new_organism()
     org.evaluate_fitness(("TGKBP", "TRNFP"), pd.Timestamp("2020-05-23"))
@@ -28,7 +34,11 @@ def set_test_collection():
     yield
 
     store._COLLECTION = saved_collection
+    forecaster._COLLECTION = saved_forecasts
+    forecast.COR_STORE = forecaster.COR_STORE = saved_cor_store
     test_collection.drop()
+    forecasts_collection.drop()
+    cor_collection.drop()
 
 
 def forecasts_checkup(forecasts: forecaster.Forecasts):
@@ -51,9 +61,33 @@ def test_get_forecasts():
     forecasts_checkup(forecasts)
 
 
-def test_get_forecasts_from_cache():
+def test_get_forecasts_from_cache(monkeypatch):
+    def fake_forecast(*_):
+        raise AssertionError("Прогноз должен быть загружен из кеша")
+
+    monkeypatch.setattr(forecaster.ensemble, "forecast", fake_forecast)
     forecasts = forecaster.get_forecasts(
         ("TGKBP", "TRNFP"), pd.Timestamp("2020-05-23")
     )
 
     forecasts_checkup(forecasts)
+
+
+def test_get_forecasts_recompute_changed_model(monkeypatch):
+    doc = store.get_collection().find_one({"tickers": ["TGKBP", "TRNFP"]})
+    organism = population.Organism(_id=doc[store.ID])
+    organism.evaluate_fitness(("TGKBP", "TRNFP"), pd.Timestamp("2020-05-23"))
+
+    calls = []
+    saved_forecast = forecaster.ensemble.forecast
+
+    def count_forecast(tickers, date, trained_models):
+        calls.append(len(trained_models))
+        return saved_forecast(tickers, date, trained_models)
+
+    monkeypatch.setattr(forecaster.ensemble, "forecast", count_forecast)
+    forecasts = forecaster.get_forecasts(("TGKBP", "TRNFP"), pd.Timestamp("2020-05-23"))
+
+    forecasts_checkup(forecasts)
+    assert calls == [1]
+    assert forecaster.get_collection().count_documents({}) == 3
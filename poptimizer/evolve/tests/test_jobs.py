@@ -0,0 +1,166 @@
+"""Тесты для очереди заданий в MongoDB."""
+import datetime
+from concurrent import futures
+
+import pytest
+
+from poptimizer.evolve import jobs
+
+WORKER = "node:1"
+OTHER = "node:2"
+
+
+@pytest.fixture(autouse=True)
+def set_test_collection():
+    # noinspection PyProtectedMember
+    saved_collection = jobs._COLLECTION
+    test_collection = saved_collection.database["test_jobs"]
+    jobs._COLLECTION = test_collection
+
+    yield
+
+    jobs._COLLECTION = saved_collection
+    test_collection.drop()
+
+
+def add_job(first, second, lease=None):
+    return first + second
+
+
+def fail_job(lease=None):
+    raise ValueError("bad job")
+
+
+def token_job(lease=None):
+    return lease
+
+
+OPERATIONS = {"add": add_job, "fail": fail_job, "token": token_job}
+
+
+def test_acquire_and_commit():
+    job_id = jobs.submit("add", 2, 3)
+
+    job = jobs.acquire(WORKER)
+    assert job["_id"] == job_id
+    assert job["status"] == jobs.LEASED
+    assert job["attempts"] == 1
+    assert jobs.acquire(OTHER) is None
+
+    assert jobs.run(job, WORKER, OPERATIONS)
+
+    doc = jobs.get_collection().find_one({"_id": job_id})
+    assert doc["status"] == jobs.DONE
+    assert doc["result"] == 5
+
+
+def test_acquire_oldest_first():
+    first = jobs.submit("add", 1, 1)
+    second = jobs.submit("add", 2, 2)
+
+    assert jobs.acquire(WORKER)["_id"] == first
+    assert jobs.acquire(OTHER)["_id"] == second
+
+
+def test_expired_lease_is_reacquired():
+    job_id = jobs.submit("add", 2, 3)
+    job = jobs.acquire(WORKER, lease=datetime.timedelta(seconds=-1))
+
+    reacquired = jobs.acquire(OTHER)
+    assert reacquired["_id"] == job_id
+    assert reacquired["attempts"] == 2
+
+    assert not jobs.heartbeat(job_id, WORKER)
+    assert not jobs.run(job, WORKER, OPERATIONS)
+    assert jobs.heartbeat(job_id, OTHER)
+    assert jobs.run(reacquired, OTHER, OPERATIONS)
+
+
+def test_expire_abandoned():
+    job_id = jobs.submit("add", 2, 3)
+    for _ in range(jobs.MAX_ATTEMPTS):
+        assert jobs.acquire(WORKER, lease=datetime.timedelta(seconds=-1))["_id"] == job_id
+
+    assert jobs.acquire(OTHER) is None
+    assert jobs.expire_abandoned() == 1
+    assert jobs.get_collection().find_one({"_id": job_id})["status"] == jobs.FAILED
+
+
+def test_unknown_operation():
+    job_id = jobs.submit("os.system", "ls")
+
+    assert jobs.run(jobs.acquire(WORKER), WORKER, OPERATIONS)
+
+    doc = jobs.get_collection().find_one({"_id": job_id})
+    assert doc["status"] == jobs.FAILED
+    assert doc["error"]["name"] == "JobError"
+
+
+def test_not_bson_result():
+    job_id = jobs.submit("object")
+
+    assert jobs.run(jobs.acquire(WORKER), WORKER, {"object": lambda lease: object()})
+
+    doc = jobs.get_collection().find_one({"_id": job_id})
+    assert doc["status"] == jobs.FAILED
+    assert doc["error"]["name"] == "InvalidDocument"
+
+
+def test_executor():
+    with jobs.Executor(OPERATIONS, poll=0.01) as executor:
+        done = executor.submit(add_job, 2, 3)
+        failed = executor.submit(fail_job)
+
+        for _ in range(2):
+            jobs.run(jobs.acquire(WORKER), WORKER, OPERATIONS)
+
+        futures.wait([done, failed], timeout=10)
+
+        assert done.result() == 5
+        with pytest.raises(jobs.JobError, match="ValueError: bad job"):
+            failed.result()
+
+    assert not jobs.get_collection().count_documents({})
+
+
+def test_executor_unknown_operation():
+    with jobs.Executor(OPERATIONS, poll=0.01) as executor:
+        with pytest.raises(jobs.JobError):
+            executor.submit(print, "job")
+
+    assert not jobs.get_collection().count_documents({})
+
+
+def test_executor_shutdown_removes_jobs():
+    executor = jobs.Executor(OPERATIONS, poll=0.01)
+    future = executor.submit(add_job, 2, 3)
+    executor.shutdown()
+
+    assert future.cancelled()
+    assert not jobs.get_collection().count_documents({})
+
+
+def test_job_gets_new_token_on_reacquire():
+    job_id = jobs.submit("token")
+    job = jobs.acquire(WORKER, lease=datetime.timedelta(seconds=-1))
+    reacquired = jobs.acquire(WORKER)
+
+    assert reacquired["token"] != job["token"]
+    assert not jobs.run(job, WORKER, OPERATIONS)
+    assert jobs.run(reacquired, WORKER, OPERATIONS)
+
+    doc = jobs.get_collection().find_one({"_id": job_id})
+    assert doc["result"] == reacquired["token"]
+
+
+def test_executor_skips_dropped_futures():
+    executor = jobs.Executor(OPERATIONS, poll=60)
+    executor.submit(add_job, 2, 3)
+    ids = list(executor._futures)
+    jobs.run(jobs.acquire(WORKER), WORKER, OPERATIONS)
+
+    executor._futures.clear()
+    executor._collect_done(ids)
+
+    assert jobs.get_collection().count_documents({"status": jobs.DONE}) == 1
+    executor.shutdown()
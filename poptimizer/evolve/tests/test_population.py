@@ -1,5 +1,6 @@
 from typing import Iterable
 
+import numpy as np
 import pandas as pd
 import pytest
 
@@ -16,6 +17,7 @@ def set_test_collection():
 
     yield
 
+    store.get_curves_collection().drop()
     store._COLLECTION = saved_collection
     test_collection.drop()
 
@@ -24,8 +26,9 @@ class FakeModel:
     COUNTER = 0
 
     # noinspection PyUnusedLocal
-    def __init__(self, tickers, end, phenotype, pickled_model=None):
-        pass
+    def __init__(self, tickers, end, phenotype, pickled_model=None, warm_start=None, curves=None):
+        self.warm_start = warm_start
+        self.curve = [1.0] * population.CURVE_POINTS
 
     @property
     def quality_metrics(self):
@@ -91,6 +94,17 @@ def test_evaluate_new_timestamp(organism):
     assert fitness == [5, 5, 5]
     assert FakeModel.COUNTER == 3
     assert organism.scores == 3
+    assert organism.modes == [population.LOADED, population.SCRATCH, population.SCRATCH]
+
+
+@pytest.mark.usefixtures("fake_model")
+def test_evaluate_warm_start(organism, monkeypatch):
+    monkeypatch.setattr(population.config, "WARM_START", 0.1)
+    fitness = organism.evaluate_fitness(("GAZP", "LKOH"), pd.Timestamp("2020-04-13"))
+
+    assert fitness == [5, 5, 5, 5]
+    assert organism.modes[0] == population.WARM
+    assert organism.comparable_llh == [5, 5, 5]
 
 
 # noinspection PyProtectedMember
@@ -107,6 +121,77 @@ def make_weak_organism():
     weak.die()
 
 
+def test_get_curves(organism):
+    curves = population.get_curves()
+
+    assert curves.shape == (2, population.CURVE_POINTS)
+    assert (curves == 1).all()
+
+
+class PrunedModel(FakeModel):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.curve = [2.0, 3.0]
+
+    @property
+    def quality_metrics(self):
+        raise population.PrunedError
+
+
+def test_curves_of_pruned_and_dead_organisms(monkeypatch):
+    monkeypatch.setattr(population, "Model", PrunedModel)
+    org = population.Organism()
+
+    with pytest.raises(population.PrunedError):
+        org.evaluate_fitness(("GAZP", "AKRN"), pd.Timestamp("2020-04-12"))
+    org.die()
+
+    curves = population.get_curves()
+
+    assert curves.shape == (3, population.CURVE_POINTS)
+    assert curves[0, :2].tolist() == [2.0, 3.0]
+    assert np.isnan(curves[0, 2:]).all()
+    assert (curves[1:] == 1).all()
+
+
+@pytest.mark.usefixtures("fake_model")
+def test_screen(monkeypatch):
+    monkeypatch.setattr(population.config, "SCREEN_EPOCHS", 0.2)
+    org = population.Organism()
+
+    assert org.screen(("GAZP", "AKRN"), pd.Timestamp("2020-04-12")) == 5
+    assert population.Organism(_id=org.id)._doc.screen_llh == 5
+    assert org.scores == 0
+
+    org.die()
+
+
+@pytest.fixture(name="screened")
+def make_screened_organisms():
+    organisms = []
+    for n_org in range(population.SCREEN_MIN_PAIRS):
+        org = population.Organism()
+        org._doc.screen_llh = float(n_org)
+        org._doc.llh = [2.0 * n_org + 1]
+        org.save()
+        organisms.append(org)
+
+    yield organisms
+
+    for org in organisms:
+        org.die()
+
+
+def test_screen_threshold_without_data():
+    assert population.screen_threshold() == -np.inf
+
+
+def test_screen_threshold(screened, monkeypatch):
+    monkeypatch.setattr(population.config, "SCREEN_QUANTILE", 0.5)
+
+    assert population.screen_threshold() == pytest.approx(3.5)
+
+
 def test_die(organism):
     id_ = organism.id
     organism.die()
@@ -131,6 +216,19 @@ def test_make_child(one_of_three):
     assert isinstance(one_of_three.make_child(1), population.Organism)
 
 
+def test_make_child_without_tickers(one_of_three, monkeypatch):
+    n_tickers = []
+    monkeypatch.setattr(
+        population.surrogate,
+        "select",
+        lambda candidates, n: n_tickers.append(n) or candidates[0],
+    )
+    parent = population.Organism()
+
+    assert isinstance(parent.make_child(1, ("GAZP", "AKRN", "LKOH")), population.Organism)
+    assert n_tickers == [3]
+
+
 def test_raise_forecast_error():
     with pytest.raises(population.ForecastError) as error:
         population.Organism().forecast(("GAZP", "AKRN"), pd.Timestamp("2020-04-13"))
@@ -190,6 +288,53 @@ def test_get_all_and_random_organisms():
     assert org.id in ids
 
 
+def test_batch_loaded_organisms_fetch_genotype_lazily():
+    organisms = list(population.get_all_organisms())
+    organism = organisms[0]
+
+    assert "genotype" in organism._doc._lazy
+    assert organism.genotype == population.Organism(_id=organism.id).genotype
+    assert not organism._doc._lazy
+
+
+def test_parent_and_prey_loaded_in_one_query():
+    for organism in (population.get_parent(), population.get_prey()):
+        assert "genotype" in organism._doc._lazy
+        assert "mean_llh" not in vars(organism._doc)
+        assert organism.genotype == population.Organism(_id=organism.id).genotype
+
+
+def test_prey_by_comparable_llh():
+    others = [organism.id for organism in population.get_all_organisms()]
+    warm = population.Organism()
+    warm._doc.llh = [10, -1]
+    warm._doc.modes = [population.WARM, population.SCRATCH]
+    cold = population.Organism()
+    cold._doc.llh = [0, 0]
+    for organism in (warm, cold):
+        organism._doc.date = pd.Timestamp("2020-04-13")
+        organism.save()
+
+    assert population.get_prey(others).id == warm.id
+
+    warm.die()
+    cold.die()
+
+
+@pytest.mark.usefixtures("fake_model")
+def test_trained_model_of_removed_organism():
+    tickers = ("GAZP", "AKRN")
+    org = population.Organism()
+    org.evaluate_fitness(tickers, pd.Timestamp("2020-04-12"))
+    loaded = next(organism for organism in population.get_all_organisms() if organism.id == org.id)
+    assert loaded._doc.model is not None
+
+    org.die()
+
+    with pytest.raises(population.ForecastError):
+        loaded.trained_model(tickers)
+
+
 def test_print_stat(capsys):
     population.print_stat()
     captured = capsys.readouterr()
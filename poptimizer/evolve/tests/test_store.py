@@ -19,6 +19,8 @@ def set_test_collection():
 
     store._COLLECTION = saved_collection
     test_collection.drop()
+    test_collection.database.drop_collection("test.files")
+    test_collection.database.drop_collection("test.chunks")
 
 
 def test_get_collection():
@@ -206,3 +208,100 @@ class TestDoc:
         doc.delete()
 
         assert store.get_collection().count_documents({}) == 0
+
+
+class TestBlobField:
+    def test_save_and_lazy_load(self):
+        doc = store.Doc(genotype=store.Genotype())
+        doc.model = b"weights"
+        doc.save()
+
+        db_doc = store.get_collection().find_one({store.ID: doc.id})
+        assert isinstance(db_doc["model"], bson.ObjectId)
+        assert store.get_blobs().exists(db_doc["model"])
+
+        loaded = store.Doc(id_=doc.id)
+        assert "_model_data" not in vars(loaded)
+        assert loaded.model == b"weights"
+
+    def test_replace_deletes_old_file(self):
+        db_doc = store.get_collection().find_one({"model": {"$type": "objectId"}})
+        old_file = db_doc["model"]
+
+        doc = store.Doc(id_=db_doc[store.ID])
+        doc.model = b"new weights"
+        doc.save()
+
+        assert not store.get_blobs().exists(old_file)
+        assert store.Doc(id_=doc.id).model == b"new weights"
+
+    def test_delete_removes_file(self):
+        db_doc = store.get_collection().find_one({"model": {"$type": "objectId"}})
+
+        store.Doc(id_=db_doc[store.ID]).delete()
+
+        assert not store.get_blobs().exists(db_doc["model"])
+
+    def test_migrate_inline_model(self):
+        id_ = bson.ObjectId()
+        store.get_collection().insert_one({store.ID: id_, "model": b"inline"})
+
+        assert store.Doc(id_=id_).model == b"inline"
+        assert store.migrate_blobs() == 1
+        assert store.migrate_blobs() == 0
+
+        db_doc = store.get_collection().find_one({store.ID: id_})
+        assert isinstance(db_doc["model"], bson.ObjectId)
+        assert store.Doc(id_=id_).model == b"inline"
+
+
+class TestLazyFields:
+    def test_fields_without_lazy(self):
+        saved = store.Doc(genotype=store.Genotype())
+        saved.wins = 3
+        saved.save()
+
+        db_doc = store.get_collection().find_one({store.ID: saved.id}, projection={"genotype": False})
+        doc = store.Doc(fields=db_doc)
+
+        assert doc._lazy == frozenset(store.LAZY_FIELDS)
+        assert doc.wins == 3
+        assert doc._lazy
+
+    def test_fetch_keeps_pending_updates(self):
+        db_doc = store.get_collection().find_one({"wins": 3}, projection={"genotype": False})
+        doc = store.Doc(fields=db_doc)
+        doc.curve = [1.0]
+
+        assert isinstance(doc.genotype, store.Genotype)
+        assert not doc._lazy
+        assert doc._update == {"curve": [1.0]}
+        assert doc.curve == [1.0]
+
+
+class TestLease:
+    def test_claimed_doc_saves(self):
+        doc = store.Doc(genotype=store.Genotype())
+        doc.save()
+        doc.claim(bson.ObjectId())
+        doc.wins = 5
+        doc.save()
+
+        assert store.Doc(id_=doc.id).wins == 5
+
+    def test_save_after_reclaim_raises(self):
+        doc = store.Doc(genotype=store.Genotype())
+        doc.save()
+        doc.claim(bson.ObjectId())
+        store.Doc(id_=doc.id).claim(bson.ObjectId())
+        n_files = store.get_collection().database["test.files"].count_documents({})
+
+        doc.wins = 7
+        doc.model = b"stale"
+        with pytest.raises(store.LeaseError):
+            doc.save()
+
+        loaded = store.Doc(id_=doc.id)
+        assert loaded.wins == 0
+        assert loaded.model is None
+        assert store.get_collection().database["test.files"].count_documents({}) == n_files
@@ -0,0 +1,90 @@
+"""Тесты для суррогатной модели."""
+import numpy as np
+import pytest
+
+from poptimizer.evolve import surrogate
+from poptimizer.evolve.genotype import Genotype
+
+
+def test_gene_vector():
+    genotype = Genotype()
+    names = surrogate.gene_names(genotype)
+    vector = surrogate.gene_vector(genotype, names)
+
+    assert len(names) == len(set(names))
+    assert vector.shape == (len(names),)
+    key, gene = names[0]
+    assert vector[0] == genotype[key][gene]
+
+
+def test_gaussian_process():
+    rng = np.random.default_rng(0)
+    x_train = rng.uniform(-2, 2, (200, 2))
+    y_train = np.sin(x_train[:, 0]) + x_train[:, 1] ** 2
+
+    gp = surrogate.GaussianProcess(noise=1e-4).fit(x_train, y_train)
+
+    x_test = rng.uniform(-1.5, 1.5, (20, 2))
+    y_test = np.sin(x_test[:, 0]) + x_test[:, 1] ** 2
+
+    assert gp.predict(x_test) == pytest.approx(y_test, abs=0.1)
+
+
+def test_select_without_history(monkeypatch):
+    monkeypatch.setattr(
+        surrogate,
+        "load_history",
+        lambda names: (np.zeros((0, len(names))), [], [], []),
+    )
+    candidates = [Genotype() for _ in range(3)]
+
+    assert surrogate.select(candidates, 3) is candidates[0]
+
+
+def _patch_history(monkeypatch, candidates, llh, seconds, flops):
+    """Каждый кандидат пригоден и уже оценивался с заданными LLH, временем и операциями."""
+    monkeypatch.setattr(
+        surrogate,
+        "feasible",
+        lambda genotypes, n_tickers: list(zip(genotypes, flops)),
+    )
+    names = surrogate.gene_names(candidates[0])
+    genes = np.stack([surrogate.gene_vector(candidate, names) for candidate in candidates])
+    history = (
+        np.repeat(genes, surrogate.MIN_HISTORY, axis=0),
+        np.repeat(llh, surrogate.MIN_HISTORY),
+        np.repeat(seconds, surrogate.MIN_HISTORY),
+        np.repeat(flops, surrogate.MIN_HISTORY),
+    )
+    monkeypatch.setattr(surrogate, "load_history", lambda names: history)
+
+
+def test_select_best(monkeypatch):
+    candidates = [Genotype() for _ in range(3)]
+    _patch_history(monkeypatch, candidates, [1.0, 4.0, 2.0], [10.0, 20.0, 10.0], [1e9, 2e9, 1e9])
+
+    assert surrogate.select(candidates, 3) is candidates[1]
+
+
+def test_select_faster_without_gain(monkeypatch):
+    candidates = [Genotype() for _ in range(2)]
+    _patch_history(monkeypatch, candidates, [1.0, 1.0], [20.0, 10.0], [2e9, 1e9])
+
+    assert surrogate.select(candidates, 3) is candidates[1]
+
+
+def test_select_skips_infeasible(monkeypatch):
+    degenerated, feasible = Genotype(), Genotype()
+    monkeypatch.setattr(
+        degenerated,
+        "get_phenotype",
+        lambda: _only_label(Genotype().get_phenotype()),
+    )
+
+    assert surrogate.select([degenerated, feasible], 3) is feasible
+
+
+def _only_label(phenotype):
+    for name, feat_params in phenotype["data"]["features"].items():
+        feat_params["on"] = name == "Label"
+    return phenotype
@@ -0,0 +1,54 @@
+"""Тесты для оценки организмов в отдельных процессах."""
+import pandas as pd
+import pytest
+
+from poptimizer.dl import ModelError
+from poptimizer.evolve import workers
+
+
+@pytest.mark.parametrize(
+    "n_workers, cores, groups",
+    [
+        (1, [0, 1, 2, 3], [[0, 1, 2, 3]]),
+        (2, [0, 1, 2, 3, 4], [[0, 1, 2], [3, 4]]),
+        (3, [2, 5], [[2], [5], [2]]),
+    ],
+)
+def test_split_cores(n_workers, cores, groups):
+    assert workers.split_cores(n_workers, cores) == groups
+
+
+def test_fit(mocker):
+    org = mocker.Mock()
+
+    assert workers.fit(org, ("AKRN",), pd.Timestamp("2021-04-09")) is None
+
+    org.evaluate_fitness.assert_called_once_with(("AKRN",), pd.Timestamp("2021-04-09"))
+
+
+def test_fit_error(mocker):
+    org = mocker.Mock()
+    org.evaluate_fitness.side_effect = ModelError
+
+    assert workers.fit(org, ("AKRN",), pd.Timestamp("2021-04-09")) == "ModelError"
+
+
+def test_fit_screened_out(mocker, monkeypatch):
+    monkeypatch.setattr(workers.config, "SCREEN_EPOCHS", 0.2)
+    org = mocker.Mock()
+    org.scores = 0
+    org.screen.side_effect = workers.population.ScreenError
+
+    assert workers.fit(org, ("AKRN",), pd.Timestamp("2021-04-09")) == "ScreenError"
+    assert not org.evaluate_fitness.called
+
+
+def test_fit_screened_in(mocker, monkeypatch):
+    monkeypatch.setattr(workers.config, "SCREEN_EPOCHS", 0.2)
+    org = mocker.Mock()
+    org.scores = 0
+
+    assert workers.fit(org, ("AKRN",), pd.Timestamp("2021-04-09")) is None
+
+    org.screen.assert_called_once_with(("AKRN",), pd.Timestamp("2021-04-09"))
+    org.evaluate_fitness.assert_called_once_with(("AKRN",), pd.Timestamp("2021-04-09"))
@@ -0,0 +1,99 @@
+"""Оценка организмов в отдельных процессах."""
+import datetime
+import multiprocessing
+import os
+from collections.abc import Sequence
+from concurrent import futures
+from typing import Final, Optional
+
+import bson
+import numpy as np
+import pandas as pd
+import torch
+
+from poptimizer import config
+from poptimizer.dl.features.feature_store import STORE
+from poptimizer.dl.model import ModelError
+from poptimizer.evolve import population
+
+
+def split_cores(workers: int, cores: list[int]) -> list[list[int]]:
+    """Разбивает доступные ядра на группы для каждого процесса.
+
+    Группы не пересекаются, если процессов не больше, чем ядер.
+    """
+    groups = [group.tolist() for group in np.array_split(cores, min(workers, len(cores)))]
+    return [groups[worker % len(groups)] for worker in range(workers)]
+
+
+def _available_cores() -> list[int]:
+    if hasattr(os, "sched_getaffinity"):  # noqa: WPS421
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _init_worker(cores_queue: "multiprocessing.Queue[list[int]]") -> None:
+    """Закрепляет процесс за своей группой ядер и ограничивает количество потоков torch."""
+    cores = cores_queue.get()
+    if hasattr(os, "sched_setaffinity"):  # noqa: WPS421
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(len(cores))
+    torch.set_num_interop_threads(1)
+
+
+def make_pool(workers: int) -> futures.ProcessPoolExecutor:
+    """Пул процессов, каждый из которых использует свою группу ядер.
+
+    Процессы создаются с помощью spawn, так как клиент MongoDB и torch не поддерживают fork после
+    инициализации.
+    """
+    context = multiprocessing.get_context("spawn")
+    cores_queue = context.Queue()
+    for cores in split_cores(workers, _available_cores()):
+        cores_queue.put(cores)
+
+    return futures.ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(cores_queue,),
+    )
+
+
+def fit(organism: population.Organism, tickers: tuple[str, ...], end: pd.Timestamp) -> Optional[str]:
+    """Оценивает организм и возвращает название ошибки, если она произошла.
+
+    Новые организмы при необходимости проходят предварительную оценку.
+    """
+    try:
+        if not organism.scores and config.SCREEN_EPOCHS is not None:
+            organism.screen(tickers, end)
+        organism.evaluate_fitness(tickers, end)
+    except (ModelError, AttributeError, population.ScreenError) as error:
+        return error.__class__.__name__
+
+    return None
+
+
+def evaluate(
+    id_: bson.ObjectId,
+    tickers: Sequence[str],
+    end: datetime.datetime,
+    lease: Optional[bson.ObjectId] = None,
+) -> Optional[str]:
+    """Загружает и оценивает организм в процессе пула.
+
+    Результаты оценки сохраняются в MongoDB самим организмом. При выполнении из очереди заданий
+    тикеры и дата передаются в формате BSON, а организм арендуется с токеном задания, и результаты
+    исполнителя, аренда которого была перехвачена, не сохраняются.
+    """
+    end = pd.Timestamp(end)
+    STORE.invalidate(end)
+    organism = population.Organism(_id=id_)
+    if lease is not None:
+        organism.claim(lease)
+    return fit(organism, tuple(tickers), end)
+
+
+# Операции, которые исполнители очереди заданий выполняют по названию
+OPERATIONS: Final = {"evaluate": evaluate}
@@ -5,6 +5,7 @@ import weakref
 from collections.abc import MutableMapping
 from typing import Any, Callable, ClassVar, Final, Generic, NamedTuple, Optional, TypeVar
 
+import pymongo
 from motor import motor_asyncio
 from pymongo.collection import Collection
 
@@ -100,6 +101,16 @@ class Mapper(Generic[EntityType]):
         collection, name = self._get_collection_and_id(id_)
         return await collection.find_one({"_id": name}, projection={"_id": False}) or {}
 
+    async def last_value(self, package: str, group: str, doc_name: str) -> object:
+        """Максимальное значение поля среди всех документов группы.
+
+        При отсутствии документов возвращает None.
+        """
+        cursor = self._client[package][group].find({}, projection={doc_name: True, "_id": False})
+        async for doc in cursor.sort(doc_name, pymongo.DESCENDING).limit(1):
+            return doc.get(doc_name)
+        return None
+
     async def commit(
         self,
         entity: EntityType,